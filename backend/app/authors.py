@@ -0,0 +1,46 @@
+"""Normalized paper authors.
+
+``Paper.authors`` keeps the comma-separated string clients send, and the
+``authors`` / ``paper_authors`` tables hold the parsed list so papers can be
+filtered by author through an index.
+"""
+
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .database import dialect_insert
+from .models import Author, paper_authors
+
+
+def split_authors(authors: Optional[str]) -> List[str]:
+    """Split a comma-separated author string into distinct names, in order."""
+    names = {}
+    for name in (authors or "").split(","):
+        name = " ".join(name.split())
+        if name:
+            names.setdefault(Author.make_key(name), name)
+    return list(names.values())
+
+
+def sync_paper_authors(db: Session, authors_by_paper: Dict[str, Optional[str]]) -> None:
+    """Replace the author links of the given papers with set-based statements."""
+    if not authors_by_paper:
+        return
+    db.execute(paper_authors.delete().where(paper_authors.c.paper_id.in_(list(authors_by_paper))))
+
+    authors = {}
+    links = []
+    for paper_id, author_string in authors_by_paper.items():
+        for position, name in enumerate(split_authors(author_string)):
+            key = Author.make_key(name)
+            authors.setdefault(key, name)
+            links.append({"paper_id": paper_id, "author_key": key, "position": position})
+    if not links:
+        return
+
+    db.execute(
+        dialect_insert(db, Author.__table__).on_conflict_do_nothing(),
+        [{"key": key, "name": name} for key, name in authors.items()]
+    )
+    db.execute(paper_authors.insert(), links)
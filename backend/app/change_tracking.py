@@ -0,0 +1,98 @@
+"""Per-table change counters maintained by database triggers.
+
+Every table in TRACKED_TABLES gets triggers that bump its row in
+``table_versions`` on insert, update and delete. Reading a handful of
+counters then tells whether anything a response was built from has changed, whichever code path (or
+process) made the change: request handlers, report workers, bulk ingest.
+
+SQLite only has row-level triggers, so a bulk write bumps the counter once
+per row; PostgreSQL uses one statement-level trigger per table.
+
+Only the tables some response's ETag is built from are tracked; write-heavy
+tables nothing conditional reads (logs, caches, chunk and blob stores, the
+entities registry) carry no triggers, so their writes never touch a counter.
+
+The ``__epoch__`` row holds a random value chosen when the counters are
+first created, so counters restarting from zero on a fresh database never
+repeat an earlier state.
+"""
+
+import random
+from typing import Dict, Iterable, List
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from .database import dialect_insert, get_async_session
+from .models import table_versions
+
+EPOCH_KEY = "__epoch__"
+
+# Tables conditional_get may build ETags from
+TRACKED_TABLES = (
+    "branches",
+    "entity_versions",
+    "folders",
+    "libraries",
+    "library_papers",
+    "paper_authors",
+    "papers",
+    "report_libraries",
+    "reports",
+    "templates",
+)
+
+
+def _sqlite_triggers(table: str) -> List[str]:
+    bump = f"UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event} ON {table} BEGIN {bump} END"
+        for suffix, event in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+    ]
+
+
+POSTGRES_BUMP_FUNCTION = """
+    CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+
+def _postgres_triggers(table: str) -> List[str]:
+    return [
+        f"DROP TRIGGER IF EXISTS {table}_version ON {table}",
+        f"CREATE TRIGGER {table}_version AFTER INSERT OR UPDATE OR DELETE ON {table} "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()",
+    ]
+
+
+def ensure_change_tracking(db: Session) -> None:
+    """Create the counter rows and triggers for every tracked table."""
+    db.execute(
+        dialect_insert(db, table_versions).on_conflict_do_nothing(),
+        [{"table_name": t, "version": 0} for t in TRACKED_TABLES]
+        + [{"table_name": EPOCH_KEY, "version": random.randrange(1, 2 ** 31)}]
+    )
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        statements = [s for t in TRACKED_TABLES for s in _sqlite_triggers(t)]
+    elif dialect == "postgresql":
+        statements = [POSTGRES_BUMP_FUNCTION] + [s for t in TRACKED_TABLES for s in _postgres_triggers(t)]
+    else:
+        return
+    for statement in statements:
+        db.execute(text(statement))
+
+
+async def read_table_versions(tables: Iterable[str]) -> Dict[str, int]:
+    """Current counters for ``tables`` plus the epoch, in one small query."""
+    names = [EPOCH_KEY, *tables]
+    async with get_async_session() as db:
+        rows = await db.execute(
+            select(table_versions.c.table_name, table_versions.c.version)
+            .where(table_versions.c.table_name.in_(names))
+        )
+        return dict(rows.all())
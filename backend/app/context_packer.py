@@ -0,0 +1,86 @@
+"""Token-budget-aware assembly of the paper context sent to the LLM.
+
+Candidate content is packed under ``CONTEXT_TOKEN_BUDGET`` tokens. With the
+``priority`` strategy, retrieved excerpts are taken best-first; with
+``greedy``, each paper's full text is taken in order. Any paper that got
+nothing in falls back to its abstract if there is still room, and is
+otherwise left out. The outcome per paper is recorded on the report.
+"""
+
+import math
+import os
+from typing import List, NamedTuple, Sequence
+
+from .models import Paper
+from .retrieval import Excerpt, paper_document
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_STRATEGY = os.environ.get("CONTEXT_STRATEGY", "priority")  # priority, greedy
+
+# Rough characters-per-token ratio for English prose
+CHARS_PER_TOKEN = 4
+
+
+class PackedContext(NamedTuple):
+    excerpts: List[Excerpt]
+    included: List[str]  # Papers with excerpts or full text in the context
+    truncated: List[str]  # Papers represented only by their abstract
+    omitted: List[str]  # Papers that did not fit at all
+    tokens: int
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def pack_context(
+    papers: Sequence[Paper],
+    excerpts: Sequence[Excerpt],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    strategy: str = CONTEXT_STRATEGY
+) -> PackedContext:
+    """Choose the context for a generation without exceeding ``budget`` tokens."""
+    if strategy == "greedy":
+        candidates = [
+            Excerpt(paper_id=p.id, title=p.title, text=paper_document(p), score=0.0)
+            for p in papers
+        ]
+    elif strategy == "priority":
+        candidates = sorted(excerpts, key=lambda e: e.score, reverse=True)
+    else:
+        raise ValueError(f"Unknown context strategy: {strategy}")
+
+    packed: List[Excerpt] = []
+    used = 0
+    included = set()
+    for candidate in candidates:
+        cost = estimate_tokens(candidate.text)
+        if used + cost <= budget:
+            packed.append(candidate)
+            used += cost
+            included.add(candidate.paper_id)
+
+    truncated, omitted = [], []
+    for paper in papers:
+        if paper.id in included:
+            continue
+        cost = estimate_tokens(paper.abstract) if paper.abstract else None
+        if cost is not None and used + cost <= budget:
+            packed.append(Excerpt(paper_id=paper.id, title=paper.title, text=paper.abstract, score=0.0))
+            used += cost
+            truncated.append(paper.id)
+        else:
+            omitted.append(paper.id)
+
+    return PackedContext(
+        excerpts=packed,
+        included=[p.id for p in papers if p.id in included],
+        truncated=truncated,
+        omitted=omitted,
+        tokens=used
+    )
+
+
+def packing_signature() -> str:
+    """Identifies the packing settings, for cache keys."""
+    return f"{CONTEXT_STRATEGY}/budget={CONTEXT_TOKEN_BUDGET}"
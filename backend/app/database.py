@@ -2,37 +2,164 @@
 
 import os
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 
 from .models import Base
 
-# Database file location (in backend directory)
+# Default database file location (in backend directory)
 DB_PATH = Path(__file__).parent.parent / "pipelinecraft.db"
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+DATABASE_URL = os.environ.get("DATABASE_URL", f"sqlite:///{DB_PATH}")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Async drivers used when ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+# SQLite connection pragmas per storage profile. ``production`` trades
+# durability of the last few commits on power loss (never corruption) for
+# far fewer fsyncs, and lets readers run alongside a writer.
+SQLITE_PROFILES = {
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        "cache_size": -int(os.environ.get("SQLITE_CACHE_SIZE_KB", "65536")),  # Negative = KiB
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        "temp_store": "MEMORY",
+    },
+    "safe": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    },
+}
+DB_PROFILE = os.environ.get("DB_PROFILE", "production")
+
+# Connection pool sizing (ignored by SQLite in-memory databases)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+
+
+def async_database_url(url: str) -> str:
+    """The async-driver equivalent of a sync database URL."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for database: {backend}")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+
+def engine_options(url: str) -> dict:
+    """create_engine keyword arguments for a database URL."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        options = {"connect_args": {"check_same_thread": False}}
+        if parsed.database in (None, "", ":memory:"):
+            return options
+    else:
+        options = {"pool_pre_ping": True, "pool_recycle": DB_POOL_RECYCLE}
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+
+def apply_sqlite_pragmas(sync_engine: Engine, profile: str = DB_PROFILE) -> None:
+    """Set the profile's pragmas on every new SQLite connection of an engine."""
+    if sync_engine.dialect.name != "sqlite":
+        return
+    pragmas = SQLITE_PROFILES[profile]
+
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+# Sync engine: schema setup, scripts and the report worker threads
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+apply_sqlite_pragmas(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: request handlers. Objects stay loaded after commit, since
+# an expired attribute cannot be lazily reloaded outside run_sync().
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+apply_sqlite_pragmas(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def add_missing_columns():
+    """Add nullable columns introduced after a table was first created.
+
+    A lightweight stand-in for migrations: only plain ``ADD COLUMN`` changes
+    are handled, which is all SQLite supports without rebuilding the table.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+
 
 def init_db():
-    """Create all tables if they don't exist."""
+    """Create all tables and indexes if they don't exist."""
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    # create_all skips tables that already exist, so add any indexes that
+    # were introduced after the database file was first created.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def dialect_insert(db: Session, table):
+    """Return an INSERT for ``table`` that supports ON CONFLICT clauses."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
 
 
-def get_db():
+async def get_async_db():
     """Dependency for FastAPI routes."""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+@asynccontextmanager
+async def get_async_session():
+    """Async context manager for database sessions."""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
 
 
 @contextmanager
 def get_db_session():
-    """Context manager for database sessions."""
+    """Context manager for database sessions, for scripts and worker threads."""
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,144 @@
+"""Report dependency tracking and staleness propagation.
+
+A report depends on the libraries it was generated from and on its
+template. When any of those change, only the reports that depend on them
+are flipped from ``ok`` to ``stale``, in the same transaction as the edit.
+Reports marked stale are also invalidated in the entity cache.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from .entity_cache import invalidate_on_commit
+from .models import Library, Report, ReportLibrary, library_papers
+
+
+def report_dependencies(rpt: Report) -> List[str]:
+    """Ids a report depends on: its libraries, then its template."""
+    dependencies = list(rpt.library_ids)
+    if rpt.template_id:
+        dependencies.append(rpt.template_id)
+    return dependencies
+
+
+def libraries_containing(db: Session, paper_ids: Iterable[str]) -> List[str]:
+    paper_ids = list(paper_ids)
+    if not paper_ids:
+        return []
+    return [
+        row.library_id for row in db.query(library_papers.c.library_id)
+        .filter(library_papers.c.paper_id.in_(paper_ids))
+        .distinct()
+    ]
+
+
+def dependent_report_ids(
+    db: Session,
+    library_ids: Iterable[str] = (),
+    template_ids: Iterable[str] = (),
+    status: Optional[str] = None
+) -> List[str]:
+    """Reports built from any of the given libraries or templates."""
+    library_ids = set(library_ids)
+    template_ids = set(template_ids)
+    if not library_ids and not template_ids:
+        return []
+
+    conditions = []
+    if library_ids:
+        conditions.append(Report.id.in_(
+            select(ReportLibrary.report_id).where(ReportLibrary.library_id.in_(library_ids))
+        ))
+    if template_ids:
+        conditions.append(Report.template_id.in_(template_ids))
+
+    query = db.query(Report.id).filter(or_(*conditions))
+    if status:
+        query = query.filter(Report.status == status)
+    return [row.id for row in query]
+
+
+def mark_dependents_stale(
+    db: Session,
+    library_ids: Iterable[str] = (),
+    template_ids: Iterable[str] = (),
+    paper_ids: Iterable[str] = ()
+) -> int:
+    """Mark ``ok`` reports depending on the given entities as stale.
+
+    Papers affect a report through the libraries that contain them.
+    Returns the number of reports marked.
+    """
+    library_ids = set(library_ids)
+    library_ids.update(libraries_containing(db, paper_ids))
+    report_ids = dependent_report_ids(db, library_ids, template_ids, status="ok")
+    if not report_ids:
+        return 0
+
+    result = db.execute(
+        update(Report)
+        .where(Report.id.in_(report_ids))
+        .where(Report.status == "ok")
+        .values(status="stale")
+        .execution_options(synchronize_session=False)
+    )
+    invalidate_on_commit(db, report_ids)
+    return result.rowcount
+
+
+def missing_libraries(db: Session, report_ids: Iterable[str]) -> Dict[str, List[str]]:
+    """Deleted libraries the given reports were built from, by report id.
+
+    Deleting a library keeps its report_libraries links for this purpose.
+    """
+    report_ids = list(report_ids)
+    if not report_ids:
+        return {}
+    missing = defaultdict(list)
+    rows = (
+        db.query(ReportLibrary.report_id, ReportLibrary.library_id)
+        .outerjoin(Library, Library.id == ReportLibrary.library_id)
+        .filter(ReportLibrary.report_id.in_(report_ids), Library.id.is_(None))
+        .order_by(ReportLibrary.report_id, ReportLibrary.position)
+    )
+    for report_id, library_id in rows:
+        missing[report_id].append(library_id)
+    return dict(missing)
+
+
+def topological_levels(dependencies: Dict[str, List[str]]) -> List[List[str]]:
+    """Group nodes into levels so every node comes after its dependencies.
+
+    Only edges between keys of ``dependencies`` are considered; ids outside
+    the graph (libraries, templates) are treated as already satisfied. Nodes
+    in the same level are independent of each other. Nodes caught in a
+    cycle are placed together in a final level.
+    """
+    remaining = {
+        node: {dep for dep in deps if dep in dependencies and dep != node}
+        for node, deps in dependencies.items()
+    }
+    dependents = defaultdict(list)
+    for node, deps in remaining.items():
+        for dep in deps:
+            dependents[dep].append(node)
+
+    levels = []
+    ready = sorted(node for node, deps in remaining.items() if not deps)
+    while ready:
+        levels.append(ready)
+        next_ready = []
+        for node in ready:
+            del remaining[node]
+            for dependent in dependents[node]:
+                remaining[dependent].discard(node)
+                if not remaining[dependent]:
+                    next_ready.append(dependent)
+        ready = sorted(next_ready)
+
+    if remaining:
+        levels.append(sorted(remaining))
+    return levels
@@ -0,0 +1,251 @@
+"""Read-through cache of serialized Entity payloads.
+
+Payloads are keyed by entity id, the entity's current cache version and a
+variant (which paper body fields a library payload includes). Invalidating
+an entity bumps its version, which orphans every cached variant at once;
+orphans age out of the LRU.
+
+Writers record the entities they touch with ``invalidate_on_commit``;
+versions are bumped only after the transaction commits, so a reader racing
+the write can never cache pre-commit data under the new version.
+
+The default backend is an in-process LRU bounded by entry count and bytes.
+With several uvicorn workers, set ``ENTITY_CACHE_URL=redis://...`` so that
+all workers share payloads and versions (requires the ``redis`` package).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .schemas import EntityCacheStats
+
+ENTITY_CACHE_MAX_ENTRIES = int(os.environ.get("ENTITY_CACHE_MAX_ENTRIES", "10000"))
+ENTITY_CACHE_MAX_BYTES = int(os.environ.get("ENTITY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ENTITY_CACHE_URL = os.environ.get("ENTITY_CACHE_URL")
+
+# Seconds a payload lives in the shared backend without being read
+ENTITY_CACHE_TTL = int(os.environ.get("ENTITY_CACHE_TTL", "3600"))
+
+# Session.info key collecting ids to invalidate when the transaction commits
+PENDING_INVALIDATIONS = "entity_cache_invalidations"
+
+
+def cache_key(entity_id: str, version: int, variant: str) -> str:
+    return f"{entity_id}:{version}:{variant}"
+
+
+class LocalBackend:
+    """Thread-safe in-process LRU.
+
+    Versions are ticks of one clock, so an entity's version never repeats.
+    They are kept for the ``max_entries`` most recently used ids only; an id
+    that falls out reads as the highest version dropped so far, which is at
+    least as new as anything cached for it before.
+    """
+
+    name = "local"
+
+    def __init__(self, max_entries: int = ENTITY_CACHE_MAX_ENTRIES, max_bytes: int = ENTITY_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._clock = 0
+        self._dropped_version = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def versions(self, entity_ids: List[str]) -> Dict[str, int]:
+        found = {}
+        with self._lock:
+            for i in entity_ids:
+                version = self._versions.get(i)
+                if version is None:
+                    version = self._dropped_version
+                else:
+                    self._versions.move_to_end(i)
+                found[i] = version
+        return found
+
+    def bump(self, entity_ids: Iterable[str]) -> None:
+        with self._lock:
+            for i in entity_ids:
+                self._clock += 1
+                self._versions[i] = self._clock
+                self._versions.move_to_end(i)
+            while len(self._versions) > self.max_entries:
+                _, version = self._versions.popitem(last=False)
+                self._dropped_version = max(self._dropped_version, version)
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                payload = self._entries.get(key)
+                if payload is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = payload
+        return found
+
+    def set_many(self, items: Dict[str, str]) -> None:
+        with self._lock:
+            for key, payload in items.items():
+                size = len(payload)
+                if size > self.max_bytes:
+                    continue
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._bytes -= len(old)
+                self._entries[key] = payload
+                self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def size(self) -> Tuple[int, int]:
+        with self._lock:
+            return len(self._entries), self._bytes
+
+
+class RedisBackend:
+    """Payloads and versions shared by every worker through Redis.
+
+    Versions live in one hash; payloads are plain keys with a TTL, evicted
+    by the server's maxmemory policy.
+    """
+
+    name = "redis"
+    prefix = "pipelinecraft:entity-cache"
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("ENTITY_CACHE_URL requires the 'redis' package") from exc
+        self.client = redis.Redis.from_url(url)
+        self.max_entries = 0
+        self.max_bytes = 0
+        self.evictions = 0
+
+    def versions(self, entity_ids: List[str]) -> Dict[str, int]:
+        if not entity_ids:
+            return {}
+        values = self.client.hmget(f"{self.prefix}:versions", entity_ids)
+        return {i: int(v or 0) for i, v in zip(entity_ids, values)}
+
+    def bump(self, entity_ids: Iterable[str]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for i in entity_ids:
+            pipe.hincrby(f"{self.prefix}:versions", i, 1)
+        pipe.execute()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        values = self.client.mget([f"{self.prefix}:{k}" for k in keys])
+        return {k: v.decode() for k, v in zip(keys, values) if v is not None}
+
+    def set_many(self, items: Dict[str, str]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key, payload in items.items():
+            pipe.set(f"{self.prefix}:{key}", payload, ex=ENTITY_CACHE_TTL)
+        pipe.execute()
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+    def size(self) -> Tuple[int, int]:
+        return sum(1 for _ in self.client.scan_iter(f"{self.prefix}:*")), 0
+
+
+class EntityCache:
+    """Versioned entity payload cache with hit/miss accounting."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or (RedisBackend(ENTITY_CACHE_URL) if ENTITY_CACHE_URL else LocalBackend())
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, refs: List[Tuple[str, str]]) -> Tuple[Dict[str, str], Dict[str, int]]:
+        """Look up ``(entity id, variant)`` pairs.
+
+        Returns the cached payloads by id and the versions read, which must
+        be passed back to ``put`` for the misses.
+        """
+        versions = self.backend.versions([entity_id for entity_id, _ in refs])
+        keys = {cache_key(entity_id, versions[entity_id], variant): entity_id for entity_id, variant in refs}
+        found = {keys[key]: payload for key, payload in self.backend.get_many(list(keys)).items()}
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(refs) - len(found)
+        return found, versions
+
+    def put_many(self, items: List[Tuple[str, str, int, str]]) -> None:
+        """Store ``(entity id, variant, version, payload)`` entries."""
+        if items:
+            self.backend.set_many({
+                cache_key(entity_id, version, variant): payload
+                for entity_id, variant, version, payload in items
+            })
+
+    def invalidate(self, entity_ids: Iterable[str]) -> None:
+        entity_ids = set(entity_ids)
+        if entity_ids:
+            self.backend.bump(entity_ids)
+            with self._lock:
+                self.invalidations += len(entity_ids)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> EntityCacheStats:
+        entries, total_bytes = self.backend.size()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return EntityCacheStats(
+                backend=self.backend.name,
+                hits=self.hits,
+                misses=self.misses,
+                hit_rate=self.hits / lookups if lookups else 0.0,
+                invalidations=self.invalidations,
+                evictions=self.backend.evictions,
+                entries=entries,
+                total_bytes=total_bytes,
+                max_entries=self.backend.max_entries,
+                max_bytes=self.backend.max_bytes
+            )
+
+
+entity_cache = EntityCache()
+
+
+def invalidate_on_commit(db: Session, entity_ids: Iterable[str]) -> None:
+    """Invalidate cached entities once ``db``'s transaction commits."""
+    db.info.setdefault(PENDING_INVALIDATIONS, set()).update(entity_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    entity_ids = session.info.pop(PENDING_INVALIDATIONS, None)
+    if entity_ids:
+        entity_cache.invalidate(entity_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(PENDING_INVALIDATIONS, None)
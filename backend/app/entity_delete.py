@@ -0,0 +1,86 @@
+"""Set-based deletion of entities and the rows that hang off them.
+
+Ids are resolved to their entity types through the entities registry in
+one query per batch, and every cascade is a bulk ``DELETE ... WHERE id
+IN`` (or ``UPDATE``) per batch rather than one ORM delete per object, all
+in the caller's transaction:
+
+* reports: their report_libraries links;
+* templates: reports built from them are marked stale and their
+  ``template_id`` cleared (ON DELETE SET NULL);
+* libraries: their library_papers links; reports built from them are
+  marked stale and keep the dangling report_libraries link, so the
+  missing dependency stays visible.
+
+The same cascades are declared as ``ondelete`` rules on the foreign keys
+for databases that enforce them; SQLite does not unless
+``PRAGMA foreign_keys`` is on, so they are also applied explicitly here.
+"""
+
+from typing import Dict, Iterator, List, Sequence
+
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from .dependency_graph import dependent_report_ids, mark_dependents_stale
+from .entity_cache import invalidate_on_commit
+from .entity_registry import resolve_entity_types
+from .models import ENTITY_MODELS, Library, Report, ReportLibrary, Template, library_papers
+from .schemas import BulkDeleteResult
+
+# Ids per statement, keeping IN lists well under SQLite's bound parameter limit
+DELETE_BATCH_SIZE = 500
+
+
+def batches(ids: Sequence[str], size: int = DELETE_BATCH_SIZE) -> Iterator[List[str]]:
+    for start in range(0, len(ids), size):
+        yield list(ids[start:start + size])
+
+
+def group_by_type(db: Session, entity_ids: Sequence[str]) -> Dict[str, List[str]]:
+    """Existing entity ids grouped by type, one query per batch."""
+    by_type: Dict[str, List[str]] = {t: [] for t in ENTITY_MODELS}
+    for batch in batches(entity_ids):
+        for entity_id, entity_type in resolve_entity_types(db, batch).items():
+            by_type[entity_type].append(entity_id)
+    return by_type
+
+
+def delete_entities(db: Session, entity_ids: Sequence[str]) -> BulkDeleteResult:
+    """Delete libraries, templates and reports by id, cascading set-wise.
+
+    Does not commit; unknown ids are reported in ``not_found``.
+    """
+    entity_ids = list(dict.fromkeys(entity_ids))
+    by_type = group_by_type(db, entity_ids)
+    found = {i for ids in by_type.values() for i in ids}
+    result = BulkDeleteResult(not_found=[i for i in entity_ids if i not in found])
+    library_ids, template_ids = by_type["library"], by_type["template"]
+
+    # Reports go first so they are not marked stale only to be deleted
+    for batch in batches(by_type["report"]):
+        db.execute(delete(ReportLibrary).where(ReportLibrary.report_id.in_(batch)))
+        result.reports += db.execute(delete(Report).where(Report.id.in_(batch))).rowcount
+
+    # Remaining reports showing a deleted library's or template's name
+    affected = set()
+    for batch in batches(library_ids):
+        affected.update(dependent_report_ids(db, library_ids=batch))
+        result.stale_reports += mark_dependents_stale(db, library_ids=batch)
+    for batch in batches(template_ids):
+        affected.update(dependent_report_ids(db, template_ids=batch))
+        result.stale_reports += mark_dependents_stale(db, template_ids=batch)
+
+    for batch in batches(template_ids):
+        db.execute(
+            update(Report).where(Report.template_id.in_(batch)).values(template_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        result.templates += db.execute(delete(Template).where(Template.id.in_(batch))).rowcount
+    for batch in batches(library_ids):
+        db.execute(library_papers.delete().where(library_papers.c.library_id.in_(batch)))
+        result.libraries += db.execute(delete(Library).where(Library.id.in_(batch))).rowcount
+
+    result.deleted = result.libraries + result.templates + result.reports
+    invalidate_on_commit(db, found | affected)
+    return result
@@ -0,0 +1,172 @@
+"""The ``entities`` registry: one narrow row per library, template and report.
+
+Triggers on the entity tables keep the registry in sync on every write,
+whichever code path (or process) makes it: ORM flushes, bulk statements,
+report workers. That makes it safe to use for:
+
+* resolving an id's type with one primary-key lookup;
+* listing and filtering all entity types with one keyset scan over a
+  single table before hydrating only the page's rows;
+* cache keys: ``version`` grows on every change to an entity, including
+  papers joining or leaving a library and edits to those papers, so a
+  cached payload of an older version is never served.
+"""
+
+from typing import Dict, List, Sequence
+
+from sqlalchemy import delete, insert, literal, select, text
+from sqlalchemy.orm import Session
+
+from .models import ENTITY_MODELS, EntityRecord
+
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# The library_papers and papers triggers bump the version of affected libraries
+LIBRARY_TRIGGER_TABLES = ("library_papers", "papers")
+
+# Paper columns shown in library payloads; updates to other columns leave
+# libraries untouched
+PAPER_PAYLOAD_COLUMNS = ("title", "abstract", "authors", "publish_date", "text_markdown")
+
+
+def _status_column(entity_type: str, row: str) -> str:
+    # Libraries and templates are always "ok"
+    return f"{row}.status" if entity_type == "report" else "'ok'"
+
+
+def _sqlite_trigger_names(table: str) -> List[str]:
+    return [f"{table}_registry_{suffix}" for suffix in ("ai", "au", "ad")]
+
+
+def _sqlite_triggers(entity_type: str, table: str) -> List[str]:
+    status = _status_column(entity_type, "NEW")
+    # A plain INSERT: an id already registered by another table fails the
+    # write instead of silently changing the registered type
+    return [
+        f"CREATE TRIGGER {table}_registry_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO entities (id, type, folderId, status, created_date, version) "
+        f"VALUES (NEW.id, '{entity_type}', NEW.folderId, {status}, "
+        f"COALESCE(NEW.created_date, {SQLITE_NOW}), 1); END",
+        f"CREATE TRIGGER {table}_registry_au AFTER UPDATE ON {table} BEGIN "
+        f"UPDATE entities SET folderId = NEW.folderId, status = {status}, "
+        f"version = version + 1 WHERE id = NEW.id; END",
+        f"CREATE TRIGGER {table}_registry_ad AFTER DELETE ON {table} BEGIN "
+        f"DELETE FROM entities WHERE id = OLD.id; END",
+    ]
+
+
+def _sqlite_library_triggers() -> List[str]:
+    bump = "UPDATE entities SET version = version + 1"
+    return [
+        f"CREATE TRIGGER library_papers_registry_ai AFTER INSERT ON library_papers BEGIN "
+        f"{bump} WHERE id = NEW.library_id; END",
+        f"CREATE TRIGGER library_papers_registry_ad AFTER DELETE ON library_papers BEGIN "
+        f"{bump} WHERE id = OLD.library_id; END",
+        f"CREATE TRIGGER papers_registry_au AFTER UPDATE OF {', '.join(PAPER_PAYLOAD_COLUMNS)} ON papers BEGIN "
+        f"{bump} WHERE id IN (SELECT library_id FROM library_papers WHERE paper_id = NEW.id); END",
+    ]
+
+
+POSTGRES_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION sync_entity_registry() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM entities WHERE id = OLD.id;
+        ELSIF TG_OP = 'INSERT' THEN
+            -- An id already registered by another table raises unique_violation
+            INSERT INTO entities (id, type, "folderId", status, created_date, version)
+            VALUES (
+                NEW.id, TG_ARGV[0], NEW."folderId", COALESCE(to_jsonb(NEW)->>'status', 'ok'),
+                COALESCE(NEW.created_date, now()), 1
+            );
+        ELSE
+            UPDATE entities SET
+                "folderId" = NEW."folderId",
+                status = COALESCE(to_jsonb(NEW)->>'status', 'ok'),
+                version = version + 1
+            WHERE id = NEW.id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION bump_library_registry() RETURNS trigger AS $$
+    BEGIN
+        IF TG_TABLE_NAME = 'papers' THEN
+            UPDATE entities SET version = version + 1
+            WHERE id IN (SELECT library_id FROM library_papers WHERE paper_id = NEW.id);
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE entities SET version = version + 1 WHERE id = OLD.library_id;
+        ELSE
+            UPDATE entities SET version = version + 1 WHERE id = NEW.library_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+
+def _postgres_triggers(entity_type: str, table: str) -> List[str]:
+    return [
+        f"DROP TRIGGER IF EXISTS {table}_registry ON {table}",
+        f"CREATE TRIGGER {table}_registry AFTER INSERT OR UPDATE OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION sync_entity_registry('{entity_type}')",
+    ]
+
+
+def _postgres_library_triggers() -> List[str]:
+    return [
+        "DROP TRIGGER IF EXISTS library_papers_registry ON library_papers",
+        "CREATE TRIGGER library_papers_registry AFTER INSERT OR DELETE ON library_papers "
+        "FOR EACH ROW EXECUTE FUNCTION bump_library_registry()",
+        "DROP TRIGGER IF EXISTS papers_registry ON papers",
+        f"CREATE TRIGGER papers_registry AFTER UPDATE OF {', '.join(PAPER_PAYLOAD_COLUMNS)} ON papers "
+        "FOR EACH ROW EXECUTE FUNCTION bump_library_registry()",
+    ]
+
+
+def backfill_entity_registry(db: Session) -> None:
+    """Register entities written before the triggers existed and drop orphans."""
+    for entity_type, model in ENTITY_MODELS.items():
+        status = model.status if entity_type == "report" else literal("ok")
+        db.execute(insert(EntityRecord).from_select(
+            ["id", "type", "folderId", "status", "created_date", "version"],
+            select(
+                model.id, literal(entity_type), model.folderId, status, model.created_date, literal(1)
+            ).where(~model.id.in_(select(EntityRecord.id)))
+        ))
+        db.execute(delete(EntityRecord).where(
+            EntityRecord.type == entity_type,
+            ~EntityRecord.id.in_(select(model.id))
+        ))
+
+
+def ensure_entity_registry(db: Session) -> None:
+    """(Re)create the registry triggers and register any existing entities."""
+    dialect = db.get_bind().dialect.name
+    tables = [(t, model.__tablename__) for t, model in ENTITY_MODELS.items()]
+    if dialect == "sqlite":
+        # SQLite cannot replace a trigger, so drop the current definitions first
+        trigger_tables = [table for _, table in tables] + list(LIBRARY_TRIGGER_TABLES)
+        for name in [n for table in trigger_tables for n in _sqlite_trigger_names(table)]:
+            db.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        statements = [s for t, table in tables for s in _sqlite_triggers(t, table)]
+        statements += _sqlite_library_triggers()
+    elif dialect == "postgresql":
+        statements = POSTGRES_FUNCTIONS + [s for t, table in tables for s in _postgres_triggers(t, table)]
+        statements += _postgres_library_triggers()
+    else:
+        statements = []
+    for statement in statements:
+        db.execute(text(statement))
+    backfill_entity_registry(db)
+
+
+def resolve_entity_types(db: Session, entity_ids: Sequence[str]) -> Dict[str, str]:
+    """Entity type by id for the ids that exist."""
+    if not entity_ids:
+        return {}
+    return dict(db.query(EntityRecord.id, EntityRecord.type).filter(EntityRecord.id.in_(list(entity_ids))).all())
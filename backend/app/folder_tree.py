@@ -0,0 +1,140 @@
+"""Folder tree with a materialized path index.
+
+Every folder stores ``path``: the ids from the root down to itself, as
+``/root/child/folder/``. A folder's subtree is then the folders whose path
+starts with its own, which is one range scan on ``ix_folders_path``
+(``path >= p AND path < p'`` where ``p'`` follows every extension of ``p``)
+at any depth. Moving a folder rewrites the path prefix of its whole
+subtree in a single UPDATE.
+
+Entities reference their folder through ``folderId``, so everything under
+a folder is the entities whose folder is in that range.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import String, func, literal, select, update
+from sqlalchemy.orm import Session, aliased
+
+from .models import EntityRecord, Folder, Library, Report, Template
+from .schemas import FolderCounts
+
+# Root folder each entity type is placed in by default
+ENTITY_FOLDERS: Dict[str, str] = {
+    "library": "folder-libraries",
+    "template": "folder-templates",
+    "report": "folder-reports",
+}
+
+DEFAULT_FOLDER_NAMES = {
+    "folder-libraries": "Libraries",
+    "folder-templates": "Templates",
+    "folder-reports": "Reports",
+}
+
+PATH_SEPARATOR = "/"
+
+
+def folder_path(parent_path: Optional[str], folder_id: str) -> str:
+    return f"{parent_path or PATH_SEPARATOR}{folder_id}{PATH_SEPARATOR}"
+
+
+def subtree_range(path: str) -> Tuple[str, str]:
+    """Bounds of the paths under ``path`` (inclusive, exclusive)."""
+    # The character after the separator sorts after every path extending this one
+    return path, path[:-1] + chr(ord(PATH_SEPARATOR) + 1)
+
+
+def subtree_folder_ids(path: str):
+    """Select of the ids of a folder and all its descendants."""
+    low, high = subtree_range(path)
+    return select(Folder.id).where(Folder.path >= low, Folder.path < high)
+
+
+def subtree_folders(db: Session, path: str) -> List[Folder]:
+    low, high = subtree_range(path)
+    return db.query(Folder).filter(Folder.path >= low, Folder.path < high).order_by(Folder.path).all()
+
+
+def move_folder(db: Session, folder: Folder, parent: Optional[Folder]) -> None:
+    """Move a folder (and its subtree) under ``parent``, or to the top level."""
+    if parent is not None and parent.path.startswith(folder.path):
+        raise ValueError("Cannot move a folder into its own subtree")
+    old_path = folder.path
+    new_path = folder_path(parent.path if parent is not None else None, folder.id)
+    low, high = subtree_range(old_path)
+    db.execute(
+        update(Folder)
+        .where(Folder.path >= low, Folder.path < high)
+        .values(path=literal(new_path, String).concat(func.substr(Folder.path, len(old_path) + 1)))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Folder)
+        .where(Folder.id == folder.id)
+        .values(parentId=parent.id if parent is not None else None)
+        .execution_options(synchronize_session=False)
+    )
+    db.expire(folder)
+
+
+def folder_counts(db: Session, folder: Folder) -> FolderCounts:
+    """Subfolders and entities anywhere under a folder, in one query."""
+    folder_ids = subtree_folder_ids(folder.path)
+    low, high = subtree_range(folder.path)
+    folders, libraries, templates, reports = db.execute(select(
+        select(func.count(Folder.id)).where(
+            Folder.path > low, Folder.path < high
+        ).scalar_subquery(),
+        *(
+            select(func.count(EntityRecord.id)).where(
+                EntityRecord.type == entity_type, EntityRecord.folderId.in_(folder_ids)
+            ).scalar_subquery()
+            for entity_type in ("library", "template", "report")
+        )
+    )).one()
+    return FolderCounts(
+        folder_id=folder.id,
+        folders=folders,
+        libraries=libraries,
+        templates=templates,
+        reports=reports,
+        entities=libraries + templates + reports
+    )
+
+
+def ensure_default_folders(db: Session) -> None:
+    """Create the per-type root folders if they are missing."""
+    existing = {row.id for row in db.query(Folder.id).filter(Folder.id.in_(DEFAULT_FOLDER_NAMES))}
+    for folder_id, name in DEFAULT_FOLDER_NAMES.items():
+        if folder_id not in existing:
+            db.add(Folder(id=folder_id, name=name, parentId=None, path=folder_path(None, folder_id)))
+    db.flush()
+
+
+def ensure_folder_paths(db: Session) -> int:
+    """Fill in paths for folders created before they were indexed, parents first."""
+    parent = aliased(Folder)
+    filled = 0
+    while True:
+        rows = db.query(Folder.id, parent.path).outerjoin(parent, parent.id == Folder.parentId).filter(
+            Folder.path.is_(None),
+            (Folder.parentId.is_(None)) | (parent.path.isnot(None))
+        ).all()
+        if not rows:
+            return filled
+        for folder_id, parent_path in rows:
+            db.execute(
+                update(Folder).where(Folder.id == folder_id).values(path=folder_path(parent_path, folder_id))
+            )
+        filled += len(rows)
+
+
+def assign_default_folders(db: Session) -> int:
+    """Place entities without a folder in their type's root folder."""
+    assigned = 0
+    for entity_type, model in (("library", Library), ("template", Template), ("report", Report)):
+        assigned += db.execute(
+            update(model).where(model.folderId.is_(None)).values(folderId=ENTITY_FOLDERS[entity_type])
+        ).rowcount
+    return assigned
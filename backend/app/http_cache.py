@@ -0,0 +1,70 @@
+"""Conditional GET support: weak ETags from table change counters.
+
+A route opts in with ``dependencies=[conditional_get(...)]``, naming the
+tables its response is built from. The ETag hashes those tables' change
+counters (see change_tracking.py), so it is known before the handler runs:
+a matching ``If-None-Match`` gets a bodiless 304 without the handler, the
+ORM or serialization ever running.
+"""
+
+import hashlib
+from typing import Iterable, Set
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from .change_tracking import TRACKED_TABLES, read_table_versions
+
+# Cache-Control per resource type. ETags make revalidation cheap, so most
+# responses must be revalidated every time.
+CACHE_CONTROL = {
+    "entity": "private, no-cache",
+    "folder": "private, no-cache",
+    "report": "private, no-cache",
+    "paper": "private, max-age=30, must-revalidate",
+    "version": "private, max-age=60, must-revalidate",
+}
+
+# Bump when a response format changes, so old ETags stop matching
+REPRESENTATION_VERSION = "1"
+
+
+def make_etag(versions: dict) -> str:
+    state = "|".join(f"{name}={version}" for name, version in sorted(versions.items()))
+    digest = hashlib.sha1(f"{REPRESENTATION_VERSION}|{state}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def parse_if_none_match(header: str) -> Set[str]:
+    """Opaque tags from an If-None-Match header, weak prefixes stripped."""
+    tags = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.add(tag)
+    return tags
+
+
+def etag_matches(etag: str, header: str) -> bool:
+    tags = parse_if_none_match(header)
+    return "*" in tags or etag[2:] in tags
+
+
+def conditional_get(resource: str, tables: Iterable[str]):
+    """Dependency adding ETag/Cache-Control headers and answering 304s."""
+    tables = tuple(tables)
+    untracked = set(tables) - set(TRACKED_TABLES)
+    if untracked:
+        raise ValueError(f"ETag tables without change tracking: {sorted(untracked)}")
+    cache_control = CACHE_CONTROL[resource]
+
+    async def check(request: Request, response: Response) -> None:
+        etag = make_etag(await read_table_versions(tables))
+        header = request.headers.get("if-none-match")
+        if header and etag_matches(etag, header):
+            raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = cache_control
+
+    return Depends(check)
@@ -0,0 +1,191 @@
+"""Bulk paper ingestion with chunked upserts."""
+
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .authors import sync_paper_authors
+from .database import dialect_insert
+from .dependency_graph import libraries_containing, mark_dependents_stale
+from .entity_cache import invalidate_on_commit
+from .models import Library, Paper, library_papers
+from .schemas import PaperCreate, BulkIngestError, BulkIngestResult
+
+# Records written per transaction
+BULK_CHUNK_SIZE = 1000
+
+# Columns taken from the incoming record
+PAPER_COLUMNS = ("title", "abstract", "authors", "publish_date", "text_markdown")
+
+# Columns overwritten when an incoming paper id already exists
+UPSERT_COLUMNS = PAPER_COLUMNS + ("content_hash",)
+
+
+def upsert_papers(db: Session, papers: List[Tuple[str, PaperCreate]]) -> List[str]:
+    """Insert or update papers by id in a single executemany.
+
+    Existing rows keep their ``created_date``, and rows whose content hash
+    is unchanged are not rewritten, so re-ingesting the same papers fires no
+    update triggers. Returns the ids of existing papers whose content changed.
+    """
+    now = datetime.utcnow()
+    rows = []
+    for paper_id, paper in papers:
+        row = {"id": paper_id, "created_date": now, **paper.model_dump(include=set(PAPER_COLUMNS))}
+        row["content_hash"] = Paper.compute_content_hash(*(row[col] for col in PAPER_COLUMNS))
+        rows.append(row)
+
+    existing = dict(
+        db.query(Paper.id, Paper.content_hash).filter(Paper.id.in_([row["id"] for row in rows]))
+    )
+    changed = [
+        row["id"] for row in rows
+        if row["id"] in existing and existing[row["id"]] != row["content_hash"]
+    ]
+
+    stmt = dialect_insert(db, Paper.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={col: stmt.excluded[col] for col in UPSERT_COLUMNS},
+        where=Paper.content_hash.is_distinct_from(stmt.excluded.content_hash)
+    )
+    db.execute(stmt, rows)
+    written = set(changed)
+    sync_paper_authors(db, {
+        row["id"]: row["authors"] for row in rows if row["id"] not in existing or row["id"] in written
+    })
+    return changed
+
+
+def attach_papers(db: Session, library_id: str, paper_ids: Iterable[str]) -> int:
+    """Add papers to a library, ignoring ones that are already members.
+
+    Returns the number of papers newly added.
+    """
+    paper_ids = set(paper_ids)
+    if not paper_ids:
+        return 0
+    members = {
+        row.paper_id for row in db.query(library_papers.c.paper_id).filter(
+            library_papers.c.library_id == library_id,
+            library_papers.c.paper_id.in_(paper_ids)
+        )
+    }
+    rows = [{"library_id": library_id, "paper_id": paper_id} for paper_id in paper_ids - members]
+    if rows:
+        stmt = dialect_insert(db, library_papers).on_conflict_do_nothing()
+        db.execute(stmt, rows)
+    return len(rows)
+
+
+async def library_exists(db: AsyncSession, library_id: str) -> bool:
+    return await db.scalar(select(Library.id).where(Library.id == library_id)) is not None
+
+
+def write_chunk(db: Session, papers: Dict[str, PaperCreate], library_id: Optional[str]) -> int:
+    """Upsert papers and their library links, marking affected reports stale.
+
+    Returns the number of papers newly added to the library.
+    """
+    changed = upsert_papers(db, list(papers.items()))
+    if changed:
+        mark_dependents_stale(db, paper_ids=changed)
+        invalidate_on_commit(db, libraries_containing(db, changed))
+    attached = attach_papers(db, library_id, papers.keys()) if library_id else 0
+    if attached:
+        mark_dependents_stale(db, library_ids=[library_id])
+        invalidate_on_commit(db, [library_id])
+    return attached
+
+
+async def ingest_chunk(
+    db: AsyncSession,
+    chunk: List[Tuple[int, PaperCreate]],
+    library_id: Optional[str],
+    result: BulkIngestResult
+) -> None:
+    """Upsert one chunk of papers (and library links) in one transaction.
+
+    A single upsert statement may not touch the same row twice, so only the
+    last occurrence of an id within the chunk is written; earlier ones are
+    reported as failed records.
+    """
+    by_id = {}
+    for index, paper in chunk:
+        paper_id = paper.id or str(uuid.uuid4())
+        if paper_id in by_id:
+            result.failed += 1
+            result.errors.append(BulkIngestError(
+                index=by_id[paper_id][0], id=paper_id, error=f"Duplicate id, superseded by record {index}"
+            ))
+        by_id[paper_id] = (index, paper)
+
+    try:
+        attached = await db.run_sync(
+            write_chunk, {paper_id: paper for paper_id, (_, paper) in by_id.items()}, library_id
+        )
+        await db.commit()
+    except Exception as exc:
+        await db.rollback()
+        result.failed += len(by_id)
+        result.errors.extend(
+            BulkIngestError(index=index, id=paper_id, error=str(exc))
+            for paper_id, (index, _) in by_id.items()
+        )
+        return
+
+    result.upserted += len(by_id)
+    result.attached += attached
+
+
+async def iter_bulk_records(request: Request) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield ``(index, record, error)`` for each record in a bulk request body.
+
+    ``application/x-ndjson`` bodies are parsed line by line as they arrive;
+    anything else must be a JSON array.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/x-ndjson"):
+        index = 0
+        buffer = b""
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield (index, *_parse_line(line))
+                    index += 1
+        if buffer.strip():
+            yield (index, *_parse_line(buffer))
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {exc}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of papers")
+    for index, item in enumerate(items):
+        yield index, item, None
+
+
+def _parse_line(line: bytes) -> Tuple[Optional[dict], Optional[str]]:
+    try:
+        return json.loads(line), None
+    except ValueError as exc:
+        return None, f"Invalid JSON: {exc}"
+
+
+def validate_record(record: Optional[dict]) -> Tuple[Optional[PaperCreate], Optional[str]]:
+    """Validate one raw record against PaperCreate."""
+    try:
+        return PaperCreate.model_validate(record), None
+    except ValidationError as exc:
+        return None, str(exc)
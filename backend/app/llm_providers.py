@@ -0,0 +1,309 @@
+"""LLM provider clients with pooling, rate limiting, retries and batching.
+
+Each provider owns one keep-alive HTTP connection pool (``httpx.Client``)
+shared by every thread that calls it. Before each request, a per-model token
+bucket is charged so bursts are smoothed to the model's rate limit instead
+of turning into 429 storms. Rate-limit responses, server errors and timeouts
+are retried with exponential backoff and full jitter (honouring
+``Retry-After``). Providers that accept several prompts per request get them
+batched; the others fan out over the pool.
+
+Models are the ones offered by the Agent entity (gpt-4, gpt-3.5-turbo,
+claude-3). Setting ``LLM_PROVIDER=stub`` routes every model to the local
+stub server in ``llm_stub.py``.
+"""
+
+import os
+import random
+from abc import ABC, abstractmethod
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+# Provider serving each model, unless LLM_PROVIDER overrides it
+MODEL_PROVIDERS = {
+    "gpt-4": "openai",
+    "gpt-3.5-turbo": "openai",
+    "claude-3": "anthropic",
+}
+
+# Provider-side model ids for the Agent model names
+MODEL_ALIASES = {
+    "claude-3": "claude-3-opus-20240229",
+}
+
+# Default request rate limits per model (requests per minute)
+MODEL_REQUESTS_PER_MINUTE = {
+    "gpt-4": 500,
+    "gpt-3.5-turbo": 3500,
+    "claude-3": 1000,
+}
+
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER")  # Force one provider for all models
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "16"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "5"))
+LLM_BATCH_SIZE = int(os.environ.get("LLM_BATCH_SIZE", "16"))
+LLM_STUB_URL = os.environ.get("LLM_STUB_URL", "http://127.0.0.1:8765")
+
+# Statuses worth retrying: rate limited, overloaded or transient server errors
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class LLMError(Exception):
+    """A request failed for good (bad request, auth, or retries exhausted)."""
+
+
+# =============================================================================
+# Rate limiting and retries
+# =============================================================================
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` tokens per second."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until ``tokens`` are available; return False on timeout.
+
+        A request larger than the bucket waits for a full bucket and leaves
+        it in debt, so later callers pay for the overdraft.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        needed = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return True
+                wait = (needed - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the provider reported a rate limit."""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0, retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with full jitter, never shorter than ``retry_after``."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def model_bucket(model: str) -> TokenBucket:
+    """The shared rate limiter for one model.
+
+    ``LLM_REQUESTS_PER_MINUTE`` overrides the per-model defaults.
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(model)
+        if bucket is None:
+            rpm = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", MODEL_REQUESTS_PER_MINUTE.get(model, 60)))
+            # Allow a burst of up to a second's worth (at least one request)
+            bucket = _buckets[model] = TokenBucket(rpm / 60.0, capacity=max(rpm / 60.0, 1.0))
+        return bucket
+
+
+# =============================================================================
+# Providers
+# =============================================================================
+
+class LLMProvider(ABC):
+    """Base class: pooled HTTP client, rate limiting, retries and batching.
+
+    Subclasses build the provider's request payloads and parse responses.
+    Those whose API accepts several prompts per request set
+    ``supports_batching`` and override ``_complete_many``.
+    """
+
+    name = "base"
+    supports_batching = False
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        max_retries: int = LLM_MAX_RETRIES,
+        client: Optional[httpx.Client] = None
+    ):
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        if client is None:
+            client = httpx.Client(
+                base_url=base_url,
+                timeout=httpx.Timeout(timeout),
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections
+                )
+            )
+        # A given client (e.g. a TestClient over the stub app) keeps its own base URL and pool
+        client.headers.update(headers or {})
+        self.client = client
+        self._fanout = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix=f"llm-{self.name}")
+
+    def close(self) -> None:
+        self._fanout.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
+
+    def _post(self, model: str, path: str, payload: dict, cost: float = 1.0) -> dict:
+        """POST with rate limiting and retries; return the decoded JSON body."""
+        bucket = model_bucket(model)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire(cost)
+            retry_after = None
+            try:
+                response = self.client.post(path, json=payload)
+            except (httpx.TimeoutException, httpx.TransportError) as exc:
+                error = f"{type(exc).__name__}: {exc}"
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code not in RETRYABLE_STATUSES:
+                    raise LLMError(f"{self.name} request failed: {error}")
+                retry_after = _retry_after(response)
+                if response.status_code == 429:
+                    # Stop other threads from piling on while the limit resets
+                    bucket.drain()
+            if attempt < self.max_retries:
+                time.sleep(backoff_delay(attempt, retry_after=retry_after))
+        raise LLMError(f"{self.name} request failed after {self.max_retries + 1} attempts: {error}")
+
+    @abstractmethod
+    def complete(self, model: str, prompt: str, max_tokens: int = 1024) -> str:
+        """Complete one prompt."""
+
+    def _complete_many(self, model: str, prompts: List[str], max_tokens: int) -> List[str]:
+        """Complete one batch of prompts; one request per prompt by default."""
+        return [self.complete(model, prompt, max_tokens) for prompt in prompts]
+
+    def complete_batch(self, model: str, prompts: Sequence[str], max_tokens: int = 1024) -> List[str]:
+        """Complete several prompts, in batched requests when supported."""
+        prompts = list(prompts)
+        if self.supports_batching:
+            batches = [prompts[i:i + LLM_BATCH_SIZE] for i in range(0, len(prompts), LLM_BATCH_SIZE)]
+            results = self._fanout.map(lambda batch: self._complete_many(model, batch, max_tokens), batches)
+            return [text for batch in results for text in batch]
+        return list(self._fanout.map(lambda prompt: self.complete(model, prompt, max_tokens), prompts))
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions API."""
+
+    name = "openai"
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None, **kwargs):
+        api_key = api_key or os.environ.get("OPENAI_API_KEY", "")
+        super().__init__(
+            base_url or os.environ.get("OPENAI_BASE_URL", "https://api.openai.com"),
+            headers={"Authorization": f"Bearer {api_key}"},
+            **kwargs
+        )
+
+    def complete(self, model: str, prompt: str, max_tokens: int = 1024) -> str:
+        body = self._post(model, "/v1/chat/completions", {
+            "model": MODEL_ALIASES.get(model, model),
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+        })
+        return body["choices"][0]["message"]["content"]
+
+
+class AnthropicProvider(LLMProvider):
+    """Anthropic messages API."""
+
+    name = "anthropic"
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None, **kwargs):
+        super().__init__(
+            base_url or os.environ.get("ANTHROPIC_BASE_URL", "https://api.anthropic.com"),
+            headers={
+                "x-api-key": api_key or os.environ.get("ANTHROPIC_API_KEY", ""),
+                "anthropic-version": "2023-06-01",
+            },
+            **kwargs
+        )
+
+    def complete(self, model: str, prompt: str, max_tokens: int = 1024) -> str:
+        body = self._post(model, "/v1/messages", {
+            "model": MODEL_ALIASES.get(model, model),
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+        })
+        return "".join(block.get("text", "") for block in body["content"])
+
+
+class StubProvider(OpenAIProvider):
+    """The local stub server, which also accepts batched prompts."""
+
+    name = "stub"
+    supports_batching = True
+
+    def __init__(self, base_url: Optional[str] = None, **kwargs):
+        super().__init__(base_url or LLM_STUB_URL, api_key="stub", **kwargs)
+
+    def _complete_many(self, model: str, prompts: List[str], max_tokens: int) -> List[str]:
+        body = self._post(model, "/v1/batch", {
+            "model": model, "prompts": prompts, "max_tokens": max_tokens,
+        }, cost=len(prompts))
+        return body["completions"]
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "anthropic": AnthropicProvider,
+    "stub": StubProvider,
+}
+
+_providers: Dict[str, LLMProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(model: str) -> LLMProvider:
+    """The shared provider client serving ``model``."""
+    name = LLM_PROVIDER or MODEL_PROVIDERS.get(model)
+    if name not in PROVIDERS:
+        raise LLMError(f"No LLM provider for model: {model}")
+    with _providers_lock:
+        provider = _providers.get(name)
+        if provider is None:
+            provider = _providers[name] = PROVIDERS[name]()
+        return provider
+
+
+def close_providers() -> None:
+    with _providers_lock:
+        for provider in _providers.values():
+            provider.close()
+        _providers.clear()
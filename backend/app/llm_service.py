@@ -1,31 +1,50 @@
-"""Mock LLM service for report generation."""
+"""LLM service for report generation.
 
-from typing import List
+The ``mock`` and ``fake`` generators need no LLM; ``llm`` sends prompts to
+the model in LLM_MODEL through the provider layer in ``llm_providers.py``.
+"""
+
+import os
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+from .llm_providers import get_provider
 from .models import Paper
+from .retrieval import Excerpt
 
+# Yields report markdown chunk by chunk: (papers, template_prompt, user_prompt, excerpts)
+ReportGenerator = Callable[[List[Paper], str, Optional[str], Optional[List[Excerpt]]], Iterator[str]]
 
-def generate_report_content(
-    papers: List[Paper],
-    template_prompt: str,
-    user_prompt: str | None = None
-) -> str:
-    """
-    Mock LLM report generation.
-    
-    In a real implementation, this would call an LLM API (OpenAI, Anthropic, etc.)
-    with the papers content and prompts.
-    """
-    # Build a summary of papers for the mock
+# Characters of each excerpt quoted in the mock report
+EXCERPT_PREVIEW_CHARS = 300
+
+# Model used by the llm generator; one of the Agent models
+LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-4")
+
+
+def _papers_list(papers: List[Paper]) -> str:
     paper_summaries = []
     for p in papers:
         authors = p.authors or "Unknown authors"
         date = p.publish_date.strftime("%Y-%m-%d") if p.publish_date else "Unknown date"
         paper_summaries.append(f"- **{p.title}** by {authors} ({date})")
-    
-    papers_list = "\n".join(paper_summaries) if paper_summaries else "_No papers in selected libraries_"
-    
-    # Mock generated report
-    report_content = f"""# Generated Report
+
+    return "\n".join(paper_summaries) if paper_summaries else "_No papers in selected libraries_"
+
+
+def stream_report_content(
+    papers: List[Paper],
+    template_prompt: str,
+    user_prompt: str | None = None,
+    excerpts: Optional[List[Excerpt]] = None
+) -> Iterator[str]:
+    """
+    Mock LLM report generation, yielding the report one section at a time.
+
+    In a real implementation, this would stream tokens from an LLM API
+    (OpenAI, Anthropic, etc.) with the prompts and the retrieved excerpts
+    as context.
+    """
+    yield f"""# Generated Report
 
 ## Overview
 
@@ -35,25 +54,44 @@ This report was generated based on **{len(papers)}** papers from the selected li
 > {template_prompt}
 
 {f"### User Request" + chr(10) + f"> {user_prompt}" + chr(10) if user_prompt else ""}
+"""
 
+    yield f"""
 ---
 
 ## Papers Analyzed
 
-{papers_list}
+{_papers_list(papers)}
+"""
+
+    if excerpts:
+        quoted = "\n\n".join(
+            f"> {' '.join(e.text[:EXCERPT_PREVIEW_CHARS].split())}\n>\n> — *{e.title}* (relevance {e.score:.2f})"
+            for e in excerpts
+        )
+        yield f"""
+---
+
+## Relevant Excerpts
+
+{quoted}
+"""
 
+    yield """
 ---
 
 ## Summary
 
-This is a **mock report** generated by the PipelineCraft system. In a production environment, 
+This is a **mock report** generated by the PipelineCraft system. In a production environment,
 this content would be generated by an LLM (such as GPT-4, Claude, or similar) that would:
 
 1. Analyze the full text of all papers
 2. Follow the template instructions
 3. Generate insights based on the user's prompt
 4. Produce a comprehensive literature review or analysis
+"""
 
+    yield f"""
 ---
 
 ## Key Findings
@@ -63,13 +101,146 @@ this content would be generated by an LLM (such as GPT-4, Claude, or similar) th
 Based on analysis of the {len(papers)} papers:
 
 - **Common Themes**: To be generated by LLM
-- **Research Gaps**: To be generated by LLM  
+- **Research Gaps**: To be generated by LLM
 - **Recommendations**: To be generated by LLM
+"""
 
+    yield f"""
 ---
 
-*Report generated at: {{timestamp}}*
+*Report generated at: {datetime.utcnow().isoformat()}*
 """
-    
-    from datetime import datetime
-    return report_content.replace("{{timestamp}}", datetime.utcnow().isoformat())
+
+
+def fake_report_stream(
+    papers: List[Paper],
+    template_prompt: str,
+    user_prompt: str | None = None,
+    excerpts: Optional[List[Excerpt]] = None
+) -> Iterator[str]:
+    """
+    Deterministic report generator for tests.
+
+    Yields one chunk for the prompts, one per paper and one per excerpt,
+    with no timestamps, so the same inputs always produce the same chunks.
+    """
+    yield f"# Report\n\nTemplate: {template_prompt}\nRequest: {user_prompt or '-'}\n"
+    for p in papers:
+        yield f"- {p.id}: {p.title}\n"
+    for e in excerpts or []:
+        yield f"> {e.paper_id}: {e.text[:40]}\n"
+
+
+def build_report_prompt(
+    papers: List[Paper],
+    template_prompt: str,
+    user_prompt: str | None = None,
+    excerpts: Optional[List[Excerpt]] = None
+) -> str:
+    """The single prompt sent to the LLM for a report."""
+    sections = [template_prompt]
+    if user_prompt:
+        sections.append(f"User request: {user_prompt}")
+    sections.append(f"Papers:\n{_papers_list(papers)}")
+    if excerpts:
+        sections.append("Context:\n\n" + "\n\n".join(f"[{e.title}]\n{e.text}" for e in excerpts))
+    return "\n\n".join(sections)
+
+
+def llm_report_stream(
+    papers: List[Paper],
+    template_prompt: str,
+    user_prompt: str | None = None,
+    excerpts: Optional[List[Excerpt]] = None
+) -> Iterator[str]:
+    """Generate the report with the configured LLM provider.
+
+    The providers do not stream yet, so the whole completion arrives as one
+    chunk: followers see nothing until the model has finished.
+    """
+    prompt = build_report_prompt(papers, template_prompt, user_prompt, excerpts)
+    yield get_provider(LLM_MODEL).complete(LLM_MODEL, prompt)
+
+
+# Characters of source text kept by the mock per-paper summary
+SUMMARY_SOURCE_CHARS = 400
+
+SUMMARY_PROMPT = "Summarize the key contributions and findings of this paper in a few sentences."
+
+
+def summarize_paper(paper: Paper) -> str:
+    """
+    Mock map step: summarize a single paper.
+
+    In a real implementation, this would ask the LLM for a short summary of
+    the paper's full text.
+    """
+    source = " ".join((paper.abstract or paper.text_markdown or "").split())
+    if len(source) > SUMMARY_SOURCE_CHARS:
+        source = source[:SUMMARY_SOURCE_CHARS].rsplit(" ", 1)[0] + " …"
+    return f"**{paper.title}**: {source or 'No text available.'}"
+
+
+def summarize_papers(papers: List[Paper]) -> List[str]:
+    """Map step for a batch of papers; one request per batch when the provider allows."""
+    if report_generator_name() != "llm":
+        return [summarize_paper(p) for p in papers]
+    prompts = [f"{SUMMARY_PROMPT}\n\n{paper_text}" for paper_text in map(_paper_source, papers)]
+    return get_provider(LLM_MODEL).complete_batch(LLM_MODEL, prompts)
+
+
+def _paper_source(paper: Paper) -> str:
+    return "\n\n".join(part for part in (paper.title, paper.abstract, paper.text_markdown) if part)
+
+
+def combine_summaries(summaries: List[str], template_prompt: str) -> str:
+    """
+    Reduce step: merge several summaries into one.
+
+    The mock generators just list them; the llm generator asks the model to
+    synthesize them following the template prompt.
+    """
+    if report_generator_name() == "llm":
+        prompt = (
+            f"{template_prompt}\n\nCombine these summaries into one, keeping what matters "
+            "for the instructions above:\n\n" + "\n\n".join(summaries)
+        )
+        return get_provider(LLM_MODEL).complete(LLM_MODEL, prompt)
+    return "\n".join(f"- {summary}" for summary in summaries)
+
+
+def summarizer_name() -> str:
+    """Identifies the map/reduce model, for caching summaries."""
+    return f"{generator_signature()}-summary-v1"
+
+
+REPORT_GENERATORS: Dict[str, ReportGenerator] = {
+    "mock": stream_report_content,
+    "fake": fake_report_stream,
+    "llm": llm_report_stream,
+}
+
+
+def report_generator_name() -> str:
+    """Name of the generator selected by the REPORT_GENERATOR env variable."""
+    return os.environ.get("REPORT_GENERATOR", "mock")
+
+
+def generator_signature() -> str:
+    """Identifies the generator (and model), for cache keys."""
+    name = report_generator_name()
+    return f"llm:{LLM_MODEL}" if name == "llm" else name
+
+
+def get_report_generator() -> ReportGenerator:
+    return REPORT_GENERATORS[report_generator_name()]
+
+
+def generate_report_content(
+    papers: List[Paper],
+    template_prompt: str,
+    user_prompt: str | None = None,
+    excerpts: Optional[List[Excerpt]] = None
+) -> str:
+    """Generate the whole report in one call."""
+    return "".join(get_report_generator()(papers, template_prompt, user_prompt, excerpts))
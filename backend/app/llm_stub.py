@@ -0,0 +1,113 @@
+"""Local stub LLM server for development and tests.
+
+Speaks enough of the OpenAI chat completions and Anthropic messages APIs for
+the providers in ``llm_providers.py``, plus a ``/v1/batch`` endpoint that
+completes several prompts per request. Completions are deterministic echoes
+of the prompt. Latency and rate limiting can be simulated to exercise
+retries and backoff:
+
+    STUB_LATENCY_MS=200 STUB_REQUESTS_PER_SECOND=5 \
+        uvicorn app.llm_stub:app --port 8765
+
+and point the backend at it with ``LLM_PROVIDER=stub``.
+"""
+
+import hashlib
+import os
+import time
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from .llm_providers import TokenBucket
+
+STUB_LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "0"))
+STUB_REQUESTS_PER_SECOND = float(os.environ.get("STUB_REQUESTS_PER_SECOND", "0"))  # 0 = unlimited
+
+# Characters of the prompt echoed back in a completion
+ECHO_CHARS = 200
+
+app = FastAPI(title="PipelineCraft LLM stub")
+
+_limiter = TokenBucket(STUB_REQUESTS_PER_SECOND) if STUB_REQUESTS_PER_SECOND > 0 else None
+
+
+class Message(BaseModel):
+    role: str
+    content: str
+
+
+class ChatRequest(BaseModel):
+    model: str
+    messages: List[Message]
+    max_tokens: Optional[int] = None
+
+
+class BatchRequest(BaseModel):
+    model: str
+    prompts: List[str]
+    max_tokens: Optional[int] = None
+
+
+def stub_completion(model: str, prompt: str) -> str:
+    digest = hashlib.sha256(f"{model}:{prompt}".encode()).hexdigest()[:8]
+    echo = " ".join(prompt.split())[:ECHO_CHARS]
+    return f"[{model} {digest}] {echo}"
+
+
+def _simulate(cost: int = 1) -> Optional[Response]:
+    """Apply simulated latency; return a 429 response when over the rate limit."""
+    if _limiter is not None and not _limiter.acquire(cost, timeout=0):
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"type": "rate_limit", "message": "Stub rate limit exceeded"}},
+            headers={"Retry-After": f"{cost / _limiter.rate:.3f}"}
+        )
+    if STUB_LATENCY_MS:
+        time.sleep(STUB_LATENCY_MS / 1000)
+    return None
+
+
+def _last_user_message(messages: List[Message]) -> str:
+    for message in reversed(messages):
+        if message.role == "user":
+            return message.content
+    raise HTTPException(status_code=400, detail="No user message")
+
+
+@app.post("/v1/chat/completions")
+def chat_completions(data: ChatRequest):
+    limited = _simulate()
+    if limited:
+        return limited
+    text = stub_completion(data.model, _last_user_message(data.messages))
+    return {
+        "object": "chat.completion",
+        "model": data.model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+    }
+
+
+@app.post("/v1/messages")
+def messages(data: ChatRequest):
+    limited = _simulate()
+    if limited:
+        return limited
+    text = stub_completion(data.model, _last_user_message(data.messages))
+    return {
+        "type": "message",
+        "model": data.model,
+        "role": "assistant",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+    }
+
+
+@app.post("/v1/batch")
+def batch(data: BatchRequest):
+    limited = _simulate(len(data.prompts))
+    if limited:
+        return limited
+    return {"model": data.model, "completions": [stub_completion(data.model, p) for p in data.prompts]}
@@ -0,0 +1,159 @@
+"""Buffered, batched writer for log entries.
+
+``POST /api/logs`` used to cost one transaction (and fsync) per entry. Entries
+are now appended to an in-memory buffer and written by a background task in
+one multi-row INSERT once ``LOG_FLUSH_SIZE`` entries are waiting or
+``LOG_FLUSH_SECONDS`` have passed. If the buffer reaches ``LOG_MAX_BUFFER``,
+the submitter flushes inline, which applies backpressure.
+
+The same task enforces retention. Entries older than ``LOG_RETENTION_DAYS``
+are rolled up into daily per-level counts in ``log_rollups`` and then
+deleted, so the ``logs`` table (and its created_date index) stays small.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import String, cast, func, insert, select
+from sqlalchemy.orm import Session
+
+from .database import dialect_insert, get_async_session
+from .models import Log, LogRollup
+
+LOG_FLUSH_SIZE = int(os.environ.get("LOG_FLUSH_SIZE", "500"))
+LOG_FLUSH_SECONDS = float(os.environ.get("LOG_FLUSH_SECONDS", "1.0"))
+LOG_MAX_BUFFER = int(os.environ.get("LOG_MAX_BUFFER", "10000"))
+LOG_RETENTION_DAYS = int(os.environ.get("LOG_RETENTION_DAYS", "30"))  # 0 keeps everything
+LOG_RETENTION_INTERVAL_SECONDS = float(os.environ.get("LOG_RETENTION_INTERVAL_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+
+def roll_up_logs(db: Session, cutoff: datetime) -> int:
+    """Fold entries older than ``cutoff`` into log_rollups and delete them.
+
+    Returns the number of entries removed.
+    """
+    day = func.substr(cast(Log.created_date, String), 1, 10)
+    rows = db.execute(
+        select(day.label("day"), Log.level, Log.entityId, func.count().label("count"))
+        .where(Log.created_date < cutoff)
+        .group_by(day, Log.level, Log.entityId)
+    ).all()
+    if not rows:
+        return 0
+
+    stmt = dialect_insert(db, LogRollup.__table__)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[LogRollup.key],
+            set_={"count": LogRollup.count + stmt.excluded.count}
+        ),
+        [
+            {
+                "key": f"{row.day}|{row.level}|{row.entityId or ''}",
+                "day": row.day, "level": row.level, "entityId": row.entityId, "count": row.count,
+            }
+            for row in rows
+        ]
+    )
+    result = db.execute(Log.__table__.delete().where(Log.created_date < cutoff))
+    return result.rowcount
+
+
+class LogSink:
+    """In-memory log buffer flushed to the database in batches."""
+
+    def __init__(
+        self,
+        flush_size: int = LOG_FLUSH_SIZE,
+        flush_seconds: float = LOG_FLUSH_SECONDS,
+        max_buffer: int = LOG_MAX_BUFFER
+    ):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self.flushes = 0
+        self.written = 0
+        self._buffer: List[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def start(self) -> None:
+        """Start the background flush task on the running event loop."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out whatever is buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def submit(self, entries: List[dict]) -> None:
+        """Queue Log column dicts for writing."""
+        self._buffer.extend(entries)
+        if len(self._buffer) >= self.max_buffer or self._task is None:
+            # Over the bound, or no background task to hand off to
+            await self.flush()
+        elif len(self._buffer) >= self.flush_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write every buffered entry in one transaction; return how many."""
+        async with self._flush_lock:
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            try:
+                async with get_async_session() as db:
+                    await db.execute(insert(Log), batch)
+            except Exception:
+                # Keep the entries (ahead of newer ones) for the next attempt
+                self._buffer[:0] = batch
+                raise
+            self.flushes += 1
+            self.written += len(batch)
+            return len(batch)
+
+    async def apply_retention(self, retention_days: int = LOG_RETENTION_DAYS) -> int:
+        """Roll up and delete entries older than the retention period."""
+        if retention_days <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        async with get_async_session() as db:
+            return await db.run_sync(roll_up_logs, cutoff)
+
+    async def _run(self) -> None:
+        last_retention = None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                if last_retention is None or time.monotonic() - last_retention >= LOG_RETENTION_INTERVAL_SECONDS:
+                    last_retention = time.monotonic()
+                    await self.apply_retention()
+            except Exception:
+                logger.exception("Log flush failed; will retry")
+
+
+log_sink = LogSink()
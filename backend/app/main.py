@@ -1,30 +1,61 @@
 """FastAPI main application."""
 
+import json
+import time
 import uuid
 from datetime import datetime
-from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException
+from typing import AsyncIterator, Dict, FrozenSet, List, Optional, Tuple
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-
-from .database import init_db, get_db
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload, defer
+
+from .database import init_db, get_async_db, get_async_session
+from .migrations import run_migrations
 from .models import (
-    Library, Template, Report, Paper,
-    Folder as FolderModel, Log as LogModel,
+    Library, Template, Report, Paper, ReportLibrary, Author, library_papers, paper_authors,
+    ENTITY_MODELS, EntityRecord,
+    Folder as FolderModel, Log as LogModel, LogRollup as LogRollupModel,
     Branch as BranchModel, EntityVersion as EntityVersionModel
 )
 from .schemas import (
     LibraryCreate, LibraryResponse, LibrarySummary,
     TemplateCreate, TemplateResponse,
-    ReportCreate, ReportResponse,
-    PaperCreate, PaperResponse,
-    Entity, EntityConfig, EntityData, Folder, Log,
-    Branch, EntityVersion
+    ReportCreate, ReportResponse, ReportStatus, ReportContext, ReportCacheStats, RefreshResult,
+    PaperCreate, PaperResponse, PaperSearchHit, BulkIngestError, BulkIngestResult,
+    BulkDeleteRequest, BulkDeleteResult,
+    Entity, EntityCacheStats, EntityConfig, EntityData, EntityMove,
+    Folder, FolderCounts, FolderCreate, FolderMove, Log, LogCreate, LogBulkResult, LogRollup,
+    Branch, BranchCreate, EntityVersion, EntityVersionCreate, VersionDiff, VersionStoreStats, ViewMode, Page
+)
+from .authors import sync_paper_authors
+from .dependency_graph import dependent_report_ids, mark_dependents_stale, report_dependencies
+from .entity_cache import entity_cache, invalidate_on_commit
+from .entity_delete import delete_entities
+from .folder_tree import ENTITY_FOLDERS, folder_counts, folder_path, move_folder, subtree_folder_ids, subtree_folders
+from .report_cache import report_cache
+from .search import search_papers
+from .http_cache import conditional_get
+from .llm_providers import close_providers
+from .log_sink import log_sink
+from .report_jobs import REPORT_WORKERS, cached_report_content, report_queue
+from .ingest_service import (
+    BULK_CHUNK_SIZE, attach_papers, ingest_chunk, iter_bulk_records,
+    library_exists, validate_record
 )
-from .llm_service import generate_report_content
+from .version_graph import Ancestry, checkout, diff_versions
+from .version_store import create_version, latest_version, version_states, version_store_stats
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_rows, page_from_rows, paginate_async
 
 app = FastAPI(title="PipelineCraft API", version="1.0.0")
 
+# Responses smaller than this are not worth compressing
+GZIP_MINIMUM_SIZE = 1024
+
 # CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -32,12 +63,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Compress large responses (report markdown, entity pages) for clients that
+# accept gzip; server-sent event streams are left uncompressed.
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
 
 @app.on_event("startup")
 def startup():
     init_db()
+    run_migrations()
+    report_queue.start()
+    report_queue.resume()
+    log_sink.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    report_queue.shutdown()
+    close_providers()
+    await log_sink.stop()
 
 
 # =============================================================================
@@ -48,24 +95,72 @@ def generate_id() -> str:
     return str(uuid.uuid4())
 
 
-def library_to_entity(lib: Library) -> Entity:
-    """Convert Library model to Entity schema."""
-    papers = [PaperResponse(
+PageLimit = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+
+# Tables each kind of response is built from, for ETags
+ENTITY_TABLES = ("libraries", "library_papers", "papers", "templates", "reports", "report_libraries", "folders")
+REPORT_TABLES = ("reports", "report_libraries")
+
+# Rows fetched per round-trip by the streaming NDJSON exports
+EXPORT_BATCH_SIZE = 500
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+# Large paper columns that are only loaded when a caller asks for them
+PAPER_BODY_FIELDS: FrozenSet[str] = frozenset({"abstract", "text_markdown"})
+
+
+def resolve_paper_fields(view: str, fields: Optional[str]) -> FrozenSet[str]:
+    """Work out which paper body columns a listing request should include.
+
+    ``view=full`` includes every body column; otherwise only the
+    comma-separated ``fields`` are included on top of the summary columns.
+    """
+    if view == "full":
+        return PAPER_BODY_FIELDS
+    if not fields:
+        return frozenset()
+    requested = frozenset(f.strip() for f in fields.split(",") if f.strip())
+    unknown = requested - PAPER_BODY_FIELDS
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown paper fields: {', '.join(sorted(unknown))}"
+        )
+    return requested
+
+
+def paper_load_options(paper_fields: FrozenSet[str]) -> list:
+    """Loader options that skip the paper body columns not being returned."""
+    return [defer(getattr(Paper, f)) for f in sorted(PAPER_BODY_FIELDS - paper_fields)]
+
+
+def paper_to_response(p: Paper, paper_fields: FrozenSet[str] = PAPER_BODY_FIELDS) -> PaperResponse:
+    """Convert Paper model to PaperResponse, leaving excluded body columns unset.
+
+    Excluded columns are never touched, so deferred attributes stay unloaded.
+    """
+    return PaperResponse(
         id=p.id,
         title=p.title,
-        abstract=p.abstract,
+        abstract=p.abstract if "abstract" in paper_fields else None,
         authors=p.authors,
         publish_date=p.publish_date,
-        text_markdown=p.text_markdown,
+        text_markdown=p.text_markdown if "text_markdown" in paper_fields else None,
         created_date=p.created_date
-    ) for p in lib.papers]
+    )
+
+
+def library_to_entity(lib: Library, paper_fields: FrozenSet[str] = PAPER_BODY_FIELDS) -> Entity:
+    """Convert Library model to Entity schema."""
+    papers = [paper_to_response(p, paper_fields) for p in lib.papers]
     
     return Entity(
         id=lib.id,
         name=lib.name,
         type="library",
         status="ok",
-        folderId="folder-libraries",
+        folderId=lib.folderId or ENTITY_FOLDERS["library"],
         dependencies=[],
         config=EntityConfig(description=lib.description),
         data=EntityData(papers=papers, paper_count=len(papers)),
@@ -73,6 +168,14 @@ def library_to_entity(lib: Library) -> Entity:
     )
 
 
+def report_context(rpt: Report) -> Optional[ReportContext]:
+    """The recorded LLM context of a generated report, if any."""
+    if rpt.context_tokens is None:
+        return None
+    papers = json.loads(rpt.context_papers) if rpt.context_papers else {}
+    return ReportContext(tokens=rpt.context_tokens, **papers)
+
+
 def template_to_entity(tmpl: Template) -> Entity:
     """Convert Template model to Entity schema."""
     return Entity(
@@ -80,7 +183,7 @@ def template_to_entity(tmpl: Template) -> Entity:
         name=tmpl.name,
         type="template",
         status="ok",
-        folderId="folder-templates",
+        folderId=tmpl.folderId or ENTITY_FOLDERS["template"],
         dependencies=[],
         config=EntityConfig(description=tmpl.description),
         data=EntityData(prompt=tmpl.prompt),
@@ -88,33 +191,43 @@ def template_to_entity(tmpl: Template) -> Entity:
     )
 
 
-def report_to_entity(rpt: Report, db: Session) -> Entity:
-    """Convert Report model to Entity schema."""
-    library_ids = rpt.library_ids.split(",") if rpt.library_ids else []
+def report_to_entity(
+    rpt: Report,
+    db: Session,
+    library_names_by_id: Optional[Dict[str, str]] = None,
+    template_names_by_id: Optional[Dict[str, str]] = None
+) -> Entity:
+    """Convert Report model to Entity schema.
+
+    When converting many reports at once, pass pre-built name lookup maps so
+    no per-report queries are issued.
+    """
+    library_ids = rpt.library_ids
     
     # Get library names for display
     library_names = []
     if library_ids:
-        libs = db.query(Library).filter(Library.id.in_(library_ids)).all()
-        library_names = [l.name for l in libs]
+        if library_names_by_id is None:
+            libs = db.query(Library).filter(Library.id.in_(library_ids)).all()
+            library_names = [l.name for l in libs]
+        else:
+            library_names = [library_names_by_id[i] for i in library_ids if i in library_names_by_id]
     
     # Get template name
     template_name = None
-    if rpt.template:
-        template_name = rpt.template.name
-    
-    # Dependencies: template + libraries
-    dependencies = library_ids.copy()
     if rpt.template_id:
-        dependencies.append(rpt.template_id)
+        if template_names_by_id is None:
+            template_name = rpt.template.name if rpt.template else None
+        else:
+            template_name = template_names_by_id.get(rpt.template_id)
     
     return Entity(
         id=rpt.id,
         name=rpt.name,
         type="report",
         status=rpt.status,
-        folderId="folder-reports",
-        dependencies=dependencies,
+        folderId=rpt.folderId or ENTITY_FOLDERS["report"],
+        dependencies=report_dependencies(rpt),
         config=EntityConfig(description=rpt.user_prompt),
         data=EntityData(
             content_markdown=rpt.content_markdown,
@@ -125,99 +238,312 @@ def report_to_entity(rpt: Report, db: Session) -> Entity:
     )
 
 
+def entity_cache_variant(entity_type: str, version: int, paper_fields: FrozenSet[str]) -> str:
+    """Cache variant of an entity payload: its registry version and, for
+    libraries, which paper bodies are included."""
+    fields = ",".join(sorted(paper_fields)) if entity_type == "library" else ""
+    return f"{version}|{fields}"
+
+
+def build_entities(
+    db: Session,
+    refs: List[Tuple[str, str, int]],
+    paper_fields: FrozenSet[str]
+) -> Dict[str, str]:
+    """Serialized Entity JSON for ``(id, type, registry version)`` refs, by id.
+
+    Payloads come from the entity cache where possible; only the misses are
+    loaded, in one query per entity type, and then cached.
+    """
+    variants = {
+        entity_id: entity_cache_variant(t, version, paper_fields) for entity_id, t, version in refs
+    }
+    payloads, versions = entity_cache.get_many(list(variants.items()))
+    missing: Dict[str, List[str]] = {}
+    for entity_id, t, _ in refs:
+        if entity_id not in payloads:
+            missing.setdefault(t, []).append(entity_id)
+
+    entities = []
+    if "library" in missing:
+        libraries = db.query(Library).options(
+            selectinload(Library.papers).options(*paper_load_options(paper_fields))
+        ).filter(Library.id.in_(missing["library"]))
+        entities.extend(library_to_entity(lib, paper_fields) for lib in libraries)
+    if "template" in missing:
+        templates = db.query(Template).filter(Template.id.in_(missing["template"]))
+        entities.extend(template_to_entity(tmpl) for tmpl in templates)
+    if "report" in missing:
+        reports = db.query(Report).filter(Report.id.in_(missing["report"])).all()
+        library_ids = {i for r in reports for i in r.library_ids}
+        template_ids = {r.template_id for r in reports if r.template_id}
+        library_names_by_id = dict(
+            db.query(Library.id, Library.name).filter(Library.id.in_(library_ids)).all()
+        ) if library_ids else {}
+        template_names_by_id = dict(
+            db.query(Template.id, Template.name).filter(Template.id.in_(template_ids)).all()
+        ) if template_ids else {}
+        entities.extend(
+            report_to_entity(rpt, db, library_names_by_id, template_names_by_id) for rpt in reports
+        )
+
+    loaded = []
+    for entity in entities:
+        payload = entity.model_dump_json()
+        payloads[entity.id] = payload
+        loaded.append((entity.id, variants[entity.id], versions[entity.id], payload))
+    entity_cache.put_many(loaded)
+    return payloads
+
+
+def load_entity_page(
+    db: Session,
+    paper_fields: FrozenSet[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    folder_id: Optional[str] = None,
+    status: Optional[str] = None,
+    recursive: bool = False
+) -> Tuple[List[str], Optional[str]]:
+    """Build one keyset page of serialized entities in a fixed number of queries.
+
+    The entities registry is range-scanned for at most ``limit + 1`` rows
+    after the cursor, with every filter applied to that one narrow table,
+    so the cost of a page does not depend on table size. Entities are then
+    built by build_entities, which only loads those missing from the entity
+    cache. Returns the page's JSON payloads in order and the next cursor.
+
+    With ``recursive``, entities anywhere under ``folder_id`` are included.
+    """
+    query = db.query(EntityRecord.id, EntityRecord.type, EntityRecord.version, EntityRecord.created_date)
+    if entity_type:
+        query = query.filter(EntityRecord.type == entity_type)
+    if status:
+        query = query.filter(EntityRecord.status == status)
+    if folder_id and recursive:
+        path = db.query(FolderModel.path).filter(FolderModel.id == folder_id).scalar()
+        if path is None:
+            return [], None
+        query = query.filter(EntityRecord.folderId.in_(subtree_folder_ids(path)))
+    elif folder_id:
+        query = query.filter(EntityRecord.folderId == folder_id)
+    page, next_cursor = page_from_rows(keyset_rows(query, EntityRecord, limit, cursor), limit)
+
+    payloads = build_entities(db, [(row.id, row.type, row.version) for row in page], paper_fields)
+    return [payloads[row.id] for row in page if row.id in payloads], next_cursor
+
+
+async def lookup_entity(db: AsyncSession, entity_id: str):
+    """The registry row ``(id, type, version)`` of an entity, or None."""
+    return (await db.execute(
+        select(EntityRecord.id, EntityRecord.type, EntityRecord.version).where(EntityRecord.id == entity_id)
+    )).first()
+
+
+def raw_json_response(body: str, response: Response) -> Response:
+    """Return pre-serialized JSON, keeping headers set by dependencies (e.g. ETag)."""
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
+
+
 # =============================================================================
 # Entities API (for frontend compatibility)
 # =============================================================================
 
-@app.get("/api/entities", response_model=List[Entity])
-def list_entities(db: Session = Depends(get_db)):
-    """List all entities (libraries, templates, reports) for the frontend."""
-    entities = []
-    
-    # Libraries
-    libraries = db.query(Library).all()
-    entities.extend([library_to_entity(lib) for lib in libraries])
-    
-    # Templates
-    templates = db.query(Template).all()
-    entities.extend([template_to_entity(tmpl) for tmpl in templates])
-    
-    # Reports
-    reports = db.query(Report).all()
-    entities.extend([report_to_entity(rpt, db) for rpt in reports])
-    
-    return entities
+@app.get(
+    "/api/entities", response_model=Page[Entity],
+    dependencies=[conditional_get("entity", ENTITY_TABLES)]
+)
+async def list_entities(
+    response: Response,
+    view: ViewMode = "summary",
+    fields: Optional[str] = Query(None, description="Comma-separated paper body fields to include"),
+    type: Optional[str] = None,
+    folder_id: Optional[str] = None,
+    recursive: bool = Query(False, description="Include entities in subfolders of folder_id"),
+    status: Optional[str] = None,
+    limit: int = PageLimit,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List entities (libraries, templates, reports) for the frontend, one page at a time.
+
+    Paper bodies are omitted unless requested via ``view=full`` or ``fields``.
+    Entities are served pre-serialized from the entity cache.
+    """
+    payloads, next_cursor = await db.run_sync(
+        load_entity_page, resolve_paper_fields(view, fields), limit, cursor,
+        entity_type=type, folder_id=folder_id, status=status, recursive=recursive
+    )
+    body = '{"items":[%s],"next_cursor":%s}' % (",".join(payloads), json.dumps(next_cursor))
+    return raw_json_response(body, response)
+
+
+@app.get("/api/entities/export")
+async def export_entities(
+    view: ViewMode = "summary",
+    fields: Optional[str] = Query(None, description="Comma-separated paper body fields to include"),
+    type: Optional[str] = None,
+    folder_id: Optional[str] = None,
+    recursive: bool = Query(False, description="Include entities in subfolders of folder_id"),
+    status: Optional[str] = None
+):
+    """Stream every entity as NDJSON, one JSON object per line.
+
+    Entities are built one keyset page at a time, so memory stays bounded
+    by the batch size rather than the number of entities.
+    """
+    paper_fields = resolve_paper_fields(view, fields)
+
+    async def generate() -> AsyncIterator[str]:
+        # The request-scoped session is closed before streaming starts
+        async with get_async_session() as db:
+            cursor = None
+            while True:
+                payloads, cursor = await db.run_sync(
+                    load_entity_page, paper_fields, EXPORT_BATCH_SIZE, cursor,
+                    entity_type=type, folder_id=folder_id, status=status, recursive=recursive
+                )
+                for payload in payloads:
+                    yield payload + "\n"
+                db.expunge_all()
+                if not cursor:
+                    break
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@app.get(
+    "/api/entities/{entity_id}", response_model=Entity,
+    dependencies=[conditional_get("entity", ENTITY_TABLES)]
+)
+async def get_entity(
+    entity_id: str,
+    response: Response,
+    view: ViewMode = "full",
+    fields: Optional[str] = Query(None, description="Comma-separated paper body fields to include"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a single entity by ID."""
+    paper_fields = resolve_paper_fields(view, fields)
 
+    record = await lookup_entity(db, entity_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Entity not found")
 
-@app.get("/api/entities/{entity_id}", response_model=Entity)
-def get_entity(entity_id: str, db: Session = Depends(get_db)):
-    """Get a single entity by ID."""
-    # Try library
-    lib = db.query(Library).filter(Library.id == entity_id).first()
-    if lib:
-        return library_to_entity(lib)
-    
-    # Try template
-    tmpl = db.query(Template).filter(Template.id == entity_id).first()
-    if tmpl:
-        return template_to_entity(tmpl)
-    
-    # Try report
-    rpt = db.query(Report).filter(Report.id == entity_id).first()
-    if rpt:
-        return report_to_entity(rpt, db)
-    
-    raise HTTPException(status_code=404, detail="Entity not found")
+    payloads = await db.run_sync(build_entities, [tuple(record)], paper_fields)
+    if entity_id not in payloads:
+        # Deleted between the two queries
+        raise HTTPException(status_code=404, detail="Entity not found")
+    return raw_json_response(payloads[entity_id], response)
 
 
 @app.delete("/api/entities/{entity_id}")
-def delete_entity(entity_id: str, db: Session = Depends(get_db)):
-    """Delete an entity by ID."""
-    # Try library
-    lib = db.query(Library).filter(Library.id == entity_id).first()
-    if lib:
-        db.delete(lib)
-        db.commit()
-        return {"status": "deleted"}
-    
-    # Try template
-    tmpl = db.query(Template).filter(Template.id == entity_id).first()
-    if tmpl:
-        db.delete(tmpl)
-        db.commit()
-        return {"status": "deleted"}
-    
-    # Try report
-    rpt = db.query(Report).filter(Report.id == entity_id).first()
-    if rpt:
-        db.delete(rpt)
-        db.commit()
-        return {"status": "deleted"}
-    
-    raise HTTPException(status_code=404, detail="Entity not found")
+async def delete_entity(entity_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Delete an entity by ID, cascading to its links and dependent reports."""
+    result = await db.run_sync(delete_entities, [entity_id])
+    if not result.deleted:
+        raise HTTPException(status_code=404, detail="Entity not found")
+    await db.commit()
+    return {"status": "deleted"}
+
+
+@app.post("/api/entities/bulk-delete", response_model=BulkDeleteResult)
+async def bulk_delete_entities(data: BulkDeleteRequest, db: AsyncSession = Depends(get_async_db)):
+    """Delete many entities of any type in one transaction.
+
+    Ids that match no entity are listed in ``not_found``; reports that
+    depended on a deleted library or template are marked stale.
+    """
+    result = await db.run_sync(delete_entities, data.ids)
+    await db.commit()
+    return result
+
+
+@app.put("/api/entities/{entity_id}/folder")
+async def move_entity(entity_id: str, data: EntityMove, db: AsyncSession = Depends(get_async_db)):
+    """Move an entity into a folder."""
+    await require_folder(db, data.folderId)
+    record = await lookup_entity(db, entity_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Entity not found")
+
+    model = ENTITY_MODELS[record.type]
+    await db.execute(update(model).where(model.id == entity_id).values(folderId=data.folderId))
+    invalidate_on_commit(db, [entity_id])
+    await db.commit()
+    return {"status": "moved"}
 
 
 # =============================================================================
 # Folders API
 # =============================================================================
 
-@app.get("/api/folders", response_model=List[Folder])
-def list_folders(db: Session = Depends(get_db)):
-    """Return the folder structure."""
-    folders = db.query(FolderModel).all()
-    if not folders:
-        # Initialize default folders if none exist
-        now = datetime.utcnow()
-        defaults = [
-            FolderModel(id="folder-libraries", name="Libraries", parentId=None, created_date=now),
-            FolderModel(id="folder-templates", name="Templates", parentId=None, created_date=now),
-            FolderModel(id="folder-reports", name="Reports", parentId=None, created_date=now),
-        ]
-        for f in defaults:
-            db.add(f)
-        db.commit()
-        folders = defaults
-    return folders
+@app.get(
+    "/api/folders", response_model=List[Folder],
+    dependencies=[conditional_get("folder", ("folders",))]
+)
+async def list_folders(db: AsyncSession = Depends(get_async_db)):
+    """Return the folder structure, parents before their children."""
+    return (await db.scalars(select(FolderModel).order_by(FolderModel.path))).all()
+
+
+async def require_folder(db: AsyncSession, folder_id: str) -> FolderModel:
+    folder = await db.get(FolderModel, folder_id)
+    if not folder:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    return folder
+
+
+@app.post("/api/folders", response_model=Folder)
+async def create_folder(data: FolderCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a folder, optionally nested under another."""
+    parent = await require_folder(db, data.parentId) if data.parentId else None
+    folder_id = generate_id()
+    folder = FolderModel(
+        id=folder_id,
+        name=data.name,
+        parentId=data.parentId,
+        path=folder_path(parent.path if parent else None, folder_id),
+        created_date=datetime.utcnow()
+    )
+    db.add(folder)
+    await db.commit()
+    return folder
+
+
+@app.get(
+    "/api/folders/{folder_id}/subtree", response_model=List[Folder],
+    dependencies=[conditional_get("folder", ("folders",))]
+)
+async def list_folder_subtree(folder_id: str, db: AsyncSession = Depends(get_async_db)):
+    """A folder and all its descendants, parents before their children."""
+    folder = await require_folder(db, folder_id)
+    return await db.run_sync(subtree_folders, folder.path)
+
+
+@app.get(
+    "/api/folders/{folder_id}/counts", response_model=FolderCounts,
+    dependencies=[conditional_get("folder", ("folders", "libraries", "templates", "reports"))]
+)
+async def get_folder_counts(folder_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Count the subfolders and entities anywhere under a folder."""
+    folder = await require_folder(db, folder_id)
+    return await db.run_sync(folder_counts, folder)
+
+
+@app.post("/api/folders/{folder_id}/move", response_model=Folder)
+async def move_folder_endpoint(folder_id: str, data: FolderMove, db: AsyncSession = Depends(get_async_db)):
+    """Move a folder and everything under it to a new parent."""
+    folder = await require_folder(db, folder_id)
+    parent = await require_folder(db, data.parentId) if data.parentId else None
+    try:
+        await db.run_sync(lambda session: move_folder(session, folder, parent))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    await db.commit()
+    await db.refresh(folder)
+    return folder
 
 
 # =============================================================================
@@ -225,58 +551,87 @@ def list_folders(db: Session = Depends(get_db)):
 # =============================================================================
 
 @app.post("/api/libraries", response_model=Entity)
-def create_library(data: LibraryCreate, db: Session = Depends(get_db)):
+async def create_library(data: LibraryCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new library."""
+    if data.folderId:
+        await require_folder(db, data.folderId)
     lib = Library(
         id=generate_id(),
         name=data.name,
         description=data.description,
+        folderId=data.folderId or ENTITY_FOLDERS["library"],
+        papers=[],
         created_date=datetime.utcnow()
     )
     db.add(lib)
-    db.commit()
-    db.refresh(lib)
+    await db.commit()
     return library_to_entity(lib)
 
 
-@app.get("/api/libraries", response_model=List[LibrarySummary])
-def list_libraries(db: Session = Depends(get_db)):
-    """List all libraries."""
-    libraries = db.query(Library).all()
-    return [
-        LibrarySummary(
-            id=lib.id,
-            name=lib.name,
-            description=lib.description,
-            paper_count=len(lib.papers),
-            created_date=lib.created_date
-        )
-        for lib in libraries
-    ]
+@app.get(
+    "/api/libraries", response_model=Page[LibrarySummary],
+    dependencies=[conditional_get("entity", ("libraries", "library_papers"))]
+)
+async def list_libraries(
+    limit: int = PageLimit,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List libraries, one page at a time."""
+    libraries, next_cursor = await paginate_async(db, select(Library), Library, limit, cursor)
+
+    # Count papers for the whole page in one grouped query
+    counts = dict((await db.execute(
+        select(library_papers.c.library_id, func.count())
+        .where(library_papers.c.library_id.in_([lib.id for lib in libraries]))
+        .group_by(library_papers.c.library_id)
+    )).all()) if libraries else {}
+
+    return Page(
+        items=[
+            LibrarySummary(
+                id=lib.id,
+                name=lib.name,
+                description=lib.description,
+                paper_count=counts.get(lib.id, 0),
+                created_date=lib.created_date
+            )
+            for lib in libraries
+        ],
+        next_cursor=next_cursor
+    )
 
 
-@app.get("/api/libraries/{library_id}", response_model=LibraryResponse)
-def get_library(library_id: str, db: Session = Depends(get_db)):
-    """Get a library with its papers."""
-    lib = db.query(Library).filter(Library.id == library_id).first()
+@app.get(
+    "/api/libraries/{library_id}", response_model=LibraryResponse,
+    dependencies=[conditional_get("entity", ("libraries", "library_papers", "papers"))]
+)
+async def get_library(
+    library_id: str,
+    view: ViewMode = "summary",
+    fields: Optional[str] = Query(None, description="Comma-separated paper body fields to include"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a library with its papers.
+
+    Paper bodies are omitted unless requested via ``view=full`` or ``fields``.
+    """
+    paper_fields = resolve_paper_fields(view, fields)
+    lib = await db.scalar(
+        select(Library)
+        .options(selectinload(Library.papers).options(*paper_load_options(paper_fields)))
+        .where(Library.id == library_id)
+    )
     if not lib:
         raise HTTPException(status_code=404, detail="Library not found")
-    
+
     return LibraryResponse(
         id=lib.id,
         name=lib.name,
         description=lib.description,
         created_date=lib.created_date,
         paper_count=len(lib.papers),
-        papers=[PaperResponse(
-            id=p.id,
-            title=p.title,
-            abstract=p.abstract,
-            authors=p.authors,
-            publish_date=p.publish_date,
-            text_markdown=p.text_markdown,
-            created_date=p.created_date
-        ) for p in lib.papers]
+        papers=[paper_to_response(p, paper_fields) for p in lib.papers]
     )
 
 
@@ -285,31 +640,67 @@ def get_library(library_id: str, db: Session = Depends(get_db)):
 # =============================================================================
 
 @app.post("/api/templates", response_model=Entity)
-def create_template(data: TemplateCreate, db: Session = Depends(get_db)):
+async def create_template(data: TemplateCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new template."""
+    if data.folderId:
+        await require_folder(db, data.folderId)
     tmpl = Template(
         id=generate_id(),
         name=data.name,
         prompt=data.prompt,
         description=data.description,
+        folderId=data.folderId or ENTITY_FOLDERS["template"],
         created_date=datetime.utcnow()
     )
     db.add(tmpl)
-    db.commit()
-    db.refresh(tmpl)
+    await db.commit()
     return template_to_entity(tmpl)
 
 
-@app.get("/api/templates", response_model=List[TemplateResponse])
-def list_templates(db: Session = Depends(get_db)):
-    """List all templates."""
-    return db.query(Template).all()
+@app.get(
+    "/api/templates", response_model=Page[TemplateResponse],
+    dependencies=[conditional_get("entity", ("templates",))]
+)
+async def list_templates(
+    limit: int = PageLimit,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List templates, one page at a time."""
+    templates, next_cursor = await paginate_async(db, select(Template), Template, limit, cursor)
+    return Page(items=templates, next_cursor=next_cursor)
+
+
+@app.put("/api/templates/{template_id}", response_model=Entity)
+async def update_template(template_id: str, data: TemplateCreate, db: AsyncSession = Depends(get_async_db)):
+    """Update a template; reports built from it go stale if the prompt changed."""
+    tmpl = await db.get(Template, template_id)
+    if not tmpl:
+        raise HTTPException(status_code=404, detail="Template not found")
+    if data.folderId:
+        await require_folder(db, data.folderId)
+
+    if tmpl.prompt != data.prompt:
+        await db.run_sync(mark_dependents_stale, template_ids=[template_id])
+    # Reports built from it show its name
+    dependents = await db.run_sync(dependent_report_ids, template_ids=[template_id])
+    invalidate_on_commit(db, [template_id, *dependents])
+    tmpl.name = data.name
+    tmpl.prompt = data.prompt
+    tmpl.description = data.description
+    if data.folderId:
+        tmpl.folderId = data.folderId
+    await db.commit()
+    return template_to_entity(tmpl)
 
 
-@app.get("/api/templates/{template_id}", response_model=TemplateResponse)
-def get_template(template_id: str, db: Session = Depends(get_db)):
+@app.get(
+    "/api/templates/{template_id}", response_model=TemplateResponse,
+    dependencies=[conditional_get("entity", ("templates",))]
+)
+async def get_template(template_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get a template."""
-    tmpl = db.query(Template).filter(Template.id == template_id).first()
+    tmpl = await db.get(Template, template_id)
     if not tmpl:
         raise HTTPException(status_code=404, detail="Template not found")
     return tmpl
@@ -320,78 +711,217 @@ def get_template(template_id: str, db: Session = Depends(get_db)):
 # =============================================================================
 
 @app.post("/api/reports", response_model=Entity)
-def create_report(data: ReportCreate, db: Session = Depends(get_db)):
-    """Create and generate a new report."""
-    # Get template
-    template = None
-    template_prompt = "Generate a summary report."
-    if data.template_id:
-        template = db.query(Template).filter(Template.id == data.template_id).first()
-        if template:
-            template_prompt = template.prompt
-    
-    # Get papers from selected libraries
-    papers = []
-    if data.library_ids:
-        libraries = db.query(Library).filter(Library.id.in_(data.library_ids)).all()
-        for lib in libraries:
-            papers.extend(lib.papers)
-    
-    # Generate report content (mocked)
-    content = generate_report_content(papers, template_prompt, data.user_prompt)
-    
-    # Create report
+async def create_report(data: ReportCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a report and queue it for generation.
+
+    Returns immediately: with the cached content if these exact inputs were
+    generated before, otherwise with ``status="pending"``; poll
+    ``/api/reports/{id}/status`` for the outcome.
+    """
+    content = None
+    if not data.bypass_cache:
+        content = await db.run_sync(
+            cached_report_content, data.template_id, data.library_ids, data.user_prompt, data.generation_mode
+        )
+
+    if data.folderId:
+        await require_folder(db, data.folderId)
     rpt = Report(
         id=generate_id(),
         name=data.name,
+        folderId=data.folderId or ENTITY_FOLDERS["report"],
         template_id=data.template_id,
-        library_ids=",".join(data.library_ids) if data.library_ids else None,
+        library_ids=data.library_ids or [],
         user_prompt=data.user_prompt,
+        generation_mode=data.generation_mode,
         content_markdown=content,
-        status="ok",
+        status="ok" if content is not None else "pending",
         created_date=datetime.utcnow()
     )
     db.add(rpt)
-    db.commit()
-    db.refresh(rpt)
-    
-    return report_to_entity(rpt, db)
-
-
-@app.get("/api/reports", response_model=List[ReportResponse])
-def list_reports(db: Session = Depends(get_db)):
-    """List all reports."""
-    reports = db.query(Report).all()
-    return [
-        ReportResponse(
-            id=r.id,
-            name=r.name,
-            template_id=r.template_id,
-            library_ids=r.library_ids.split(",") if r.library_ids else [],
-            user_prompt=r.user_prompt,
-            content_markdown=r.content_markdown,
-            status=r.status,
-            created_date=r.created_date
-        )
-        for r in reports
-    ]
+    await db.commit()
+
+    if content is None:
+        # The cache was just checked (or bypassed), so the worker need not
+        report_queue.submit(rpt.id, use_cache=False)
+
+    return await db.run_sync(lambda session: report_to_entity(rpt, session))
+
+
+@app.post("/api/reports/refresh-stale", response_model=RefreshResult)
+async def refresh_stale_reports(parallelism: int = Query(REPORT_WORKERS, ge=1)):
+    """Regenerate only the stale reports, in dependency order.
+
+    At most ``parallelism`` reports from this refresh are generated at once
+    (and never more than the worker pool size).
+    """
+    # The queue shares the sync engine with the worker threads
+    return await run_in_threadpool(report_queue.refresh_stale, parallelism)
 
 
-@app.get("/api/reports/{report_id}", response_model=ReportResponse)
-def get_report(report_id: str, db: Session = Depends(get_db)):
+@app.get("/api/report-cache", response_model=ReportCacheStats)
+async def get_report_cache_stats(db: AsyncSession = Depends(get_async_db)):
+    """Report generation cache hit/miss counters and size."""
+    return await db.run_sync(report_cache.stats)
+
+
+@app.delete("/api/report-cache")
+async def clear_report_cache(db: AsyncSession = Depends(get_async_db)):
+    """Drop every cached report."""
+    await db.run_sync(report_cache.clear)
+    await db.commit()
+    return {"status": "cleared"}
+
+
+@app.get("/api/entity-cache", response_model=EntityCacheStats)
+async def get_entity_cache_stats():
+    """Entity payload cache hit rate, size and eviction counters."""
+    return entity_cache.stats()
+
+
+@app.delete("/api/entity-cache")
+async def clear_entity_cache():
+    """Drop every cached entity payload."""
+    entity_cache.clear()
+    return {"status": "cleared"}
+
+
+@app.get(
+    "/api/reports/{report_id}/status", response_model=ReportStatus,
+    dependencies=[conditional_get("report", ("reports",))]
+)
+async def get_report_status(report_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Poll a report's generation status without loading its content."""
+    row = (await db.execute(
+        select(Report.id, Report.status, Report.error_message).where(Report.id == report_id)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return row
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/api/reports/{report_id}/stream")
+async def stream_report(report_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Stream a report's markdown as server-sent events while it is generated.
+
+    Sends ``chunk`` events (``{"content": ...}``) as sections are produced,
+    replaying anything generated before the client connected, then a single
+    ``done`` event with the final status. Reports that already finished are
+    sent as one chunk.
+    """
+    if not await db.scalar(select(Report.id).where(Report.id == report_id)):
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    # Progress is dropped only after the final status is written, so when
+    # there is none the stored row is already final.
+    progress = report_queue.progress(report_id)
+    row = None
+    if progress is None:
+        row = (await db.execute(
+            select(Report.status, Report.content_markdown, Report.error_message).where(Report.id == report_id)
+        )).first()
+
+    # Following progress awaits the worker's notifications on the event loop,
+    # so a connected client holds no threadpool thread.
+    async def events() -> AsyncIterator[str]:
+        if progress is None:
+            if row.content_markdown:
+                yield sse_event("chunk", {"content": row.content_markdown})
+            yield sse_event("done", {"status": row.status, "error_message": row.error_message})
+            return
+        async for chunk in progress.follow():
+            if chunk is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield sse_event("chunk", {"content": chunk})
+        yield sse_event("done", {"status": progress.status, "error_message": progress.error_message})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/reports/{report_id}/cancel", response_model=ReportStatus)
+async def cancel_report(report_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Cancel a pending or running report generation."""
+    if not await db.scalar(select(Report.id).where(Report.id == report_id)):
+        raise HTTPException(status_code=404, detail="Report not found")
+    if not await run_in_threadpool(report_queue.cancel, report_id):
+        raise HTTPException(status_code=409, detail="Report generation already finished")
+    return await get_report_status(report_id, db)
+
+
+@app.get(
+    "/api/reports", response_model=Page[ReportResponse],
+    dependencies=[conditional_get("report", REPORT_TABLES)]
+)
+async def list_reports(
+    status: Optional[str] = None,
+    template_id: Optional[str] = None,
+    library_id: Optional[str] = None,
+    limit: int = PageLimit,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List reports, one page at a time, optionally filtered."""
+    stmt = select(Report)
+    if status:
+        stmt = stmt.where(Report.status == status)
+    if template_id:
+        stmt = stmt.where(Report.template_id == template_id)
+    if library_id:
+        stmt = stmt.where(Report.library_links.any(ReportLibrary.library_id == library_id))
+    reports, next_cursor = await paginate_async(db, stmt, Report, limit, cursor)
+
+    return Page(
+        items=[
+            ReportResponse(
+                id=r.id,
+                name=r.name,
+                template_id=r.template_id,
+                library_ids=r.library_ids,
+                user_prompt=r.user_prompt,
+                generation_mode=r.generation_mode,
+                content_markdown=r.content_markdown,
+                status=r.status,
+                error_message=r.error_message,
+                context=report_context(r),
+                created_date=r.created_date
+            )
+            for r in reports
+        ],
+        next_cursor=next_cursor
+    )
+
+
+@app.get(
+    "/api/reports/{report_id}", response_model=ReportResponse,
+    dependencies=[conditional_get("report", REPORT_TABLES)]
+)
+async def get_report(report_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get a report."""
-    rpt = db.query(Report).filter(Report.id == report_id).first()
+    rpt = await db.get(Report, report_id)
     if not rpt:
         raise HTTPException(status_code=404, detail="Report not found")
-    
+
     return ReportResponse(
         id=rpt.id,
         name=rpt.name,
         template_id=rpt.template_id,
-        library_ids=rpt.library_ids.split(",") if rpt.library_ids else [],
+        library_ids=rpt.library_ids,
         user_prompt=rpt.user_prompt,
+        generation_mode=rpt.generation_mode,
         content_markdown=rpt.content_markdown,
         status=rpt.status,
+        error_message=rpt.error_message,
+        context=report_context(rpt),
         created_date=rpt.created_date
     )
 
@@ -401,7 +931,7 @@ def get_report(report_id: str, db: Session = Depends(get_db)):
 # =============================================================================
 
 @app.post("/api/papers", response_model=PaperResponse)
-def create_paper(data: PaperCreate, db: Session = Depends(get_db)):
+async def create_paper(data: PaperCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new paper."""
     paper = Paper(
         id=data.id or generate_id(),
@@ -412,51 +942,165 @@ def create_paper(data: PaperCreate, db: Session = Depends(get_db)):
         text_markdown=data.text_markdown,
         created_date=datetime.utcnow()
     )
+    paper.refresh_content_hash()
     db.add(paper)
-    db.commit()
-    db.refresh(paper)
+    await db.flush()
+    await db.run_sync(sync_paper_authors, {paper.id: paper.authors})
+    await db.commit()
     return paper
 
 
-@app.get("/api/papers", response_model=List[PaperResponse])
-def list_papers(db: Session = Depends(get_db)):
-    """List all papers."""
-    return db.query(Paper).all()
+@app.post("/api/papers/bulk", response_model=BulkIngestResult)
+async def bulk_ingest_papers(
+    request: Request,
+    library_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Upsert many papers at once, optionally adding them all to a library.
+
+    Accepts a JSON array or an ``application/x-ndjson`` stream of PaperCreate
+    records. Records are written in chunks of BULK_CHUNK_SIZE, one
+    transaction each; invalid records are reported individually and do not
+    abort the rest of the batch.
+    """
+    started = time.perf_counter()
+    if library_id and not await library_exists(db, library_id):
+        raise HTTPException(status_code=404, detail="Library not found")
+
+    result = BulkIngestResult()
+    chunk = []
+    async for index, record, error in iter_bulk_records(request):
+        result.received += 1
+        paper = None
+        if error is None:
+            paper, error = validate_record(record)
+        if error is not None:
+            result.failed += 1
+            record_id = record.get("id") if isinstance(record, dict) else None
+            result.errors.append(BulkIngestError(index=index, id=record_id, error=error))
+            continue
+        chunk.append((index, paper))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            await ingest_chunk(db, chunk, library_id, result)
+            chunk = []
+    if chunk:
+        await ingest_chunk(db, chunk, library_id, result)
+
+    result.elapsed_seconds = time.perf_counter() - started
+    if result.elapsed_seconds > 0:
+        result.rows_per_second = result.upserted / result.elapsed_seconds
+    return result
+
+
+@app.get("/api/papers/export")
+async def export_papers(library_id: Optional[str] = None):
+    """Stream every paper, including full bodies, as NDJSON.
+
+    Rows are fetched as plain column tuples in batches of EXPORT_BATCH_SIZE
+    through a streaming cursor, so no ORM objects accumulate in memory.
+    """
+    stmt = select(*Paper.__table__.columns).order_by(Paper.created_date, Paper.id)
+    if library_id:
+        stmt = stmt.join(library_papers, library_papers.c.paper_id == Paper.id).where(
+            library_papers.c.library_id == library_id
+        )
+    stmt = stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    async def generate() -> AsyncIterator[str]:
+        # The request-scoped session is closed before streaming starts
+        async with get_async_session() as db:
+            async for row in await db.stream(stmt):
+                yield PaperResponse.model_validate(row).model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@app.get(
+    "/api/papers/search", response_model=Page[PaperSearchHit],
+    dependencies=[conditional_get("paper", ("papers", "library_papers"))]
+)
+async def search_papers_endpoint(
+    q: str = Query(..., min_length=1),
+    library_id: Optional[str] = None,
+    raw: bool = Query(False, description="Treat q as FTS5 query syntax instead of plain terms"),
+    limit: int = PageLimit,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Full-text search over paper titles, abstracts and bodies, best match first.
+
+    Results are ranked by BM25, so ``next_cursor`` is an offset into the
+    ranking rather than a keyset cursor.
+    """
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    offset = int(cursor or 0)
+    hits, has_more = await db.run_sync(search_papers, q, library_id, limit, offset, raw=raw)
+    return Page(items=hits, next_cursor=str(offset + limit) if has_more else None)
+
+
+@app.get(
+    "/api/papers", response_model=Page[PaperResponse],
+    dependencies=[conditional_get("paper", ("papers", "library_papers", "paper_authors"))]
+)
+async def list_papers(
+    library_id: Optional[str] = None,
+    author: Optional[str] = None,
+    limit: int = PageLimit,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List papers, one page at a time, optionally scoped to a library or author."""
+    stmt = select(Paper)
+    if library_id:
+        stmt = stmt.join(library_papers, library_papers.c.paper_id == Paper.id).where(
+            library_papers.c.library_id == library_id
+        )
+    if author:
+        stmt = stmt.join(paper_authors, paper_authors.c.paper_id == Paper.id).where(
+            paper_authors.c.author_key == Author.make_key(author)
+        )
+    papers, next_cursor = await paginate_async(db, stmt, Paper, limit, cursor)
+    return Page(items=papers, next_cursor=next_cursor)
 
 
 @app.post("/api/libraries/{library_id}/papers/{paper_id}")
-def add_paper_to_library(library_id: str, paper_id: str, db: Session = Depends(get_db)):
+async def add_paper_to_library(library_id: str, paper_id: str, db: AsyncSession = Depends(get_async_db)):
     """Add a paper to a library."""
-    lib = db.query(Library).filter(Library.id == library_id).first()
-    if not lib:
+    if not await library_exists(db, library_id):
         raise HTTPException(status_code=404, detail="Library not found")
-    
-    paper = db.query(Paper).filter(Paper.id == paper_id).first()
-    if not paper:
+
+    if not await db.scalar(select(Paper.id).where(Paper.id == paper_id)):
         raise HTTPException(status_code=404, detail="Paper not found")
-    
-    if paper not in lib.papers:
-        lib.papers.append(paper)
-        db.commit()
-    
+
+    # Insert the link row directly instead of loading the whole collection
+    if await db.run_sync(attach_papers, library_id, [paper_id]):
+        await db.run_sync(mark_dependents_stale, library_ids=[library_id])
+        invalidate_on_commit(db, [library_id])
+        await db.commit()
+
     return {"status": "added"}
 
 
 @app.delete("/api/libraries/{library_id}/papers/{paper_id}")
-def remove_paper_from_library(library_id: str, paper_id: str, db: Session = Depends(get_db)):
+async def remove_paper_from_library(library_id: str, paper_id: str, db: AsyncSession = Depends(get_async_db)):
     """Remove a paper from a library."""
-    lib = db.query(Library).filter(Library.id == library_id).first()
-    if not lib:
+    if not await library_exists(db, library_id):
         raise HTTPException(status_code=404, detail="Library not found")
-    
-    paper = db.query(Paper).filter(Paper.id == paper_id).first()
-    if not paper:
+
+    if not await db.scalar(select(Paper.id).where(Paper.id == paper_id)):
         raise HTTPException(status_code=404, detail="Paper not found")
-    
-    if paper in lib.papers:
-        lib.papers.remove(paper)
-        db.commit()
-    
+
+    result = await db.execute(
+        library_papers.delete()
+        .where(library_papers.c.library_id == library_id)
+        .where(library_papers.c.paper_id == paper_id)
+    )
+    if result.rowcount:
+        await db.run_sync(mark_dependents_stale, library_ids=[library_id])
+        invalidate_on_commit(db, [library_id])
+    await db.commit()
+
     return {"status": "removed"}
 
 
@@ -465,39 +1109,267 @@ def remove_paper_from_library(library_id: str, paper_id: str, db: Session = Depe
 # =============================================================================
 
 @app.get("/api/logs", response_model=List[Log])
-def list_logs(limit: int = 50, db: Session = Depends(get_db)):
+async def list_logs(limit: int = 50, db: AsyncSession = Depends(get_async_db)):
     """List recent logs."""
-    return db.query(LogModel).order_by(LogModel.created_date.desc()).limit(limit).all()
+    # Include entries still waiting in the buffer
+    await log_sink.flush()
+    return (await db.scalars(
+        select(LogModel).order_by(LogModel.created_date.desc()).limit(limit)
+    )).all()
+
+
+def new_log_row(entry: LogCreate) -> dict:
+    return {
+        "id": generate_id(),
+        "message": entry.message,
+        "level": entry.level,
+        "entityId": entry.entityId,
+        "created_date": entry.created_date or datetime.utcnow(),
+    }
 
 
 @app.post("/api/logs", response_model=Log)
-def create_log(message: str, level: str = "info", entity_id: Optional[str] = None, db: Session = Depends(get_db)):
-    """Create a log entry."""
-    log = LogModel(
-        id=generate_id(),
-        message=message,
-        level=level,
-        entityId=entity_id,
-        created_date=datetime.utcnow()
-    )
-    db.add(log)
-    db.commit()
-    db.refresh(log)
-    return log
+async def create_log(message: str, level: str = "info", entity_id: Optional[str] = None):
+    """Create a log entry.
+
+    The entry is buffered and written with the next batch.
+    """
+    row = new_log_row(LogCreate(message=message, level=level, entityId=entity_id))
+    await log_sink.submit([row])
+    return Log(**row)
+
+
+@app.post("/api/logs/bulk", response_model=LogBulkResult)
+async def create_logs(entries: List[LogCreate]):
+    """Create many log entries in one request."""
+    await log_sink.submit([new_log_row(entry) for entry in entries])
+    return LogBulkResult(accepted=len(entries))
+
+
+@app.get("/api/logs/rollups", response_model=List[LogRollup])
+async def list_log_rollups(
+    entity_id: Optional[str] = None,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Daily counts of log entries that passed the retention period, newest first."""
+    stmt = select(LogRollupModel)
+    if entity_id:
+        stmt = stmt.where(LogRollupModel.entityId == entity_id)
+    return (await db.scalars(
+        stmt.order_by(LogRollupModel.day.desc(), LogRollupModel.level).limit(limit)
+    )).all()
 
 
 # =============================================================================
 # Version Control API
 # =============================================================================
 
-@app.get("/api/branches", response_model=List[Branch])
-def list_branches(db: Session = Depends(get_db)):
-    return db.query(BranchModel).all()
+@app.get(
+    "/api/branches", response_model=List[Branch],
+    dependencies=[conditional_get("version", ("branches",))]
+)
+async def list_branches(db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(select(BranchModel))).all()
+
+
+@app.post("/api/branches", response_model=Branch)
+async def create_branch(data: BranchCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a branch pointing at a version (or empty)."""
+    if await db.scalar(select(BranchModel.id).where(BranchModel.name == data.name)):
+        raise HTTPException(status_code=409, detail="Branch already exists")
+    if data.headVersionId and not await db.scalar(
+        select(EntityVersionModel.id).where(EntityVersionModel.id == data.headVersionId)
+    ):
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    branch = BranchModel(
+        id=generate_id(),
+        name=data.name,
+        headVersionId=data.headVersionId,
+        created_date=datetime.utcnow()
+    )
+    db.add(branch)
+    await db.commit()
+    return branch
+
+
+async def checkout_response(db: AsyncSession, version_id: str, include_data: bool) -> List[EntityVersion]:
+    versions = await db.run_sync(checkout, version_id)
+    states = await db.run_sync(version_states, versions) if include_data else {}
+    return [version_to_response(v, states.get(v.id)) for v in versions]
 
 
-@app.get("/api/entity-versions", response_model=List[EntityVersion])
-def list_entity_versions(entity_id: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(EntityVersionModel)
+@app.get(
+    "/api/branches/{branch_id}/checkout", response_model=List[EntityVersion],
+    dependencies=[conditional_get("version", ("branches", "entity_versions"))]
+)
+async def checkout_branch(
+    branch_id: str,
+    include_data: bool = Query(False, description="Rebuild and include each entity's state"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The version of every entity at a branch's head."""
+    branch = await db.get(BranchModel, branch_id)
+    if not branch:
+        raise HTTPException(status_code=404, detail="Branch not found")
+    if not branch.headVersionId:
+        return []
+    return await checkout_response(db, branch.headVersionId, include_data)
+
+
+def version_to_response(v: EntityVersionModel, data: Optional[str] = None) -> EntityVersion:
+    """Convert EntityVersion model to schema without touching the legacy data column."""
+    return EntityVersion(
+        id=v.id,
+        entityId=v.entityId,
+        parentId=v.parentId,
+        depth=v.depth,
+        content_hash=v.content_hash,
+        size=v.size,
+        data=data,
+        created_date=v.created_date
+    )
+
+
+@app.get(
+    "/api/entity-versions", response_model=Page[EntityVersion],
+    dependencies=[conditional_get("version", ("entity_versions",))]
+)
+async def list_entity_versions(
+    entity_id: Optional[str] = None,
+    include_data: bool = Query(False, description="Rebuild and include each version's state"),
+    limit: int = PageLimit,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List version metadata, one page at a time; states only with ``include_data``."""
+    stmt = select(EntityVersionModel)
+    if not include_data:
+        stmt = stmt.options(defer(EntityVersionModel.data))
     if entity_id:
-        query = query.filter(EntityVersionModel.entityId == entity_id)
-    return query.all()
+        stmt = stmt.where(EntityVersionModel.entityId == entity_id)
+    versions, next_cursor = await paginate_async(db, stmt, EntityVersionModel, limit, cursor)
+    states = await db.run_sync(version_states, versions) if include_data else {}
+    return Page(
+        items=[version_to_response(v, states.get(v.id)) for v in versions],
+        next_cursor=next_cursor
+    )
+
+
+@app.post("/api/entity-versions", response_model=EntityVersion)
+async def create_entity_version(data: EntityVersionCreate, db: AsyncSession = Depends(get_async_db)):
+    """Record a version of an entity, by default of its current state.
+
+    With ``branchId`` the version is committed on top of the branch head,
+    which then moves to it.
+    """
+    state = data.data
+    if state is None:
+        record = await lookup_entity(db, data.entityId)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Entity not found")
+        payloads = await db.run_sync(build_entities, [tuple(record)], PAPER_BODY_FIELDS)
+        state = payloads[data.entityId]
+
+    branch = None
+    if data.branchId:
+        branch = await db.get(BranchModel, data.branchId)
+        if not branch:
+            raise HTTPException(status_code=404, detail="Branch not found")
+        if data.parentId and data.parentId != branch.headVersionId:
+            raise HTTPException(status_code=409, detail="Branch head has moved")
+        parent_id = branch.headVersionId
+    else:
+        parent_id = data.parentId
+
+    if parent_id:
+        parent = await db.get(EntityVersionModel, parent_id, options=[defer(EntityVersionModel.data)])
+        if not parent:
+            raise HTTPException(status_code=404, detail="Parent version not found")
+    elif branch is None:
+        parent = await db.run_sync(latest_version, data.entityId)
+    else:
+        # First version on an empty branch
+        parent = None
+
+    version = await db.run_sync(create_version, generate_id(), data.entityId, state, parent)
+    if branch is not None:
+        # Only advance the head if nobody else committed in the meantime
+        moved = await db.execute(
+            update(BranchModel)
+            .where(BranchModel.id == branch.id)
+            .where(
+                BranchModel.headVersionId == parent_id if parent_id
+                else BranchModel.headVersionId.is_(None)
+            )
+            .values(headVersionId=version.id)
+            .execution_options(synchronize_session=False)
+        )
+        if not moved.rowcount:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Branch head has moved")
+    await db.commit()
+    return version_to_response(version)
+
+
+@app.get(
+    "/api/entity-versions/{version_id}", response_model=EntityVersion,
+    dependencies=[conditional_get("version", ("entity_versions",))]
+)
+async def get_entity_version(version_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get a version including its state."""
+    version = await db.get(EntityVersionModel, version_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Version not found")
+    states = await db.run_sync(version_states, [version])
+    return version_to_response(version, states[version.id])
+
+
+@app.get(
+    "/api/entity-versions/{version_id}/checkout", response_model=List[EntityVersion],
+    dependencies=[conditional_get("version", ("entity_versions",))]
+)
+async def checkout_version(
+    version_id: str,
+    include_data: bool = Query(False, description="Rebuild and include each entity's state"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The version of every entity as of a version."""
+    if not await db.scalar(select(EntityVersionModel.id).where(EntityVersionModel.id == version_id)):
+        raise HTTPException(status_code=404, detail="Version not found")
+    return await checkout_response(db, version_id, include_data)
+
+
+@app.get(
+    "/api/entity-versions/{from_id}/diff/{to_id}", response_model=VersionDiff,
+    dependencies=[conditional_get("version", ("entity_versions",))]
+)
+async def diff_entity_versions(from_id: str, to_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Entities added, removed or modified going from one version to another."""
+    try:
+        return await db.run_sync(diff_versions, from_id, to_id)
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+
+@app.get(
+    "/api/entity-versions/{a}/merge-base/{b}", response_model=EntityVersion,
+    dependencies=[conditional_get("version", ("entity_versions",))]
+)
+async def get_merge_base(a: str, b: str, db: AsyncSession = Depends(get_async_db)):
+    """The newest common ancestor of two versions."""
+    try:
+        base_id = await db.run_sync(lambda session: Ancestry(session).merge_base(a, b))
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    if base_id is None:
+        raise HTTPException(status_code=404, detail="Versions have no common ancestor")
+    version = await db.get(EntityVersionModel, base_id, options=[defer(EntityVersionModel.data)])
+    return version_to_response(version)
+
+
+@app.get("/api/version-store", response_model=VersionStoreStats)
+async def get_version_store_stats(db: AsyncSession = Depends(get_async_db)):
+    """Blob counts and compressed vs. uncompressed size of version history."""
+    return await db.run_sync(version_store_stats)
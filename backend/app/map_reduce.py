@@ -0,0 +1,115 @@
+"""Map-reduce report generation for large libraries.
+
+Every paper is summarized on its own (map), concurrently on a bounded
+thread pool; summaries are cached by paper content hash so re-runs and other
+reports over the same papers reuse them. Summaries are then merged in groups
+of ``REDUCE_FANOUT`` (reduce), level by level, until few enough remain to be
+handed to the report generator as its context.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .database import dialect_insert, get_db_session
+from .llm_providers import LLM_BATCH_SIZE
+from .llm_service import combine_summaries, summarize_papers, summarizer_name
+from .models import Paper, PaperSummary
+from .retrieval import Excerpt
+
+# Concurrent map/reduce LLM calls, shared across all reports
+MAP_REDUCE_WORKERS = int(os.environ.get("MAP_REDUCE_WORKERS", "8"))
+
+# Summaries merged per reduce call
+REDUCE_FANOUT = int(os.environ.get("REDUCE_FANOUT", "8"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAP_REDUCE_WORKERS, thread_name_prefix="map-reduce")
+    return _executor
+
+
+def summary_key(paper: Paper) -> str:
+    return f"{summarizer_name()}:{paper.content_hash}"
+
+
+def map_papers(papers: Sequence[Paper], should_stop: Callable[[], bool] = lambda: False) -> List[Excerpt]:
+    """Summarize every paper, reusing cached summaries.
+
+    Cached summaries are fetched in one query, only the misses go to the
+    pool (in batches of LLM_BATCH_SIZE papers), and the new summaries are
+    stored in one statement.
+    """
+    keys = {p.id: summary_key(p) for p in papers}
+    with get_db_session() as db:
+        summaries: Dict[str, str] = dict(
+            db.query(PaperSummary.key, PaperSummary.summary)
+            .filter(PaperSummary.key.in_(set(keys.values())))
+        )
+
+    missing = list({keys[p.id]: p for p in papers if keys[p.id] not in summaries}.values())
+    batches = [missing[i:i + LLM_BATCH_SIZE] for i in range(0, len(missing), LLM_BATCH_SIZE)]
+    futures = [(batch, get_executor().submit(summarize_papers, batch)) for batch in batches]
+    fresh = {}
+    try:
+        for batch, future in futures:
+            if should_stop():
+                return []
+            fresh.update(zip((keys[p.id] for p in batch), future.result()))
+    finally:
+        for _, future in futures:
+            future.cancel()
+
+    if fresh:
+        with get_db_session() as db:
+            db.execute(
+                dialect_insert(db, PaperSummary.__table__).on_conflict_do_nothing(),
+                [{"key": key, "summary": summary} for key, summary in fresh.items()]
+            )
+        summaries.update(fresh)
+
+    return [
+        Excerpt(paper_id=p.id, title=p.title, text=summaries[keys[p.id]], score=0.0)
+        for p in papers
+    ]
+
+
+def reduce_summaries(
+    excerpts: List[Excerpt],
+    template_prompt: str,
+    fanout: int = REDUCE_FANOUT,
+    should_stop: Callable[[], bool] = lambda: False
+) -> List[Excerpt]:
+    """Merge summaries in parallel groups until at most ``fanout`` remain."""
+    fanout = max(fanout, 2)
+    level = excerpts
+    covered = [1] * len(excerpts)  # Papers behind each summary
+    depth = 0
+    while len(level) > fanout:
+        if should_stop():
+            return []
+        depth += 1
+        groups = [range(i, min(i + fanout, len(level))) for i in range(0, len(level), fanout)]
+        merged = list(get_executor().map(
+            lambda texts: combine_summaries(texts, template_prompt),
+            [[level[i].text for i in group] for group in groups]
+        ))
+        covered = [sum(covered[i] for i in group) for group in groups]
+        level = [
+            Excerpt(paper_id=f"reduce-{depth}-{n}", title=f"Summary of {covered[n]} papers", text=text, score=0.0)
+            for n, text in enumerate(merged)
+        ]
+    return level
+
+
+def map_reduce_context(
+    papers: Sequence[Paper],
+    template_prompt: str,
+    should_stop: Callable[[], bool] = lambda: False
+) -> List[Excerpt]:
+    """Summaries covering every paper, reduced to at most REDUCE_FANOUT excerpts."""
+    return reduce_summaries(map_papers(papers, should_stop), template_prompt, should_stop=should_stop)
@@ -0,0 +1,116 @@
+"""Data migrations, run at startup after the schema is created.
+
+Each migration is idempotent, so it is safe to run on every start.
+"""
+
+from sqlalchemy import exists, inspect, or_, text
+from sqlalchemy.orm import Session, aliased
+
+from .authors import sync_paper_authors
+from .change_tracking import ensure_change_tracking
+from .database import dialect_insert, get_db_session
+from .entity_registry import ensure_entity_registry
+from .folder_tree import assign_default_folders, ensure_default_folders, ensure_folder_paths
+from .models import EntityVersion, Paper, ReportLibrary, paper_authors
+from .search import ensure_paper_search_index
+from .version_graph import index_version
+from .version_store import canonical_state, store_state
+
+# Papers backfilled per statement batch
+MIGRATION_BATCH_SIZE = 1000
+
+
+def migrate_report_library_ids(db: Session) -> int:
+    """Move the legacy comma-separated ``reports.library_ids`` into report_libraries.
+
+    Migrated rows have the old column cleared, so each report is moved once.
+    """
+    columns = {c["name"] for c in inspect(db.get_bind()).get_columns("reports")}
+    if "library_ids" not in columns:
+        return 0
+
+    rows = db.execute(text(
+        "SELECT id, library_ids FROM reports WHERE library_ids IS NOT NULL AND library_ids != ''"
+    )).all()
+    links = [
+        {"report_id": report_id, "library_id": library_id, "position": position}
+        for report_id, library_ids in rows
+        for position, library_id in enumerate(dict.fromkeys(filter(None, library_ids.split(","))))
+    ]
+    if links:
+        db.execute(dialect_insert(db, ReportLibrary.__table__).on_conflict_do_nothing(), links)
+    db.execute(text("UPDATE reports SET library_ids = NULL WHERE library_ids IS NOT NULL"))
+    return len(rows)
+
+
+def migrate_paper_authors(db: Session) -> int:
+    """Populate paper_authors for papers stored before authors were normalized."""
+    rows = db.query(Paper.id, Paper.authors).filter(
+        Paper.authors.isnot(None),
+        Paper.authors != "",
+        ~exists().where(paper_authors.c.paper_id == Paper.id)
+    ).all()
+    for start in range(0, len(rows), MIGRATION_BATCH_SIZE):
+        sync_paper_authors(db, dict(rows[start:start + MIGRATION_BATCH_SIZE]))
+    return len(rows)
+
+
+def migrate_entity_version_blobs(db: Session) -> int:
+    """Move inline ``entity_versions.data`` dumps into delta-compressed blobs.
+
+    Versions are migrated oldest first so each can be delta-encoded against
+    its already migrated parent; the inline copy is then cleared.
+    """
+    migrated = 0
+    while True:
+        versions = db.query(EntityVersion).filter(EntityVersion.content_hash.is_(None)).order_by(
+            EntityVersion.created_date, EntityVersion.id
+        ).limit(MIGRATION_BATCH_SIZE).all()
+        if not versions:
+            return migrated
+        parent_hashes = dict(db.query(EntityVersion.id, EntityVersion.content_hash).filter(
+            EntityVersion.id.in_({v.parentId for v in versions if v.parentId})
+        ).all())
+        for version in versions:
+            state = canonical_state(version.data)
+            version.content_hash = store_state(db, state, parent_hashes.get(version.parentId))
+            version.size = len(state)
+            version.data = ""
+            parent_hashes[version.id] = version.content_hash
+        db.flush()
+        migrated += len(versions)
+
+
+def migrate_version_ancestry(db: Session) -> int:
+    """Build the depth/skip-list index for versions recorded before it existed.
+
+    Each batch only takes versions whose parent is already indexed, so
+    parents are always indexed before their children.
+    """
+    parent = aliased(EntityVersion)
+    migrated = 0
+    while True:
+        versions = db.query(EntityVersion).outerjoin(parent, parent.id == EntityVersion.parentId).filter(
+            EntityVersion.depth.is_(None),
+            or_(EntityVersion.parentId.is_(None), parent.depth.isnot(None))
+        ).limit(MIGRATION_BATCH_SIZE).all()
+        if not versions:
+            return migrated
+        for version in versions:
+            index_version(db, version)
+        db.flush()
+        migrated += len(versions)
+
+
+def run_migrations() -> None:
+    with get_db_session() as db:
+        migrate_report_library_ids(db)
+        migrate_paper_authors(db)
+        migrate_entity_version_blobs(db)
+        migrate_version_ancestry(db)
+        ensure_default_folders(db)
+        ensure_folder_paths(db)
+        assign_default_folders(db)
+        ensure_entity_registry(db)
+        ensure_paper_search_index(db)
+        ensure_change_tracking(db)
@@ -1,8 +1,10 @@
 """SQLAlchemy models for the PipelineCraft database."""
 
+import hashlib
+import json
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Table, create_engine
+from sqlalchemy import Column, String, Text, DateTime, Integer, LargeBinary, ForeignKey, Table, Index, create_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, backref
 
 
@@ -14,35 +16,120 @@ class Base(DeclarativeBase):
 library_papers = Table(
     "library_papers",
     Base.metadata,
-    Column("library_id", String, ForeignKey("libraries.id"), primary_key=True),
-    Column("paper_id", String, ForeignKey("papers.id"), primary_key=True),
+    Column("library_id", String, ForeignKey("libraries.id", ondelete="CASCADE"), primary_key=True),
+    Column("paper_id", String, ForeignKey("papers.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_library_papers_paper_id", "paper_id"),
+)
+
+
+# Per-table change counters, bumped by triggers on every write (see change_tracking.py)
+table_versions = Table(
+    "table_versions",
+    Base.metadata,
+    Column("table_name", String, primary_key=True),
+    Column("version", Integer, nullable=False, default=0),
+)
+
+
+class ReportLibrary(Base):
+    """Ordered link from a report to a library it was generated from.
+
+    ``library_id`` is deliberately not a foreign key: a report keeps
+    pointing at a library after it is deleted so the dangling dependency
+    stays visible.
+    """
+    __tablename__ = "report_libraries"
+    __table_args__ = (
+        Index("ix_report_libraries_library_id", "library_id"),
+    )
+
+    report_id: Mapped[str] = mapped_column(
+        String, ForeignKey("reports.id", ondelete="CASCADE"), primary_key=True
+    )
+    library_id: Mapped[str] = mapped_column(String, primary_key=True)
+    position: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class Author(Base):
+    """A paper author, keyed by normalized name."""
+    __tablename__ = "authors"
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)  # Lower-cased, whitespace-collapsed name
+    name: Mapped[str] = mapped_column(String, nullable=False)
+
+    @staticmethod
+    def make_key(name: str) -> str:
+        return " ".join(name.split()).lower()
+
+
+# Association table for the ordered authors of each paper
+paper_authors = Table(
+    "paper_authors",
+    Base.metadata,
+    Column("paper_id", String, ForeignKey("papers.id", ondelete="CASCADE"), primary_key=True),
+    Column("author_key", String, ForeignKey("authors.key"), primary_key=True),
+    Column("position", Integer, nullable=False, default=0),
+    Index("ix_paper_authors_author_key", "author_key"),
 )
 
 
 class Paper(Base):
     """A research paper."""
     __tablename__ = "papers"
+    __table_args__ = (
+        Index("ix_papers_created_date_id", "created_date", "id"),
+        Index("ux_papers_search_rowid", "search_rowid", unique=True),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     title: Mapped[str] = mapped_column(String, nullable=False)
     abstract: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    authors: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Comma-separated
+    authors: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Comma-separated, for display; see paper_authors
     publish_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     text_markdown: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    content_hash: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # sha256 of the content fields
     created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    search_rowid: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # FTS row, set by trigger (SQLite)
 
     # Relationships
     libraries: Mapped[List["Library"]] = relationship(
         secondary=library_papers, back_populates="papers"
     )
 
+    @staticmethod
+    def compute_content_hash(
+        title: str,
+        abstract: Optional[str],
+        authors: Optional[str],
+        publish_date: Optional[datetime],
+        text_markdown: Optional[str]
+    ) -> str:
+        """Hash the fields that affect generated output."""
+        payload = json.dumps([
+            title, abstract, authors,
+            publish_date.isoformat() if publish_date else None,
+            text_markdown
+        ])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def refresh_content_hash(self) -> str:
+        self.content_hash = Paper.compute_content_hash(
+            self.title, self.abstract, self.authors, self.publish_date, self.text_markdown
+        )
+        return self.content_hash
+
 
 class Library(Base):
     """A named collection of papers."""
     __tablename__ = "libraries"
+    __table_args__ = (
+        Index("ix_libraries_created_date_id", "created_date", "id"),
+        Index("ix_libraries_folder_created_date_id", "folderId", "created_date", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
+    folderId: Mapped[Optional[str]] = mapped_column(String, ForeignKey("folders.id"), nullable=True)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
@@ -55,9 +142,14 @@ class Library(Base):
 class Template(Base):
     """A report template entity."""
     __tablename__ = "templates"
+    __table_args__ = (
+        Index("ix_templates_created_date_id", "created_date", "id"),
+        Index("ix_templates_folder_created_date_id", "folderId", "created_date", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
+    folderId: Mapped[Optional[str]] = mapped_column(String, ForeignKey("folders.id"), nullable=True)
     prompt: Mapped[str] = mapped_column(Text, nullable=False)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -66,27 +158,143 @@ class Template(Base):
 class Report(Base):
     """A generated report."""
     __tablename__ = "reports"
+    __table_args__ = (
+        Index("ix_reports_created_date_id", "created_date", "id"),
+        Index("ix_reports_status_created_date_id", "status", "created_date", "id"),
+        Index("ix_reports_template_id", "template_id"),
+        Index("ix_reports_folder_created_date_id", "folderId", "created_date", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
-    template_id: Mapped[Optional[str]] = mapped_column(String, ForeignKey("templates.id"), nullable=True)
-    library_ids: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Comma-separated
+    folderId: Mapped[Optional[str]] = mapped_column(String, ForeignKey("folders.id"), nullable=True)
+    template_id: Mapped[Optional[str]] = mapped_column(
+        String, ForeignKey("templates.id", ondelete="SET NULL"), nullable=True
+    )
     user_prompt: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    generation_mode: Mapped[Optional[str]] = mapped_column(String, nullable=True, default="single")  # single, map_reduce
     content_markdown: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    status: Mapped[str] = mapped_column(String, default="pending")  # pending, ok, error
+    status: Mapped[str] = mapped_column(String, default="pending")  # pending, running, ok, error, cancelled
+    error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    context_tokens: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Estimated tokens of paper context
+    context_papers: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON: included / truncated / omitted paper ids
     created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     # Relationships
     template: Mapped[Optional["Template"]] = relationship()
+    library_links: Mapped[List["ReportLibrary"]] = relationship(
+        order_by=ReportLibrary.position, cascade="all, delete-orphan", lazy="selectin"
+    )
+
+    @property
+    def library_ids(self) -> List[str]:
+        return [link.library_id for link in self.library_links]
+
+    @library_ids.setter
+    def library_ids(self, library_ids: List[str]) -> None:
+        # Drop duplicates, keeping the first occurrence's position
+        unique_ids = list(dict.fromkeys(library_ids or []))
+        self.library_links = [
+            ReportLibrary(library_id=library_id, position=i)
+            for i, library_id in enumerate(unique_ids)
+        ]
+
+
+# Models served through the generic entities API, by entity type
+ENTITY_MODELS = {"library": Library, "template": Template, "report": Report}
+
+
+class EntityRecord(Base):
+    """Registry row for every library, template and report.
+
+    Maintained by database triggers on the entity tables (see
+    entity_registry.py), never written by the application. ``version``
+    grows on every change to the entity, including its paper membership.
+    """
+    __tablename__ = "entities"
+    __table_args__ = (
+        Index("ix_entities_created_date_id", "created_date", "id"),
+        Index("ix_entities_type_created_date_id", "type", "created_date", "id"),
+        Index("ix_entities_folder_created_date_id", "folderId", "created_date", "id"),
+        Index("ix_entities_status_created_date_id", "status", "created_date", "id"),
+    )
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    type: Mapped[str] = mapped_column(String, nullable=False)  # library, template, report
+    folderId: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    status: Mapped[str] = mapped_column(String, nullable=False, default="ok")
+    created_date: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+
+
+class ReportLease(Base):
+    """The job queue generating a running report, renewed by its heartbeat."""
+    __tablename__ = "report_leases"
+
+    report_id: Mapped[str] = mapped_column(String, primary_key=True)
+    worker_id: Mapped[str] = mapped_column(String, nullable=False)
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class PaperChunk(Base):
+    """A span of a paper's text with its embedding at ``row`` of the vector file."""
+    __tablename__ = "paper_chunks"
+    __table_args__ = (
+        Index("ix_paper_chunks_paper_id", "paper_id"),
+    )
+
+    row: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    paper_id: Mapped[str] = mapped_column(String, nullable=False)
+    position: Mapped[int] = mapped_column(Integer, nullable=False)
+    start_offset: Mapped[int] = mapped_column(Integer, nullable=False)
+    end_offset: Mapped[int] = mapped_column(Integer, nullable=False)
+    content_hash: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Paper hash the chunk was cut from
+    embedder: Mapped[str] = mapped_column(String, nullable=False)
+
+
+class FreeChunkRow(Base):
+    """A vector file row released by re-embedding, free to be handed out again."""
+    __tablename__ = "free_chunk_rows"
+
+    row: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+
+
+class PaperSummary(Base):
+    """Cached map-step summary of a paper, keyed by summarizer and content hash."""
+    __tablename__ = "paper_summaries"
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)  # "<summarizer>:<content hash>"
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ReportCacheEntry(Base):
+    """Generated report markdown keyed by a hash of its inputs."""
+    __tablename__ = "report_cache"
+    __table_args__ = (
+        Index("ix_report_cache_last_accessed", "last_accessed"),
+    )
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    content_markdown: Mapped[str] = mapped_column(Text, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+    created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_accessed: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
 class Folder(Base):
     """A hierarchical folder for organizing entities."""
     __tablename__ = "folders"
+    __table_args__ = (
+        Index("ix_folders_path", "path"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
     parentId: Mapped[Optional[str]] = mapped_column(String, ForeignKey("folders.id"), nullable=True)
+    # Materialized path of ids from the root, "/<root>/.../<id>/" (see folder_tree.py)
+    path: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     # Self-referential relationship for nested folders
@@ -96,6 +304,9 @@ class Folder(Base):
 class Log(Base):
     """System event log."""
     __tablename__ = "logs"
+    __table_args__ = (
+        Index("ix_logs_created_date", "created_date"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     message: Mapped[str] = mapped_column(Text, nullable=False)
@@ -104,6 +315,20 @@ class Log(Base):
     created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
+class LogRollup(Base):
+    """Daily log entry counts per level and entity, kept after the entries expire."""
+    __tablename__ = "log_rollups"
+    __table_args__ = (
+        Index("ix_log_rollups_day", "day"),
+    )
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)  # "<day>|<level>|<entityId>"
+    day: Mapped[str] = mapped_column(String, nullable=False)  # YYYY-MM-DD
+    level: Mapped[str] = mapped_column(String, nullable=False)
+    entityId: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
 class Branch(Base):
     """Version control branch."""
     __tablename__ = "branches"
@@ -117,9 +342,36 @@ class Branch(Base):
 class EntityVersion(Base):
     """Immutable version of an entity."""
     __tablename__ = "entity_versions"
+    __table_args__ = (
+        Index("ix_entity_versions_created_date_id", "created_date", "id"),
+        Index("ix_entity_versions_entity_created_date_id", "entityId", "created_date", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     entityId: Mapped[str] = mapped_column(String, nullable=False)
-    data: Mapped[str] = mapped_column(Text, nullable=False)  # JSON dump of entity state
+    # Legacy inline JSON dump of entity state; empty once the state lives in version_blobs
+    data: Mapped[str] = mapped_column(Text, nullable=False, default="")
     parentId: Mapped[Optional[str]] = mapped_column(String, ForeignKey("entity_versions.id"), nullable=True)
+    # Ancestry index (see version_graph.py): distance from the root, and a
+    # skip-list pointer to an ancestor further up
+    depth: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    skipId: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    content_hash: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # VersionBlob holding the state
+    size: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Uncompressed state length
     created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class VersionBlob(Base):
+    """Content-addressed, zlib-compressed entity state (see version_store.py).
+
+    A blob holds either the full state or a delta against ``base_hash``;
+    ``depth`` counts the deltas back to the nearest full snapshot.
+    """
+    __tablename__ = "version_blobs"
+
+    hash: Mapped[str] = mapped_column(String, primary_key=True)  # SHA-256 of the full state
+    base_hash: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    depth: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)  # Uncompressed state length
+    stored_size: Mapped[int] = mapped_column(Integer, nullable=False)  # Compressed bytes
@@ -0,0 +1,68 @@
+"""Keyset (cursor) pagination helpers.
+
+Rows are ordered by ``(created_date, id)`` and a cursor encodes the last row
+of the previous page, so fetching any page is a single index range scan no
+matter how deep into the table it is.
+"""
+
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(created_date: datetime, row_id: str) -> str:
+    """Encode a row's sort key as an opaque URL-safe cursor."""
+    raw = f"{created_date.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created, row_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(created), row_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(query, model: Any, cursor: Optional[str]):
+    """Restrict a query (or select statement) to rows that sort after the cursor."""
+    if not cursor:
+        return query
+    created, row_id = decode_cursor(cursor)
+    return query.filter(tuple_(model.created_date, model.id) > tuple_(created, row_id))
+
+
+def keyset_rows(query: Query, model: Any, limit: int, cursor: Optional[str] = None) -> List[Any]:
+    """Fetch up to ``limit + 1`` rows after the cursor in keyset order.
+
+    The extra row tells page_from_rows whether another page exists.
+    """
+    query = after_cursor(query, model, cursor)
+    return query.order_by(model.created_date, model.id).limit(limit + 1).all()
+
+
+async def paginate_async(
+    db: AsyncSession, stmt: Select, model: Any, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """Fetch one page of a ``select(model)`` statement on an async session."""
+    stmt = after_cursor(stmt, model, cursor).order_by(model.created_date, model.id).limit(limit + 1)
+    rows = (await db.scalars(stmt)).all()
+    return page_from_rows(list(rows), limit)
+
+
+def page_from_rows(rows: List[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Trim ``limit + 1`` sorted rows to a page and compute its next cursor."""
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last.created_date, last.id)
@@ -0,0 +1,149 @@
+"""Content-addressed cache of generated report markdown.
+
+A report's cache key hashes everything its output depends on: the
+generation pipeline settings, the template prompt, the user prompt and the
+sorted ``(paper id, content hash)`` pairs of the selected papers. Entries
+live in the ``report_cache`` table and are evicted least-recently-used first once
+the entry count or total size exceeds its bound.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .models import Paper, ReportCacheEntry, library_papers
+from .schemas import ReportCacheStats
+
+REPORT_CACHE_MAX_ENTRIES = int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", "1000"))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Entries removed per DELETE while evicting
+EVICTION_BATCH_SIZE = 100
+
+
+def report_cache_key(
+    pipeline: str,
+    template_prompt: str,
+    user_prompt: Optional[str],
+    paper_hashes: Iterable[Tuple[str, str]]
+) -> str:
+    payload = json.dumps({
+        "pipeline": pipeline,
+        "template_prompt": template_prompt,
+        "user_prompt": user_prompt,
+        "papers": sorted(set(paper_hashes)),
+    })
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def library_paper_hashes(db: Session, library_ids: List[str]) -> List[Tuple[str, str]]:
+    """``(paper id, content hash)`` for every paper in the given libraries.
+
+    Reads only the id and hash columns; papers stored before hashes existed
+    are hashed and backfilled on the way.
+    """
+    if not library_ids:
+        return []
+    rows = (
+        db.query(Paper.id, Paper.content_hash)
+        .join(library_papers, library_papers.c.paper_id == Paper.id)
+        .filter(library_papers.c.library_id.in_(library_ids))
+        .distinct()
+        .all()
+    )
+    hashes = [(paper_id, content_hash) for paper_id, content_hash in rows if content_hash]
+    missing = [paper_id for paper_id, content_hash in rows if not content_hash]
+    if missing:
+        for paper in db.query(Paper).filter(Paper.id.in_(missing)):
+            hashes.append((paper.id, paper.refresh_content_hash()))
+        db.flush()
+    return hashes
+
+
+class ReportCache:
+    """LRU, size-bounded report cache stored in the database."""
+
+    def __init__(self, max_entries: int = REPORT_CACHE_MAX_ENTRIES, max_bytes: int = REPORT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, key: str) -> Optional[str]:
+        """Return cached markdown for ``key`` and mark it recently used."""
+        entry = db.query(ReportCacheEntry).filter(ReportCacheEntry.key == key).first()
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        entry.hits += 1
+        entry.last_accessed = datetime.utcnow()
+        return entry.content_markdown
+
+    def put(self, db: Session, key: str, content: str) -> None:
+        """Store markdown under ``key``, then evict down to the bounds."""
+        now = datetime.utcnow()
+        size = len(content.encode())
+        if size > self.max_bytes:
+            return
+        db.merge(ReportCacheEntry(
+            key=key, content_markdown=content, size=size,
+            hits=0, created_date=now, last_accessed=now
+        ))
+        db.flush()
+        with self._lock:
+            self.stores += 1
+        self._evict(db)
+
+    def _evict(self, db: Session) -> None:
+        while True:
+            entries, total_bytes = db.query(
+                func.count(ReportCacheEntry.key), func.coalesce(func.sum(ReportCacheEntry.size), 0)
+            ).one()
+            if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                return
+            excess = max(entries - self.max_entries, 1)
+            oldest = [
+                row.key for row in db.query(ReportCacheEntry.key)
+                .order_by(ReportCacheEntry.last_accessed)
+                .limit(min(excess, EVICTION_BATCH_SIZE))
+            ]
+            db.query(ReportCacheEntry).filter(ReportCacheEntry.key.in_(oldest)).delete(
+                synchronize_session=False
+            )
+            with self._lock:
+                self.evictions += len(oldest)
+
+    def clear(self, db: Session) -> None:
+        db.query(ReportCacheEntry).delete(synchronize_session=False)
+
+    def stats(self, db: Session) -> ReportCacheStats:
+        entries, total_bytes = db.query(
+            func.count(ReportCacheEntry.key), func.coalesce(func.sum(ReportCacheEntry.size), 0)
+        ).one()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return ReportCacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                stores=self.stores,
+                evictions=self.evictions,
+                hit_rate=self.hits / lookups if lookups else 0.0,
+                entries=entries,
+                total_bytes=total_bytes,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes
+            )
+
+
+report_cache = ReportCache()
@@ -0,0 +1,497 @@
+"""Background report generation on a bounded worker pool.
+
+Reports move through ``pending -> running -> ok | error``; a pending or
+running report can be ``cancelled``. Every transition is a conditional
+UPDATE on the current status, so a cancellation that lands while a worker
+is generating simply makes the worker's final write a no-op.
+
+While a report is queued or generating, its chunks are published to a
+ReportProgress that streaming clients can follow.
+
+A running report is held under a lease in ``report_leases`` that the
+generating process's heartbeat keeps renewing. Several processes can share
+one database: only reports whose lease has lapsed, because their process
+died, are taken back and generated again.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session, selectinload
+
+from .context_packer import estimate_tokens, pack_context, packing_signature
+from .database import dialect_insert, get_db_session
+from .dependency_graph import missing_libraries, report_dependencies, topological_levels
+from .entity_cache import invalidate_on_commit
+from .llm_service import generator_signature, get_report_generator, summarizer_name
+from .map_reduce import REDUCE_FANOUT, map_reduce_context
+from .models import Library, Paper, Report, ReportLease, Template
+from .report_cache import library_paper_hashes, report_cache, report_cache_key
+from .retrieval import retrieval_signature, retrieve_excerpts
+from .schemas import RefreshResult
+
+# Maximum number of reports generated concurrently
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "4"))
+
+DEFAULT_TEMPLATE_PROMPT = "Generate a summary report."
+
+# How a report's paper context is built: retrieved excerpts packed under the
+# token budget, or map-reduced per-paper summaries covering every paper
+GENERATION_MODES = ("single", "map_reduce")
+
+# Statuses a report can still be cancelled from
+ACTIVE_STATUSES = ("pending", "running")
+
+# Seconds a follower waits for a chunk before yielding a keep-alive
+FOLLOW_POLL_SECONDS = 15.0
+
+# Seconds between lease renewals of this process's running reports
+REPORT_HEARTBEAT_SECONDS = float(os.environ.get("REPORT_HEARTBEAT_SECONDS", "10"))
+
+# Seconds without a renewal after which another process may take a running report back
+REPORT_LEASE_SECONDS = float(os.environ.get("REPORT_LEASE_SECONDS", "60"))
+
+# Owner recorded on the leases of reports this process generates
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+logger = logging.getLogger(__name__)
+
+
+class ReportProgress:
+    """Chunks generated so far for one report, shared with streaming clients.
+
+    The worker thread publishes; followers are coroutines on an event loop.
+    Each follower registers an asyncio.Event that publish and finish set
+    through ``loop.call_soon_threadsafe``, so waiting for the next chunk
+    never ties up a thread.
+    """
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.finished = False
+        self.cancelled = False
+        self.status: Optional[str] = None
+        self.error_message: Optional[str] = None
+        self._lock = threading.Lock()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    def publish(self, chunk: str) -> None:
+        with self._lock:
+            self.chunks.append(chunk)
+            self._wake()
+
+    def finish(self, status: str, error_message: Optional[str] = None) -> None:
+        with self._lock:
+            self.finished = True
+            self.status = status
+            self.error_message = error_message
+            self._wake()
+
+    def _wake(self) -> None:
+        for loop, event in list(self._waiters):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The follower's loop is closed
+                self._waiters.discard((loop, event))
+
+    async def follow(self, poll_seconds: float = FOLLOW_POLL_SECONDS) -> AsyncIterator[Optional[str]]:
+        """Yield every chunk from the start, then new ones as they arrive.
+
+        Yields None when nothing arrived within ``poll_seconds`` so callers
+        can send keep-alives. Returns once generation has finished.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            sent = 0
+            while True:
+                with self._lock:
+                    new_chunks = self.chunks[sent:]
+                    finished = self.finished
+                    if not new_chunks and not finished:
+                        # Cleared under the lock, so a later publish always sets it again
+                        waiter[1].clear()
+                sent += len(new_chunks)
+                for chunk in new_chunks:
+                    yield chunk
+                if finished and not new_chunks:
+                    return
+                if not new_chunks:
+                    try:
+                        await asyncio.wait_for(waiter[1].wait(), poll_seconds)
+                    except asyncio.TimeoutError:
+                        yield None
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+def transition(report_id: str, from_statuses, to_status: str, **values) -> bool:
+    """Atomically move a report between statuses; return whether it moved."""
+    if isinstance(from_statuses, str):
+        from_statuses = (from_statuses,)
+    with get_db_session() as db:
+        result = db.execute(
+            update(Report)
+            .where(Report.id == report_id)
+            .where(Report.status.in_(from_statuses))
+            .values(status=to_status, **values)
+        )
+        if result.rowcount:
+            invalidate_on_commit(db, [report_id])
+        return result.rowcount > 0
+
+
+def claim_report(report_id: str) -> bool:
+    """Move a pending report to running under this process's lease."""
+    with get_db_session() as db:
+        result = db.execute(
+            update(Report).where(Report.id == report_id).where(Report.status == "pending").values(status="running")
+        )
+        if not result.rowcount:
+            return False
+        stmt = dialect_insert(db, ReportLease.__table__)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["report_id"],
+            set_={"worker_id": stmt.excluded.worker_id, "heartbeat_at": stmt.excluded.heartbeat_at}
+        ), {"report_id": report_id, "worker_id": WORKER_ID, "heartbeat_at": datetime.utcnow()})
+        invalidate_on_commit(db, [report_id])
+        return True
+
+
+def release_report(report_id: str) -> None:
+    with get_db_session() as db:
+        db.query(ReportLease).filter(
+            ReportLease.report_id == report_id, ReportLease.worker_id == WORKER_ID
+        ).delete(synchronize_session=False)
+
+
+def resolve_template_prompt(db: Session, template_id: Optional[str]) -> str:
+    if template_id:
+        template = db.query(Template).filter(Template.id == template_id).first()
+        if template:
+            return template.prompt
+    return DEFAULT_TEMPLATE_PROMPT
+
+
+def load_report_inputs(report_id: str):
+    """Load the papers, template prompt, user prompt and mode a report is built from.
+
+    Papers are deduplicated across libraries and detached from the session
+    so they can be used after it closes without holding a connection for the
+    length of the generation.
+    """
+    with get_db_session() as db:
+        rpt = db.query(Report).filter(Report.id == report_id).first()
+        if rpt is None:
+            return None
+
+        template_prompt = resolve_template_prompt(db, rpt.template_id)
+
+        papers: Dict[str, Paper] = {}
+        library_ids = rpt.library_ids
+        if library_ids:
+            libraries = db.query(Library).options(selectinload(Library.papers)).filter(
+                Library.id.in_(library_ids)
+            ).all()
+            for lib in libraries:
+                for paper in lib.papers:
+                    if not paper.content_hash:
+                        paper.refresh_content_hash()
+                    papers.setdefault(paper.id, paper)
+
+        user_prompt = rpt.user_prompt
+        mode = rpt.generation_mode or "single"
+        db.flush()
+        db.expunge_all()
+        return list(papers.values()), template_prompt, user_prompt, mode
+
+
+def pipeline_signature(mode: str = "single") -> str:
+    """Identifies the generator and context settings, for cache keys."""
+    if mode == "map_reduce":
+        return f"{generator_signature()}+map_reduce/{summarizer_name()}/fanout={REDUCE_FANOUT}"
+    return f"{generator_signature()}+{retrieval_signature()}+{packing_signature()}"
+
+
+def cached_report_content(
+    db: Session,
+    template_id: Optional[str],
+    library_ids: Optional[List[str]],
+    user_prompt: Optional[str],
+    mode: str = "single"
+) -> Optional[str]:
+    """Look up cached output for these report inputs without loading paper bodies."""
+    key = report_cache_key(
+        pipeline_signature(mode),
+        resolve_template_prompt(db, template_id),
+        user_prompt,
+        library_paper_hashes(db, library_ids or [])
+    )
+    return report_cache.get(db, key)
+
+
+def context_record(tokens: int, included: List[str], truncated: List[str] = (), omitted: List[str] = ()) -> dict:
+    """Report column values describing the context a report was generated from."""
+    return {
+        "context_tokens": tokens,
+        "context_papers": json.dumps({
+            "included": list(included),
+            "truncated": list(truncated),
+            "omitted": list(omitted),
+        }),
+    }
+
+
+def run_report_job(report_id: str, progress: Optional[ReportProgress] = None, use_cache: bool = True) -> None:
+    """Generate one report's content and store the outcome.
+
+    Output is served from the report cache when possible; freshly generated
+    output is always stored, even when ``use_cache`` is off.
+    """
+    progress = progress or ReportProgress()
+    if not claim_report(report_id):
+        # Cancelled (or deleted) before a worker picked it up
+        progress.finish("cancelled")
+        return
+    try:
+        generate_report(report_id, progress, use_cache)
+    finally:
+        release_report(report_id)
+
+
+def generate_report(report_id: str, progress: ReportProgress, use_cache: bool) -> None:
+    """Generate a running report and store the outcome."""
+    try:
+        inputs = load_report_inputs(report_id)
+        if inputs is None:
+            progress.finish("error", "Report not found")
+            return
+        papers, template_prompt, user_prompt, mode = inputs
+        key = report_cache_key(
+            pipeline_signature(mode), template_prompt, user_prompt,
+            [(p.id, p.content_hash) for p in papers]
+        )
+
+        cached = None
+        # Unknown for cached output
+        context_values = {"context_tokens": None, "context_papers": None}
+        if use_cache:
+            with get_db_session() as db:
+                cached = report_cache.get(db, key)
+        if cached is not None:
+            progress.publish(cached)
+        else:
+            if mode == "map_reduce":
+                # Every paper is represented, through its reduced summary
+                excerpts = map_reduce_context(papers, template_prompt, lambda: progress.cancelled)
+                if progress.cancelled:
+                    progress.finish("cancelled")
+                    return
+                context_values = context_record(
+                    sum(estimate_tokens(e.text) for e in excerpts), [p.id for p in papers]
+                )
+            else:
+                # Only the chunks most relevant to the prompts go to the generator
+                with get_db_session() as db:
+                    excerpts = retrieve_excerpts(db, papers, template_prompt, user_prompt)
+                packed = pack_context(papers, excerpts)
+                excerpts = packed.excerpts
+                context_values = context_record(packed.tokens, packed.included, packed.truncated, packed.omitted)
+            for chunk in get_report_generator()(papers, template_prompt, user_prompt, excerpts):
+                if progress.cancelled:
+                    progress.finish("cancelled")
+                    return
+                progress.publish(chunk)
+        content = "".join(progress.chunks)
+
+        if cached is None:
+            with get_db_session() as db:
+                report_cache.put(db, key, content)
+    except Exception as exc:
+        transition(report_id, "running", "error", error_message=str(exc))
+        progress.finish("error", str(exc))
+        return
+
+    if transition(report_id, "running", "ok", content_markdown=content, error_message=None, **context_values):
+        progress.finish("ok")
+    else:
+        progress.finish("cancelled")
+
+
+class ReportJobQueue:
+    """Runs report generation jobs on a fixed-size thread pool."""
+
+    def __init__(self, max_workers: int = REPORT_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._progress: Dict[str, ReportProgress] = {}
+        self._lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="report-worker"
+            )
+        if self._heartbeat is None:
+            self._stopping.clear()
+            self._heartbeat = threading.Thread(target=self._run_heartbeat, name="report-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def shutdown(self) -> None:
+        if self._heartbeat is not None:
+            self._stopping.set()
+            self._heartbeat.join()
+            self._heartbeat = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, report_id: str, use_cache: bool = True) -> Future:
+        """Queue a pending report for generation."""
+        self.start()
+        progress = ReportProgress()
+        with self._lock:
+            self._progress[report_id] = progress
+            future = self._executor.submit(run_report_job, report_id, progress, use_cache)
+            self._futures[report_id] = future
+        future.add_done_callback(lambda _: self._forget(report_id, future))
+        return future
+
+    def progress(self, report_id: str) -> Optional[ReportProgress]:
+        """Live progress for a queued or generating report, if any."""
+        with self._lock:
+            return self._progress.get(report_id)
+
+    def cancel(self, report_id: str) -> bool:
+        """Cancel a pending or running report; return False if it already finished."""
+        with self._lock:
+            future = self._futures.get(report_id)
+            progress = self._progress.get(report_id)
+        cancelled = transition(report_id, ACTIVE_STATUSES, "cancelled")
+        if cancelled and progress is not None:
+            progress.cancelled = True
+            if future is not None and future.cancel():
+                # Never started, so no worker will finish the progress
+                progress.finish("cancelled")
+        return cancelled
+
+    def resume(self) -> int:
+        """Queue pending reports and those whose generating process died.
+
+        Pending reports another process has queued as well are generated
+        once: only one process can claim them.
+        """
+        self.reclaim_expired()
+        with get_db_session() as db:
+            report_ids = [
+                row.id for row in db.query(Report.id).filter(Report.status == "pending")
+            ]
+        for report_id in report_ids:
+            self.submit(report_id)
+        return len(report_ids)
+
+    def reclaim_expired(self) -> List[str]:
+        """Move running reports whose lease lapsed back to pending; return their ids."""
+        cutoff = datetime.utcnow() - timedelta(seconds=REPORT_LEASE_SECONDS)
+        with get_db_session() as db:
+            expired = [
+                row.id for row in db.query(Report.id)
+                .outerjoin(ReportLease, ReportLease.report_id == Report.id)
+                .filter(Report.status == "running")
+                .filter(or_(ReportLease.report_id.is_(None), ReportLease.heartbeat_at < cutoff))
+            ]
+            if not expired:
+                return []
+            db.execute(
+                update(Report)
+                .where(Report.id.in_(expired))
+                .where(Report.status == "running")
+                .values(status="pending")
+                .execution_options(synchronize_session=False)
+            )
+            db.query(ReportLease).filter(ReportLease.report_id.in_(expired)).delete(synchronize_session=False)
+            invalidate_on_commit(db, expired)
+        return expired
+
+    def _run_heartbeat(self) -> None:
+        """Renew this process's leases and take over reports of dead processes."""
+        while not self._stopping.wait(REPORT_HEARTBEAT_SECONDS):
+            try:
+                with get_db_session() as db:
+                    db.query(ReportLease).filter(ReportLease.worker_id == WORKER_ID).update(
+                        {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+                    )
+                for report_id in self.reclaim_expired():
+                    self.submit(report_id)
+            except Exception:
+                logger.exception("Report heartbeat failed")
+
+    def refresh_stale(self, parallelism: int = REPORT_WORKERS) -> RefreshResult:
+        """Regenerate every stale report, dependencies first.
+
+        Stale reports are moved back to pending and grouped into topological
+        levels; a background thread runs each level with at most
+        ``parallelism`` reports in flight before starting the next. Reports
+        built from a library that has since been deleted cannot be rebuilt
+        and are marked ``error`` naming the missing libraries instead.
+        """
+        with get_db_session() as db:
+            stale = db.query(Report).filter(Report.status == "stale").all()
+            missing = missing_libraries(db, [rpt.id for rpt in stale])
+            for report_id, library_ids in missing.items():
+                db.execute(
+                    update(Report)
+                    .where(Report.id == report_id)
+                    .where(Report.status == "stale")
+                    .values(status="error", error_message=f"Libraries no longer exist: {', '.join(library_ids)}")
+                    .execution_options(synchronize_session=False)
+                )
+            graph = {rpt.id: report_dependencies(rpt) for rpt in stale if rpt.id not in missing}
+            db.execute(
+                update(Report)
+                .where(Report.id.in_(list(graph)))
+                .where(Report.status == "stale")
+                .values(status="pending")
+                .execution_options(synchronize_session=False)
+            )
+            invalidate_on_commit(db, [rpt.id for rpt in stale])
+        levels = topological_levels(graph)
+        if levels:
+            threading.Thread(
+                target=self._run_levels, args=(levels, max(parallelism, 1)),
+                name="report-refresh", daemon=True
+            ).start()
+        return RefreshResult(queued=len(graph), levels=levels, failed=sorted(missing))
+
+    def _run_levels(self, levels: List[List[str]], parallelism: int) -> None:
+        for level in levels:
+            queued = list(level)
+            in_flight = set()
+            while queued or in_flight:
+                while queued and len(in_flight) < parallelism:
+                    in_flight.add(self.submit(queued.pop(0)))
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+
+    def _forget(self, report_id: str, future: Future) -> None:
+        with self._lock:
+            if self._futures.get(report_id) is future:
+                del self._futures[report_id]
+                del self._progress[report_id]
+
+
+report_queue = ReportJobQueue()
@@ -0,0 +1,326 @@
+"""Chunked embedding index and semantic retrieval over papers.
+
+Each paper's text (title, abstract and markdown body) is split into
+section-sized chunks. Chunk embeddings live in a float32 NumPy memory-mapped
+matrix; the ``paper_chunks`` table maps each matrix row to its paper and
+character span, so only the rows of the papers being searched are read from
+disk. Chunks are (re)embedded lazily when a paper's content hash changes;
+the rows of replaced chunks are recorded in ``free_chunk_rows`` and reused,
+so the file does not grow with every edit.
+"""
+
+import math
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .database import get_db_session
+from .models import FreeChunkRow, Paper, PaperChunk
+
+# Target chunk size in characters; sections longer than this are split
+CHUNK_CHARS = int(os.environ.get("CHUNK_CHARS", "2000"))
+
+# Chunks handed to report generation
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "8"))
+
+EMBEDDINGS_PATH = Path(os.environ.get(
+    "EMBEDDINGS_PATH", Path(__file__).parent.parent / "pipelinecraft.embeddings.f32"
+))
+
+HEADING_RE = re.compile(r"^#{1,6}\s", re.MULTILINE)
+TOKEN_RE = re.compile(r"\w+")
+
+
+class Excerpt(NamedTuple):
+    """A retrieved chunk of paper text."""
+    paper_id: str
+    title: str
+    text: str
+    score: float
+
+
+# =============================================================================
+# Chunking
+# =============================================================================
+
+def paper_document(paper: Paper) -> str:
+    """The text a paper is chunked and embedded from."""
+    parts = [paper.title, paper.abstract, paper.text_markdown]
+    return "\n\n".join(part for part in parts if part)
+
+
+def chunk_spans(document: str, chunk_chars: int = CHUNK_CHARS) -> List[Tuple[int, int]]:
+    """Split a document into ``(start, end)`` spans along markdown sections.
+
+    Sections longer than ``chunk_chars`` are cut at the last paragraph break
+    in the second half of the window, or hard-cut if there is none.
+    """
+    boundaries = sorted({0, *(m.start() for m in HEADING_RE.finditer(document))}) + [len(document)]
+    spans = []
+    for section_start, section_end in zip(boundaries, boundaries[1:]):
+        pos = section_start
+        while pos < section_end:
+            end = min(pos + chunk_chars, section_end)
+            if end < section_end:
+                cut = document.rfind("\n\n", pos + chunk_chars // 2, end)
+                if cut != -1:
+                    end = cut
+            if document[pos:end].strip():
+                spans.append((pos, end))
+            pos = end
+    return spans
+
+
+# =============================================================================
+# Embedding backends
+# =============================================================================
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return an L2-normalized ``(len(texts), dim)`` float32 matrix."""
+        ...
+
+
+class HashingEmbedder:
+    """Deterministic offline embedder using the signed hashing trick.
+
+    Tokens are hashed into ``dim`` buckets with log-scaled term frequency, so
+    vectors need no vocabulary or model download and are stable across
+    processes.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            counts: Dict[str, int] = {}
+            for token in TOKEN_RE.findall(text.lower()):
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                h = zlib.crc32(token.encode())
+                sign = 1.0 if (h >> 31) & 1 else -1.0
+                vectors[i, h % self.dim] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+EMBEDDERS = {
+    "hashing": HashingEmbedder,
+}
+
+
+def get_embedder() -> Embedder:
+    """Return the embedder selected by the EMBEDDER env variable."""
+    return EMBEDDERS[os.environ.get("EMBEDDER", "hashing")]()
+
+
+# =============================================================================
+# Vector storage
+# =============================================================================
+
+class VectorStore:
+    """Float32 embedding matrix in a memory-mapped file, grown by doubling.
+
+    The mapping is shared by writers and concurrent searches. A new mapping
+    is only published, under ``_lock``, once the file has its new size, and
+    the file never shrinks while mapped, so a mapping handed out earlier
+    stays valid for every row it covers.
+    """
+
+    def __init__(self, path: Path, dim: int):
+        self.path = path
+        self.dim = dim
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        if not self.path.exists():
+            return 0
+        return self.path.stat().st_size // (self.dim * 4)
+
+    def _open(self, rows: int = 0) -> np.memmap:
+        """Return a mapping covering at least ``rows`` rows."""
+        with self._lock:
+            if self._matrix is None or len(self._matrix) < rows:
+                # The file may also have been grown by another process
+                self._matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+            return self._matrix
+
+    def reserve(self, rows: int) -> None:
+        """Make room for at least ``rows`` rows."""
+        with self._lock:
+            capacity = self.capacity
+            if rows <= capacity:
+                return
+            new_capacity = max(rows, capacity * 2, 1024)
+            with open(self.path, "ab") as f:
+                f.truncate(new_capacity * self.dim * 4)
+            self._matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(new_capacity, self.dim))
+
+    def write(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Store ``vectors[i]`` at row ``rows[i]``."""
+        end_row = int(rows.max()) + 1
+        self.reserve(end_row)
+        matrix = self._open(end_row)
+        matrix[rows] = vectors
+        matrix.flush()
+
+    def scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of ``query`` against the given rows."""
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self._open(int(rows.max()) + 1)[rows] @ query
+
+    def reset(self) -> None:
+        with self._lock:
+            self._matrix = None
+            if self.path.exists():
+                self.path.unlink()
+
+
+# =============================================================================
+# Index maintenance and retrieval
+# =============================================================================
+
+class ChunkIndex:
+    """Keeps paper chunks embedded and answers top-k similarity queries."""
+
+    def __init__(self, path: Path = EMBEDDINGS_PATH, embedder: Optional[Embedder] = None):
+        self.embedder = embedder or get_embedder()
+        self.store = VectorStore(path, self.embedder.dim)
+        # Serializes indexing: row allocation, file growth and the chunk rows
+        # claiming them are written and committed together under this lock
+        self._lock = threading.Lock()
+
+    def index_papers(self, papers: Sequence[Paper]) -> int:
+        """Embed papers whose chunks are missing or out of date; return how many.
+
+        Chunk rows are written and committed in a short-lived session of
+        their own before the lock is released, so no database write lock is
+        ever held while waiting on it.
+        """
+        with self._lock, get_db_session() as db:
+            self._drop_foreign_embeddings(db)
+            indexed = dict(
+                db.query(PaperChunk.paper_id, PaperChunk.content_hash)
+                .filter(PaperChunk.paper_id.in_([p.id for p in papers]))
+                .distinct()
+            )
+            stale = [p for p in papers if indexed.get(p.id) != p.content_hash]
+            if not stale:
+                return 0
+
+            texts, chunks = [], []
+            for paper in stale:
+                document = paper_document(paper)
+                for position, (start, end) in enumerate(chunk_spans(document)):
+                    texts.append(document[start:end])
+                    chunks.append(PaperChunk(
+                        paper_id=paper.id, position=position, start_offset=start, end_offset=end,
+                        content_hash=paper.content_hash, embedder=self.embedder.name
+                    ))
+
+            replaced = PaperChunk.paper_id.in_([p.id for p in stale])
+            freed = [row for (row,) in db.query(PaperChunk.row).filter(replaced)]
+            rows = self._allocate_rows(db, len(chunks))
+            db.query(PaperChunk).filter(replaced).delete(synchronize_session=False)
+            # Rows freed here are only handed out by a later run, so a search
+            # still holding this paper's old chunks never reads new vectors
+            db.add_all(FreeChunkRow(row=row) for row in freed)
+            if chunks:
+                for chunk, row in zip(chunks, rows):
+                    chunk.row = row
+                self.store.write(np.array(rows, dtype=np.int64), self.embedder.embed(texts))
+                db.add_all(chunks)
+            return len(stale)
+
+    def _allocate_rows(self, db: Session, count: int) -> List[int]:
+        """Take ``count`` matrix rows, reusing free rows before growing the file."""
+        rows = [row for (row,) in db.query(FreeChunkRow.row).order_by(FreeChunkRow.row).limit(count)]
+        if rows:
+            db.query(FreeChunkRow).filter(FreeChunkRow.row.in_(rows)).delete(synchronize_session=False)
+        if len(rows) < count:
+            next_row = max(
+                db.query(func.coalesce(func.max(model.row) + 1, 0)).scalar()
+                for model in (PaperChunk, FreeChunkRow)
+            )
+            rows += range(next_row, next_row + count - len(rows))
+        return rows
+
+    def _drop_foreign_embeddings(self, db: Session) -> None:
+        """Discard the whole index if it was built by a different embedder."""
+        other = db.query(PaperChunk.row).filter(PaperChunk.embedder != self.embedder.name).first()
+        if other is not None:
+            db.query(PaperChunk).delete(synchronize_session=False)
+            db.query(FreeChunkRow).delete(synchronize_session=False)
+            self.store.reset()
+
+    def search(self, db: Session, papers: Sequence[Paper], query: str, k: int = RETRIEVAL_TOP_K) -> List[Excerpt]:
+        """Return the ``k`` chunks of ``papers`` most similar to ``query``."""
+        if not papers or k <= 0:
+            return []
+        by_id = {p.id: p for p in papers}
+        chunks = (
+            db.query(PaperChunk.row, PaperChunk.paper_id, PaperChunk.start_offset, PaperChunk.end_offset)
+            .filter(PaperChunk.paper_id.in_(list(by_id)))
+            .all()
+        )
+        if not chunks:
+            return []
+
+        # Committed chunks only point at rows already written to the file, so
+        # reading them needs no lock
+        rows = np.fromiter((c.row for c in chunks), dtype=np.int64, count=len(chunks))
+        scores = self.store.scores(rows, self.embedder.embed([query])[0])
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        excerpts = []
+        for i in top:
+            chunk = chunks[i]
+            paper = by_id[chunk.paper_id]
+            excerpts.append(Excerpt(
+                paper_id=paper.id,
+                title=paper.title,
+                text=paper_document(paper)[chunk.start_offset:chunk.end_offset],
+                score=float(scores[i])
+            ))
+        return excerpts
+
+
+_chunk_index: Optional[ChunkIndex] = None
+
+
+def get_chunk_index() -> ChunkIndex:
+    global _chunk_index
+    if _chunk_index is None:
+        _chunk_index = ChunkIndex()
+    return _chunk_index
+
+
+def retrieve_excerpts(db: Session, papers: Sequence[Paper], template_prompt: str, user_prompt: Optional[str]) -> List[Excerpt]:
+    """Index the given papers if needed and pick the chunks most relevant to the prompts."""
+    index = get_chunk_index()
+    index.index_papers(papers)
+    query = "\n".join(p for p in (template_prompt, user_prompt) if p)
+    return index.search(db, papers, query)
+
+
+def retrieval_signature() -> str:
+    """Identifies the retrieval settings, for cache keys."""
+    return f"{get_chunk_index().embedder.name}/k={RETRIEVAL_TOP_K}/chunk={CHUNK_CHARS}"
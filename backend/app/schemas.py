@@ -1,10 +1,25 @@
 """Pydantic schemas for API request/response."""
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Generic, Literal, Optional, List, TypeVar
 from pydantic import BaseModel, Field
 
 
+# Projection used by listing endpoints: "summary" omits large paper bodies
+ViewMode = Literal["summary", "full"]
+
+# How report context is built; see report_jobs.GENERATION_MODES
+GenerationMode = Literal["single", "map_reduce"]
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """One page of a keyset-paginated listing."""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
 # =============================================================================
 # Paper Schemas
 # =============================================================================
@@ -29,6 +44,49 @@ class PaperResponse(PaperBase):
         from_attributes = True
 
 
+class PaperSearchHit(BaseModel):
+    """A ranked full-text search result."""
+    id: str
+    title: str
+    authors: Optional[str] = None
+    publish_date: Optional[datetime] = None
+    created_date: datetime
+    score: float  # Higher is more relevant
+    snippet: Optional[str] = None
+
+
+class BulkIngestError(BaseModel):
+    """A record rejected by bulk ingestion."""
+    index: int
+    id: Optional[str] = None
+    error: str
+
+
+class BulkIngestResult(BaseModel):
+    """Outcome of a bulk paper ingestion request."""
+    received: int = 0
+    upserted: int = 0
+    attached: int = 0
+    failed: int = 0
+    errors: List[BulkIngestError] = []
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
+
+
+class BulkDeleteRequest(BaseModel):
+    ids: List[str]
+
+
+class BulkDeleteResult(BaseModel):
+    """Outcome of a bulk entity delete."""
+    deleted: int = 0
+    libraries: int = 0
+    templates: int = 0
+    reports: int = 0
+    not_found: List[str] = []
+    stale_reports: int = 0  # Remaining reports marked stale because a dependency was deleted
+
+
 # =============================================================================
 # Library Schemas
 # =============================================================================
@@ -39,7 +97,7 @@ class LibraryBase(BaseModel):
 
 
 class LibraryCreate(LibraryBase):
-    pass
+    folderId: Optional[str] = None  # Defaults to the Libraries root folder
 
 
 class LibraryResponse(LibraryBase):
@@ -75,7 +133,7 @@ class TemplateBase(BaseModel):
 
 
 class TemplateCreate(TemplateBase):
-    pass
+    folderId: Optional[str] = None  # Defaults to the Templates root folder (kept on update)
 
 
 class TemplateResponse(TemplateBase):
@@ -98,7 +156,17 @@ class ReportBase(BaseModel):
 
 
 class ReportCreate(ReportBase):
-    pass
+    folderId: Optional[str] = None  # Defaults to the Reports root folder
+    generation_mode: GenerationMode = "single"  # map_reduce summarizes every paper first
+    bypass_cache: bool = False  # Always regenerate, ignoring cached output
+
+
+class ReportContext(BaseModel):
+    """Which papers made it into a report's LLM context."""
+    tokens: int
+    included: List[str] = []
+    truncated: List[str] = []  # Abstract only
+    omitted: List[str] = []
 
 
 class ReportResponse(BaseModel):
@@ -107,14 +175,61 @@ class ReportResponse(BaseModel):
     template_id: Optional[str] = None
     library_ids: Optional[List[str]] = None
     user_prompt: Optional[str] = None
+    generation_mode: Optional[str] = None
     content_markdown: Optional[str] = None
     status: str
+    error_message: Optional[str] = None
+    context: Optional[ReportContext] = None
     created_date: datetime
 
     class Config:
         from_attributes = True
 
 
+class ReportStatus(BaseModel):
+    """Generation status of a report, for polling."""
+    id: str
+    status: str  # 'pending', 'running', 'ok', 'error', 'cancelled'
+    error_message: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class RefreshResult(BaseModel):
+    """Stale reports queued for regeneration, in dependency order."""
+    queued: int
+    levels: List[List[str]]
+    failed: List[str] = []  # Built from deleted libraries; marked error
+
+
+class ReportCacheStats(BaseModel):
+    """Report generation cache counters."""
+    hits: int
+    misses: int
+    stores: int
+    evictions: int
+    hit_rate: float
+    entries: int
+    total_bytes: int
+    max_entries: int
+    max_bytes: int
+
+
+class EntityCacheStats(BaseModel):
+    """Entity payload cache counters."""
+    backend: str
+    hits: int
+    misses: int
+    hit_rate: float
+    invalidations: int
+    evictions: int
+    entries: int
+    total_bytes: int
+    max_entries: int
+    max_bytes: int
+
+
 # =============================================================================
 # Entity Schemas (for frontend compatibility)
 # =============================================================================
@@ -156,12 +271,36 @@ class Folder(BaseModel):
     id: str
     name: str
     parentId: Optional[str] = None
+    path: Optional[str] = None  # "/<root id>/.../<id>/"
     created_date: datetime
 
     class Config:
         from_attributes = True
 
 
+class FolderCreate(BaseModel):
+    name: str
+    parentId: Optional[str] = None
+
+
+class FolderMove(BaseModel):
+    parentId: Optional[str] = None  # None moves the folder to the top level
+
+
+class EntityMove(BaseModel):
+    folderId: str
+
+
+class FolderCounts(BaseModel):
+    """Subfolders and entities anywhere under a folder."""
+    folder_id: str
+    folders: int
+    libraries: int
+    templates: int
+    reports: int
+    entities: int
+
+
 class Log(BaseModel):
     """Log entry."""
     id: str
@@ -174,6 +313,28 @@ class Log(BaseModel):
         from_attributes = True
 
 
+class LogCreate(BaseModel):
+    message: str
+    level: str = "info"
+    entityId: Optional[str] = None
+    created_date: Optional[datetime] = None  # Defaults to the time it is received
+
+
+class LogBulkResult(BaseModel):
+    accepted: int
+
+
+class LogRollup(BaseModel):
+    """Count of expired log entries for one day, level and entity."""
+    day: str
+    level: str
+    entityId: Optional[str] = None
+    count: int
+
+    class Config:
+        from_attributes = True
+
+
 class Branch(BaseModel):
     id: str
     name: str
@@ -184,12 +345,60 @@ class Branch(BaseModel):
         from_attributes = True
 
 
+class BranchCreate(BaseModel):
+    name: str
+    headVersionId: Optional[str] = None
+
+
+class EntityVersionCreate(BaseModel):
+    entityId: str
+    data: Optional[str] = None  # JSON entity state; defaults to the entity's current state
+    # Commit on top of this branch's head and advance it
+    branchId: Optional[str] = None
+    # Defaults to the branch head, or else the entity's latest version. With
+    # a branch, a parent that is no longer the head is a conflict.
+    parentId: Optional[str] = None
+
+
 class EntityVersion(BaseModel):
+    """Version metadata; ``data`` is only included when asked for."""
     id: str
     entityId: str
-    data: str
     parentId: Optional[str] = None
+    depth: Optional[int] = None
+    content_hash: Optional[str] = None
+    size: Optional[int] = None
+    data: Optional[str] = None
     created_date: datetime
 
     class Config:
         from_attributes = True
+
+
+ChangeStatus = Literal["added", "removed", "modified"]
+
+
+class EntityChange(BaseModel):
+    """How one entity differs between two versions of the history."""
+    entityId: str
+    status: ChangeStatus
+    from_version_id: Optional[str] = None
+    to_version_id: Optional[str] = None
+    from_hash: Optional[str] = None
+    to_hash: Optional[str] = None
+
+
+class VersionDiff(BaseModel):
+    from_version_id: str
+    to_version_id: str
+    merge_base_id: Optional[str] = None
+    changes: List[EntityChange] = []
+
+
+class VersionStoreStats(BaseModel):
+    versions: int
+    blobs: int
+    snapshots: int
+    deltas: int
+    content_bytes: int  # Uncompressed size of every distinct state
+    stored_bytes: int
@@ -0,0 +1,137 @@
+"""Full-text search over papers with SQLite FTS5.
+
+``papers_fts`` is an external-content FTS5 table over the papers table, so
+paper text is not stored twice; triggers keep the index in step with every
+insert, update (including upserts) and delete.
+
+FTS rows are keyed on ``papers.search_rowid``, an explicit integer the
+insert trigger assigns, not on the implicit rowid: papers has a string
+primary key, so VACUUM may renumber its rowids and would silently detach
+the index from its content.
+"""
+
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from .schemas import PaperSearchHit
+
+# Relative BM25 weights for the indexed columns (title, abstract, body)
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Tokens around each match in a snippet
+SNIPPET_TOKENS = 16
+
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+        title, abstract, text_markdown,
+        content='papers', content_rowid='search_rowid',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS papers_fts_ai AFTER INSERT ON papers BEGIN
+        UPDATE papers SET search_rowid = (SELECT COALESCE(MAX(search_rowid), 0) + 1 FROM papers)
+        WHERE rowid = new.rowid;
+        INSERT INTO papers_fts(rowid, title, abstract, text_markdown)
+        SELECT search_rowid, title, abstract, text_markdown FROM papers WHERE rowid = new.rowid;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS papers_fts_ad AFTER DELETE ON papers BEGIN
+        INSERT INTO papers_fts(papers_fts, rowid, title, abstract, text_markdown)
+        VALUES ('delete', old.search_rowid, old.title, old.abstract, old.text_markdown);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS papers_fts_au AFTER UPDATE OF title, abstract, text_markdown ON papers BEGIN
+        INSERT INTO papers_fts(papers_fts, rowid, title, abstract, text_markdown)
+        VALUES ('delete', old.search_rowid, old.title, old.abstract, old.text_markdown);
+        INSERT INTO papers_fts(rowid, title, abstract, text_markdown)
+        VALUES (new.search_rowid, new.title, new.abstract, new.text_markdown);
+    END
+    """,
+]
+
+
+def search_supported(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def ensure_paper_search_index(db: Session) -> bool:
+    """Create the FTS table and triggers, indexing existing papers on first run.
+
+    Returns whether the index was built from scratch.
+    """
+    if not search_supported(db):
+        return False
+    exists = db.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'papers_fts'"
+    )).first()
+    if not exists:
+        # Papers stored before search existed have no search_rowid yet
+        db.execute(text("UPDATE papers SET search_rowid = rowid WHERE search_rowid IS NULL"))
+    for statement in FTS_SCHEMA:
+        db.execute(text(statement))
+    if not exists:
+        db.execute(text("INSERT INTO papers_fts(papers_fts) VALUES ('rebuild')"))
+    return not exists
+
+
+def to_match_query(q: str) -> str:
+    """Turn free text into an FTS5 query that ANDs each term as a literal.
+
+    Quoting every term keeps characters like ``-`` or ``:`` in user input
+    from being read as FTS5 operators.
+    """
+    terms = [term.replace('"', '""') for term in q.split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def search_papers(
+    db: Session,
+    q: str,
+    library_id: Optional[str],
+    limit: int,
+    offset: int,
+    raw: bool = False
+) -> Tuple[List[PaperSearchHit], bool]:
+    """Run a BM25-ranked search; return one page of hits and whether more exist."""
+    if not search_supported(db):
+        raise HTTPException(status_code=501, detail="Full-text search requires SQLite FTS5")
+
+    match = q if raw else to_match_query(q)
+    if not match.strip():
+        return [], False
+
+    library_join = ""
+    params = {"match": match, "limit": limit + 1, "offset": offset}
+    if library_id:
+        library_join = (
+            "JOIN library_papers lp ON lp.paper_id = p.id AND lp.library_id = :library_id"
+        )
+        params["library_id"] = library_id
+
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    sql = f"""
+        SELECT p.id, p.title, p.authors, p.publish_date, p.created_date,
+               -bm25(papers_fts, {weights}) AS score,
+               snippet(papers_fts, -1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM papers_fts
+        JOIN papers p ON p.search_rowid = papers_fts.rowid
+        {library_join}
+        WHERE papers_fts MATCH :match
+        ORDER BY bm25(papers_fts, {weights})
+        LIMIT :limit OFFSET :offset
+    """
+    try:
+        rows = db.execute(text(sql), params).mappings().all()
+    except OperationalError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {exc.orig}")
+
+    hits = [PaperSearchHit.model_validate(dict(row)) for row in rows[:limit]]
+    return hits, len(rows) > limit
@@ -0,0 +1,181 @@
+"""Ancestry queries over the EntityVersion history.
+
+Each version records the entity state after one change, and ``parentId``
+links it to the version it was made on top of (a branch head points at
+the newest). The state of every entity at a version is therefore the
+newest version of each entity among its ancestors.
+
+Two indexes keep this cheap on deep histories:
+
+* ``depth`` and ``skipId`` form a skip list (the scheme Bitcoin uses for
+  its block index): every version points at one ancestor further up,
+  chosen so that reaching any ancestor takes O(log n) lookups. Merge bases
+  are found by binary search over depths on top of that.
+* Checkout and diff collect ancestors with a single recursive CTE, bounded
+  by the merge base's depth for diffs, so history is walked in the
+  database instead of one query per parent.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, defer
+
+from .models import EntityVersion
+from .schemas import EntityChange, VersionDiff
+
+
+def _invert_lowest_one(n: int) -> int:
+    return n & (n - 1)
+
+
+def skip_depth(depth: int) -> int:
+    """Depth of the ancestor a version at ``depth`` keeps a skip pointer to."""
+    if depth < 2:
+        return 0
+    if depth & 1:
+        return _invert_lowest_one(_invert_lowest_one(depth - 1)) + 1
+    return _invert_lowest_one(depth)
+
+
+class Ancestry:
+    """Ancestor lookups through the skip list, caching the versions read."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._nodes = {}
+
+    def node(self, version_id: str):
+        node = self._nodes.get(version_id)
+        if node is None:
+            node = self.db.query(
+                EntityVersion.id, EntityVersion.parentId, EntityVersion.skipId, EntityVersion.depth
+            ).filter(EntityVersion.id == version_id).first()
+            if node is None:
+                raise LookupError(f"Version not found: {version_id}")
+            self._nodes[version_id] = node
+        return node
+
+    def ancestor_at(self, version_id: str, depth: int) -> Optional[str]:
+        """The ancestor of a version (or the version itself) at ``depth``."""
+        node = self.node(version_id)
+        if depth < 0 or depth > node.depth:
+            return None
+        while node.depth > depth:
+            jump = skip_depth(node.depth)
+            jump_prev = skip_depth(node.depth - 1)
+            # Take the skip pointer unless it overshoots and the parent's
+            # pointer would land closer to the target
+            if node.skipId and (jump == depth or (jump > depth and not (jump_prev < jump - 2 and jump_prev >= depth))):
+                node = self.node(node.skipId)
+            else:
+                node = self.node(node.parentId)
+        return node.id
+
+    def merge_base(self, a: str, b: str) -> Optional[str]:
+        """The newest common ancestor of two versions, if they share a root."""
+        depth = min(self.node(a).depth, self.node(b).depth)
+        a = self.ancestor_at(a, depth)
+        b = self.ancestor_at(b, depth)
+        if a == b:
+            return a
+        if self.ancestor_at(a, 0) != self.ancestor_at(b, 0):
+            return None
+        # Ancestors agree up to the merge base's depth and differ below it
+        low, high = 0, depth - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.ancestor_at(a, mid) == self.ancestor_at(b, mid):
+                low = mid
+            else:
+                high = mid - 1
+        return self.ancestor_at(a, low)
+
+
+def index_version(db: Session, version: EntityVersion) -> None:
+    """Set a new version's depth and skip pointer from its parent."""
+    if version.parentId is None:
+        version.depth = 0
+        version.skipId = None
+        return
+    ancestry = Ancestry(db)
+    version.depth = ancestry.node(version.parentId).depth + 1
+    version.skipId = ancestry.ancestor_at(version.parentId, skip_depth(version.depth))
+
+
+def ancestry_cte(head_id: str, above_depth: Optional[int] = None):
+    """Recursive CTE of a version and its ancestors deeper than ``above_depth``."""
+    columns = (EntityVersion.id, EntityVersion.parentId, EntityVersion.entityId, EntityVersion.depth)
+    head = select(*columns).where(EntityVersion.id == head_id)
+    if above_depth is not None:
+        head = head.where(EntityVersion.depth > above_depth)
+    ancestry = head.cte("ancestry", recursive=True)
+    parents = select(*columns).join(ancestry, EntityVersion.id == ancestry.c.parentId)
+    if above_depth is not None:
+        parents = parents.where(EntityVersion.depth > above_depth)
+    return ancestry.union_all(parents)
+
+
+def latest_versions(
+    db: Session,
+    head_id: str,
+    above_depth: Optional[int] = None,
+    entity_ids: Optional[Iterable[str]] = None
+) -> Dict[str, EntityVersion]:
+    """The newest version of each entity among a version's ancestors, by entity id."""
+    ancestry = ancestry_cte(head_id, above_depth)
+    ranked = select(
+        ancestry.c.id,
+        func.row_number().over(
+            partition_by=ancestry.c.entityId, order_by=ancestry.c.depth.desc()
+        ).label("rank")
+    )
+    if entity_ids is not None:
+        ranked = ranked.where(ancestry.c.entityId.in_(list(entity_ids)))
+    ranked = ranked.subquery()
+    versions = db.query(EntityVersion).options(defer(EntityVersion.data)).join(
+        ranked, ranked.c.id == EntityVersion.id
+    ).filter(ranked.c.rank == 1).order_by(EntityVersion.entityId).all()
+    return {v.entityId: v for v in versions}
+
+
+def checkout(db: Session, version_id: str) -> List[EntityVersion]:
+    """The version of every entity as of ``version_id``."""
+    return list(latest_versions(db, version_id).values())
+
+
+def diff_versions(db: Session, from_id: str, to_id: str) -> VersionDiff:
+    """Entities whose state differs between two versions.
+
+    Only versions after the merge base can differ, so just those are walked
+    on each side; the base's state is looked up for the entities touched.
+    """
+    ancestry = Ancestry(db)
+    base_id = ancestry.merge_base(from_id, to_id)
+    base_depth = ancestry.node(base_id).depth if base_id else None
+    before = latest_versions(db, from_id, base_depth)
+    after = latest_versions(db, to_id, base_depth)
+    touched = set(before) | set(after)
+    if base_id and touched:
+        at_base = latest_versions(db, base_id, entity_ids=touched)
+        before = {**at_base, **before}
+        after = {**at_base, **after}
+
+    changes = []
+    for entity_id in sorted(touched):
+        old, new = before.get(entity_id), after.get(entity_id)
+        if old is not None and new is not None:
+            if old.id == new.id or (old.content_hash and old.content_hash == new.content_hash):
+                continue
+            status = "modified"
+        else:
+            status = "added" if old is None else "removed"
+        changes.append(EntityChange(
+            entityId=entity_id,
+            status=status,
+            from_version_id=old.id if old else None,
+            to_version_id=new.id if new else None,
+            from_hash=old.content_hash if old else None,
+            to_hash=new.content_hash if new else None
+        ))
+    return VersionDiff(from_version_id=from_id, to_version_id=to_id, merge_base_id=base_id, changes=changes)
@@ -0,0 +1,190 @@
+"""Content-addressed, delta-compressed storage of entity version states.
+
+A version's state (the entity's JSON) is canonicalized and stored once per
+distinct content in ``version_blobs``, keyed by its SHA-256, so identical
+states (e.g. a revert) share a blob. A new state is stored as a delta
+against its parent version's state when that is smaller than the full
+compressed text. Every VERSION_SNAPSHOT_INTERVAL-th link in a chain is a
+full snapshot, so rebuilding a state applies at most that many deltas.
+
+Deltas work on tokens that end at commas or newlines (including the
+escaped ``\\n`` inside JSON strings), so an edit to one line of report
+markdown or one paper in a library only stores the tokens that changed.
+"""
+
+import hashlib
+import json
+import os
+import re
+import zlib
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .database import dialect_insert
+from .models import EntityVersion, VersionBlob
+from .schemas import VersionStoreStats
+from .version_graph import index_version
+
+# Maximum number of deltas between a state and its nearest full snapshot
+VERSION_SNAPSHOT_INTERVAL = int(os.environ.get("VERSION_SNAPSHOT_INTERVAL", "16"))
+
+# Split after commas, real newlines and JSON-escaped newlines
+TOKEN_BOUNDARY = re.compile(r"(?<=[,\n])|(?<=\\n)")
+
+# A delta is a list of copy ranges over the base's tokens and inserted text
+Delta = List[Union[List[int], str]]
+
+
+def canonical_state(data: str) -> str:
+    """Normalize a JSON state so equal content always hashes the same."""
+    try:
+        return json.dumps(json.loads(data), sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        return data
+
+
+def content_digest(state: str) -> str:
+    return hashlib.sha256(state.encode()).hexdigest()
+
+
+def tokenize(state: str) -> List[str]:
+    return TOKEN_BOUNDARY.split(state)
+
+
+def make_delta(base: str, state: str) -> Delta:
+    base_tokens = tokenize(base)
+    tokens = tokenize(state)
+    delta: Delta = []
+    matcher = SequenceMatcher(None, base_tokens, tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([i1, i2])
+        elif j2 > j1:
+            delta.append("".join(tokens[j1:j2]))
+    return delta
+
+
+def apply_delta(base: str, delta: Delta) -> str:
+    base_tokens = tokenize(base)
+    return "".join(
+        op if isinstance(op, str) else "".join(base_tokens[op[0]:op[1]])
+        for op in delta
+    )
+
+
+def load_states(db: Session, hashes: Iterable[str]) -> Dict[str, str]:
+    """Rebuild the states stored under ``hashes``.
+
+    Blobs are fetched one chain level per query, and states shared between
+    chains are only rebuilt once.
+    """
+    hashes = set(hashes)
+    blobs = {}
+    pending = set(hashes)
+    while pending:
+        rows = db.query(VersionBlob.hash, VersionBlob.base_hash, VersionBlob.data).filter(
+            VersionBlob.hash.in_(pending)
+        ).all()
+        missing = pending - {row.hash for row in rows}
+        if missing:
+            raise LookupError(f"Missing version blob: {sorted(missing)[0]}")
+        blobs.update((row.hash, row) for row in rows)
+        pending = {row.base_hash for row in rows if row.base_hash and row.base_hash not in blobs}
+
+    states: Dict[str, str] = {}
+    for digest in hashes:
+        chain = []
+        while digest not in states:
+            chain.append(blobs[digest])
+            digest = blobs[digest].base_hash
+            if digest is None:
+                break
+        for row in reversed(chain):
+            raw = zlib.decompress(row.data).decode()
+            states[row.hash] = raw if row.base_hash is None else apply_delta(states[row.base_hash], json.loads(raw))
+    return {digest: states[digest] for digest in hashes}
+
+
+def store_state(db: Session, state: str, base_hash: Optional[str] = None) -> str:
+    """Store a canonical state, as a delta against ``base_hash`` when smaller.
+
+    Returns the state's hash; content already stored is not written again.
+    """
+    digest = content_digest(state)
+    if db.query(VersionBlob.hash).filter(VersionBlob.hash == digest).first():
+        return digest
+
+    full = zlib.compress(state.encode())
+    row = {"hash": digest, "base_hash": None, "depth": 0, "data": full}
+    base = None
+    if base_hash:
+        base = db.query(VersionBlob.depth).filter(VersionBlob.hash == base_hash).first()
+    if base is not None and base.depth + 1 < VERSION_SNAPSHOT_INTERVAL:
+        base_state = load_states(db, [base_hash])[base_hash]
+        delta = zlib.compress(json.dumps(make_delta(base_state, state)).encode())
+        if len(delta) < len(full):
+            row = {"hash": digest, "base_hash": base_hash, "depth": base.depth + 1, "data": delta}
+
+    row.update(size=len(state), stored_size=len(row["data"]))
+    # A concurrent writer may have stored the same content first
+    db.execute(dialect_insert(db, VersionBlob.__table__).on_conflict_do_nothing(), [row])
+    return digest
+
+
+def latest_version(db: Session, entity_id: str) -> Optional[EntityVersion]:
+    return db.query(EntityVersion).filter(EntityVersion.entityId == entity_id).order_by(
+        EntityVersion.created_date.desc(), EntityVersion.id.desc()
+    ).first()
+
+
+def create_version(
+    db: Session,
+    version_id: str,
+    entity_id: str,
+    data: str,
+    parent: Optional[EntityVersion] = None
+) -> EntityVersion:
+    """Record a new version of an entity on top of ``parent``.
+
+    The state is delta-encoded against the parent when it is a version of
+    the same entity, otherwise against the entity's latest version.
+    """
+    state = canonical_state(data)
+    base = parent if parent is not None and parent.entityId == entity_id else latest_version(db, entity_id)
+    version = EntityVersion(
+        id=version_id,
+        entityId=entity_id,
+        parentId=parent.id if parent is not None else None,
+        content_hash=store_state(db, state, base.content_hash if base is not None else None),
+        size=len(state)
+    )
+    index_version(db, version)
+    db.add(version)
+    db.flush()
+    return version
+
+
+def version_states(db: Session, versions: List[EntityVersion]) -> Dict[str, str]:
+    """The state of each version by version id, including legacy inline ones."""
+    states = load_states(db, {v.content_hash for v in versions if v.content_hash})
+    return {v.id: states[v.content_hash] if v.content_hash else v.data for v in versions}
+
+
+def version_store_stats(db: Session) -> VersionStoreStats:
+    blobs, snapshots, content_bytes, stored_bytes = db.query(
+        func.count(VersionBlob.hash),
+        func.count(VersionBlob.hash).filter(VersionBlob.base_hash.is_(None)),
+        func.coalesce(func.sum(VersionBlob.size), 0),
+        func.coalesce(func.sum(VersionBlob.stored_size), 0)
+    ).one()
+    return VersionStoreStats(
+        versions=db.query(func.count(EntityVersion.id)).scalar(),
+        blobs=blobs,
+        snapshots=snapshots,
+        deltas=blobs - snapshots,
+        content_bytes=content_bytes,
+        stored_bytes=stored_bytes
+    )
@@ -0,0 +1,159 @@
+"""Load benchmark for the read endpoints, for comparing two backend trees.
+
+Each tree is benchmarked in its own process against a fresh SQLite file:
+a 200-paper library and 50 templates are created, then a mix of library,
+template, paper and entity reads is sent through an in-process ASGI client
+at each concurrency level. Sync builds run their routes on the default
+thread pool; async builds run them on the event loop.
+
+Compare the current tree with the last sync build, e.g.:
+
+    git worktree add /tmp/pipelinecraft-sync 8a62775
+    python scripts/load_benchmark.py --baseline /tmp/pipelinecraft-sync/backend
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", type=Path, help="Backend directory of a tree to compare against")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per concurrency level")
+    parser.add_argument("--threads", type=int, default=40, help="Thread pool size for sync routes")
+    parser.add_argument("--worker", type=Path, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def open_app(root: Path):
+    """Import the app of the tree at ``root``, backed by DATABASE_URL."""
+    sys.path.insert(0, str(root))
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app import database, main
+
+    url = os.environ["DATABASE_URL"]
+    if database.engine.url.render_as_string() != url:
+        # Trees that predate DATABASE_URL always open their own file
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        database.engine = engine
+        database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return main.app
+
+
+async def run_startup(app) -> None:
+    for handler in app.router.on_startup:
+        result = handler()
+        if inspect.isawaitable(result):
+            await result
+
+
+async def seed(client) -> list:
+    library_id = (await client.post("/api/libraries", json={"name": "Benchmark"})).json()["id"]
+    await client.post(f"/api/papers/bulk?library_id={library_id}", json=[
+        {"id": f"paper-{i}", "title": f"Paper {i}", "abstract": "x" * 500} for i in range(200)
+    ])
+    for i in range(50):
+        await client.post("/api/templates", json={"name": f"Template {i}", "prompt": "Summarize."})
+    return [
+        f"/api/libraries/{library_id}",
+        "/api/templates?limit=20",
+        "/api/papers?limit=50",
+        "/api/entities?limit=20",
+    ]
+
+
+async def run_level(client, paths: list, concurrency: int, requests: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.get(paths[i % len(paths)])
+                if response.status_code != 200:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "req_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+async def worker(args: argparse.Namespace) -> None:
+    import anyio.to_thread
+    import httpx
+
+    app = open_app(args.worker)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+    await run_startup(app)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+        paths = await seed(client)
+        for concurrency in args.concurrency:
+            print(json.dumps(await run_level(client, paths, concurrency, args.requests)), flush=True)
+
+
+def benchmark_tree(root: Path, args: argparse.Namespace) -> list:
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{scratch}/benchmark.db",
+            EMBEDDINGS_PATH=f"{scratch}/benchmark.embeddings.f32",
+            REPORT_GENERATOR="fake",
+        )
+        command = [
+            sys.executable, __file__, "--worker", str(root),
+            "--requests", str(args.requests), "--threads", str(args.threads),
+            "--concurrency", *map(str, args.concurrency),
+        ]
+        output = subprocess.run(command, env=env, cwd=root, check=True, capture_output=True, text=True).stdout
+    return [json.loads(line) for line in output.splitlines() if line.startswith("{")]
+
+
+def main() -> None:
+    args = parse_args()
+    if args.worker:
+        asyncio.run(worker(args))
+        return
+
+    trees = [("current", BACKEND_DIR)]
+    if args.baseline:
+        trees.insert(0, ("baseline", args.baseline.resolve()))
+    print(f"{'tree':<10}{'conc':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    for name, root in trees:
+        for result in benchmark_tree(root, args):
+            print(
+                f"{name:<10}{result['concurrency']:>6}{result['req_per_s']:>9}"
+                f"{result['p50_ms']:>9}{result['p95_ms']:>9}{result['errors']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
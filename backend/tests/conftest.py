@@ -0,0 +1,107 @@
+"""Shared fixtures: an isolated SQLite database and app client per test."""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Settings read at import time; each test still gets its own database below
+_SCRATCH = tempfile.mkdtemp(prefix="pipelinecraft-tests-")
+atexit.register(shutil.rmtree, _SCRATCH, ignore_errors=True)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_SCRATCH}/pipelinecraft.db")
+os.environ.setdefault("EMBEDDINGS_PATH", f"{_SCRATCH}/pipelinecraft.embeddings.f32")
+os.environ.setdefault("REPORT_GENERATOR", "fake")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import database, retrieval  # noqa: E402
+from app.database import apply_sqlite_pragmas, engine_options  # noqa: E402
+from app.entity_cache import LocalBackend, entity_cache  # noqa: E402
+from app.llm_service import REPORT_GENERATORS, fake_report_stream  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+class QueryCounter:
+    """Counts SQL statements executed on the engines it is attached to."""
+
+    def __init__(self):
+        self.count = 0
+
+    def attach(self, sync_engine) -> None:
+        event.listen(sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args, **kwargs) -> None:
+        self.count += 1
+
+
+class GatedGenerator:
+    """The fake report generator, held after its first chunk until released."""
+
+    def __init__(self):
+        self.reached = threading.Event()
+        self.released = threading.Event()
+        self.error = None
+
+    def __call__(self, papers, template_prompt, user_prompt=None, excerpts=None):
+        chunks = fake_report_stream(papers, template_prompt, user_prompt, excerpts)
+        yield next(chunks)
+        self.reached.set()
+        assert self.released.wait(10), "generator never released"
+        if self.error:
+            raise RuntimeError(self.error)
+        yield from chunks
+
+
+@pytest.fixture
+def query_counter() -> QueryCounter:
+    return QueryCounter()
+
+
+@pytest.fixture
+def db_engines(tmp_path, monkeypatch, query_counter):
+    """Point the app's engines and sessions at a fresh database file."""
+    url = f"sqlite:///{tmp_path}/test.db"
+    async_url = database.async_database_url(url)
+    engine = create_engine(url, **engine_options(url))
+    async_engine = create_async_engine(async_url, **engine_options(async_url))
+    for sync_engine in (engine, async_engine.sync_engine):
+        apply_sqlite_pragmas(sync_engine)
+        query_counter.attach(sync_engine)
+
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    monkeypatch.setattr(database, "async_engine", async_engine)
+    monkeypatch.setattr(
+        database, "AsyncSessionLocal",
+        async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    )
+    monkeypatch.setattr(retrieval, "_chunk_index", retrieval.ChunkIndex(tmp_path / "embeddings.f32"))
+    monkeypatch.setattr(entity_cache, "backend", LocalBackend())
+    yield engine
+    engine.dispose()
+    async_engine.sync_engine.dispose()
+
+
+@pytest.fixture
+def client(db_engines):
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def gated_generator(monkeypatch):
+    generator = GatedGenerator()
+    monkeypatch.setitem(REPORT_GENERATORS, "fake", generator)
+    yield generator
+    generator.released.set()
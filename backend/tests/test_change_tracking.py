@@ -0,0 +1,26 @@
+"""Change counters behind the ETags."""
+
+from sqlalchemy import text
+
+from app.change_tracking import TRACKED_TABLES
+from app.database import get_db_session
+
+
+def trigger_tables(db) -> set:
+    rows = db.execute(text("SELECT tbl_name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_version_%'"))
+    return {row.tbl_name for row in rows}
+
+
+def test_only_etag_tables_carry_counter_triggers(client):
+    with get_db_session() as db:
+        assert trigger_tables(db) == set(TRACKED_TABLES)
+
+
+def test_entity_write_changes_the_entity_list_etag(client):
+    etag = client.get("/api/entities").headers["etag"]
+    assert client.get("/api/entities", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/api/libraries", json={"name": "Library"})
+    response = client.get("/api/entities", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,63 @@
+"""Query cost of the entity endpoints."""
+
+import pytest
+
+from app.database import get_db_session
+from app.entity_cache import entity_cache
+from app.models import Library, Paper, Report, Template
+
+
+def seed_entities(count: int, papers_per_library: int = 3) -> None:
+    """Add ``count`` each of libraries, templates and reports, linked together."""
+    with get_db_session() as db:
+        start = db.query(Library).count()
+        for i in range(start, start + count):
+            papers = [
+                Paper(id=f"paper-{i}-{j}", title=f"Paper {j}", abstract="Abstract.", text_markdown="Body.")
+                for j in range(papers_per_library)
+            ]
+            for paper in papers:
+                paper.refresh_content_hash()
+            library = Library(id=f"library-{i}", name=f"Library {i}", papers=papers)
+            template = Template(id=f"template-{i}", name=f"Template {i}", prompt="Summarize.")
+            report = Report(
+                id=f"report-{i}", name=f"Report {i}", template_id=template.id,
+                status="ok", content_markdown="# Report"
+            )
+            report.library_ids = [library.id]
+            db.add_all([library, template, report])
+
+
+def queries_for(client, query_counter, url: str) -> int:
+    entity_cache.clear()
+    before = query_counter.count
+    response = client.get(url)
+    assert response.status_code == 200, response.text
+    return query_counter.count - before
+
+
+@pytest.mark.parametrize("url", ["/api/entities?limit=1000", "/api/entities?limit=1000&view=full"])
+def test_entity_list_query_count_does_not_grow_with_entities(client, query_counter, url):
+    seed_entities(5)
+    small = queries_for(client, query_counter, url)
+    assert len(client.get(url).json()["items"]) == 15
+
+    seed_entities(50)
+    large = queries_for(client, query_counter, url)
+    assert len(client.get(url).json()["items"]) == 165
+
+    assert large == small, (small, large)
+
+
+def test_get_entity_query_count_does_not_grow_with_entities(client, query_counter):
+    seed_entities(5)
+    small = {
+        kind: queries_for(client, query_counter, f"/api/entities/{kind}-0")
+        for kind in ("library", "template", "report")
+    }
+    seed_entities(50)
+    large = {
+        kind: queries_for(client, query_counter, f"/api/entities/{kind}-0")
+        for kind in ("library", "template", "report")
+    }
+    assert large == small, (small, large)
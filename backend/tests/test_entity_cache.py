@@ -0,0 +1,37 @@
+"""In-process entity cache backend."""
+
+from app.entity_cache import LocalBackend, cache_key
+
+
+def test_versions_are_bounded_by_max_entries():
+    backend = LocalBackend(max_entries=10)
+    backend.bump(f"entity-{i}" for i in range(1000))
+    assert len(backend._versions) == 10
+
+
+def test_stale_payload_is_not_served_after_its_version_is_dropped():
+    backend = LocalBackend(max_entries=2)
+    # A reader reads the version, a write commits, then the reader caches
+    # what it loaded before the write
+    version = backend.versions(["a"])["a"]
+    backend.bump(["a"])
+    backend.set_many({cache_key("a", version, ""): "stale"})
+    # Enough other writes push "a" out of the version map
+    backend.bump(["b", "c", "d"])
+
+    current = backend.versions(["a"])["a"]
+    assert current != version
+    assert backend.get_many([cache_key("a", current, "")]) == {}
+
+
+def test_fresh_payload_survives_other_ids_being_dropped():
+    backend = LocalBackend(max_entries=2)
+    backend.bump(["a"])
+    version = backend.versions(["a"])["a"]
+    backend.set_many({cache_key("a", version, ""): "fresh"})
+    backend.bump(["b"])
+    backend.versions(["a"])  # Recently read ids stay
+    backend.bump(["c"])
+
+    key = cache_key("a", backend.versions(["a"])["a"], "")
+    assert backend.get_many([key]) == {key: "fresh"}
@@ -0,0 +1,98 @@
+"""Set-based entity deletion and its cascades."""
+
+from sqlalchemy import text
+
+from app import entity_delete
+from app.database import get_db_session
+from app.models import Library, Paper, Report, Template
+
+
+def seed() -> None:
+    """Two libraries, two templates and reports over every combination, all ok."""
+    with get_db_session() as db:
+        papers = [Paper(id=f"paper-{i}", title=f"Paper {i}") for i in range(4)]
+        for paper in papers:
+            paper.refresh_content_hash()
+        db.add(Library(id="library-1", name="One", papers=papers[:2]))
+        db.add(Library(id="library-2", name="Two", papers=papers[2:]))
+        db.add_all(Template(id=f"template-{i}", name=f"T{i}", prompt="P") for i in (1, 2))
+        for lib in (1, 2):
+            for tmpl in (1, 2):
+                report = Report(
+                    id=f"report-{lib}{tmpl}", name=f"R{lib}{tmpl}", template_id=f"template-{tmpl}", status="ok"
+                )
+                report.library_ids = [f"library-{lib}"]
+                db.add(report)
+
+
+def rows(sql: str) -> list:
+    with get_db_session() as db:
+        return [tuple(row) for row in db.execute(text(sql))]
+
+
+def bulk_delete(client, ids) -> dict:
+    response = client.post("/api/entities/bulk-delete", json={"ids": ids})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_bulk_delete_cascades(client, monkeypatch):
+    monkeypatch.setattr(entity_delete, "DELETE_BATCH_SIZE", 1)  # Every cascade runs over several batches
+    seed()
+
+    result = bulk_delete(client, ["library-1", "template-1", "report-22", "report-22", "missing"])
+
+    assert result == {
+        "deleted": 3, "libraries": 1, "templates": 1, "reports": 1,
+        "not_found": ["missing"],
+        "stale_reports": 3,  # report-11, report-12 and report-21; report-22 was deleted
+    }
+    assert rows("SELECT id, status, template_id FROM reports ORDER BY id") == [
+        ("report-11", "stale", None),
+        ("report-12", "stale", "template-2"),
+        ("report-21", "stale", None),
+    ]
+    # Links to the deleted library stay, so the missing dependency is visible
+    assert rows("SELECT report_id, library_id FROM report_libraries ORDER BY report_id") == [
+        ("report-11", "library-1"), ("report-12", "library-1"), ("report-21", "library-2"),
+    ]
+    assert rows("SELECT library_id, paper_id FROM library_papers ORDER BY paper_id") == [
+        ("library-2", "paper-2"), ("library-2", "paper-3"),
+    ]
+    assert len(rows("SELECT id FROM papers")) == 4
+    assert {e["id"] for e in client.get("/api/entities").json()["items"]} == {
+        "library-2", "template-2", "report-11", "report-12", "report-21",
+    }
+
+
+def test_deleting_a_report_does_not_mark_it_stale(client):
+    seed()
+
+    result = bulk_delete(client, ["report-11", "library-1"])
+
+    assert (result["reports"], result["libraries"], result["stale_reports"]) == (1, 1, 1)
+    assert rows("SELECT report_id FROM report_libraries WHERE report_id = 'report-11'") == []
+
+
+def test_unknown_ids_are_not_found(client):
+    seed()
+
+    result = bulk_delete(client, ["nope", "paper-1"])  # Papers are not entities
+
+    assert result["deleted"] == 0 and result["not_found"] == ["nope", "paper-1"]
+    assert client.delete("/api/entities/nope").status_code == 404
+    assert client.delete("/api/entities/library-2").status_code == 200
+    assert client.get("/api/entities/library-2").status_code == 404
+
+
+def test_delete_query_count_does_not_grow_with_ids(client, query_counter):
+    seed()
+    with get_db_session() as db:
+        db.add_all(Library(id=f"extra-{i}", name=f"Extra {i}") for i in range(50))
+
+    def queries(ids) -> int:
+        before = query_counter.count
+        bulk_delete(client, ids)
+        return query_counter.count - before
+
+    assert queries(["extra-0", "extra-1"]) == queries([f"extra-{i}" for i in range(2, 50)])
@@ -0,0 +1,42 @@
+"""The trigger-maintained entities registry."""
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app.database import get_db_session
+from app.models import EntityRecord, Library, Template
+
+
+def registry_row(entity_id: str):
+    with get_db_session() as db:
+        return db.query(EntityRecord.type, EntityRecord.version).filter(EntityRecord.id == entity_id).first()
+
+
+def test_writes_keep_the_registry_in_sync(client):
+    library_id = client.post("/api/libraries", json={"name": "Library"}).json()["id"]
+    assert registry_row(library_id) == ("library", 1)
+
+    client.post("/api/papers", json={"id": "paper-1", "title": "Paper"})
+    client.post(f"/api/libraries/{library_id}/papers/paper-1")
+    assert registry_row(library_id).version == 2
+
+    # Editing a member paper changes the library payload; bookkeeping columns do not
+    client.post("/api/papers/bulk", json=[{"id": "paper-1", "title": "Paper, revised"}])
+    assert registry_row(library_id).version == 3
+    with get_db_session() as db:
+        db.execute(text("UPDATE papers SET search_rowid = search_rowid + 1000"))
+    assert registry_row(library_id).version == 3
+
+    client.delete(f"/api/entities/{library_id}")
+    assert registry_row(library_id) is None
+
+
+def test_id_collision_across_entity_tables_is_rejected(client):
+    with get_db_session() as db:
+        db.add(Library(id="shared-id", name="Library"))
+
+    with pytest.raises(IntegrityError):
+        with get_db_session() as db:
+            db.add(Template(id="shared-id", name="Template", prompt="Summarize."))
+    assert registry_row("shared-id").type == "library"
@@ -0,0 +1,95 @@
+"""Materialized-path folder tree: moves, subtree listings and counts."""
+
+from app.database import get_db_session
+from app.folder_tree import folder_path
+from app.models import Folder
+
+
+def make_tree(client) -> dict:
+    """a/b/c and a/d, a separate top-level e, and entities in c, d and e."""
+    ids = {}
+    for name, parent in (("a", None), ("b", "a"), ("c", "b"), ("d", "a"), ("e", None)):
+        ids[name] = client.post("/api/folders", json={"name": name, "parentId": ids.get(parent)}).json()["id"]
+    ids["lib-c"] = client.post("/api/libraries", json={"name": "In c", "folderId": ids["c"]}).json()["id"]
+    ids["lib-e"] = client.post("/api/libraries", json={"name": "In e", "folderId": ids["e"]}).json()["id"]
+    ids["tmpl-d"] = client.post(
+        "/api/templates", json={"name": "In d", "prompt": "P", "folderId": ids["d"]}
+    ).json()["id"]
+    return ids
+
+
+def paths(client, ids: dict) -> dict:
+    names = {folder_id: name for name, folder_id in ids.items()}
+    return {
+        names[f["id"]]: f["path"].strip("/").split("/")
+        for f in client.get("/api/folders").json() if f["id"] in names
+    }
+
+
+def listed(client, folder_id: str, recursive: bool) -> set:
+    params = {"folder_id": folder_id, "recursive": recursive}
+    return {e["id"] for e in client.get("/api/entities", params=params).json()["items"]}
+
+
+def counts(client, folder_id: str) -> tuple:
+    body = client.get(f"/api/folders/{folder_id}/counts").json()
+    return body["folders"], body["libraries"], body["templates"], body["entities"]
+
+
+def test_move_rewrites_subtree_paths(client):
+    ids = make_tree(client)
+
+    moved = client.post(f"/api/folders/{ids['b']}/move", json={"parentId": ids["e"]})
+
+    assert moved.status_code == 200
+    assert moved.json()["parentId"] == ids["e"]
+    expected = {
+        "a": ["a"], "d": ["a", "d"], "e": ["e"], "b": ["e", "b"], "c": ["e", "b", "c"],
+    }
+    assert paths(client, ids) == {name: [ids[n] for n in path] for name, path in expected.items()}
+    subtree = client.get(f"/api/folders/{ids['e']}/subtree").json()
+    assert [f["id"] for f in subtree] == [ids["e"], ids["b"], ids["c"]]
+
+    client.post(f"/api/folders/{ids['b']}/move", json={"parentId": None})
+    assert paths(client, ids)["c"] == [ids["b"], ids["c"]]
+
+
+def test_move_into_own_subtree_is_rejected(client):
+    ids = make_tree(client)
+    before = paths(client, ids)
+
+    for target in ("a", "b", "c"):
+        response = client.post(f"/api/folders/{ids['a']}/move", json={"parentId": ids[target]})
+        assert response.status_code == 400, target
+
+    assert paths(client, ids) == before
+    assert client.post(f"/api/folders/{ids['a']}/move", json={"parentId": "missing"}).status_code == 404
+
+
+def test_recursive_listing_and_counts_follow_moves(client):
+    ids = make_tree(client)
+
+    assert listed(client, ids["a"], recursive=False) == set()
+    assert listed(client, ids["a"], recursive=True) == {ids["lib-c"], ids["tmpl-d"]}
+    assert listed(client, ids["b"], recursive=True) == {ids["lib-c"]}
+    assert counts(client, ids["a"]) == (3, 1, 1, 2)
+    assert counts(client, ids["c"]) == (0, 1, 0, 1)
+
+    client.post(f"/api/folders/{ids['b']}/move", json={"parentId": ids["e"]})
+
+    assert listed(client, ids["a"], recursive=True) == {ids["tmpl-d"]}
+    assert listed(client, ids["e"], recursive=True) == {ids["lib-c"], ids["lib-e"]}
+    assert counts(client, ids["a"]) == (1, 0, 1, 1)
+    assert counts(client, ids["e"]) == (2, 2, 0, 2)
+
+
+def test_sibling_with_a_prefix_id_is_not_in_the_subtree(client):
+    ids = make_tree(client)
+
+    # A sibling whose id extends a's id must not fall inside a's path range
+    with get_db_session() as db:
+        db.add(Folder(id=ids["a"] + "x", name="ax", path=folder_path(None, ids["a"] + "x")))
+
+    subtree = [f["id"] for f in client.get(f"/api/folders/{ids['a']}/subtree").json()]
+    assert subtree[0] == ids["a"] and sorted(subtree) == sorted(ids[n] for n in "abcd")
+    assert counts(client, ids["a"])[0] == 3
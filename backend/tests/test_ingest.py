@@ -0,0 +1,61 @@
+"""Bulk paper ingestion."""
+
+from sqlalchemy import text
+
+from app.database import get_db_session
+
+
+def ingest(client, papers, library_id=None) -> dict:
+    params = {"library_id": library_id} if library_id else {}
+    response = client.post("/api/papers/bulk", params=params, json=papers)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["received"] == result["upserted"] + result["failed"]
+    return result
+
+
+def counters() -> dict:
+    with get_db_session() as db:
+        return dict(db.execute(text("SELECT table_name, version FROM table_versions")).all())
+
+
+def test_reingesting_unchanged_papers_writes_nothing(client):
+    library_id = client.post("/api/libraries", json={"name": "Library"}).json()["id"]
+    papers = [{"id": f"paper-{i}", "title": f"Paper {i}", "authors": "Ada Lovelace"} for i in range(5)]
+    ingest(client, papers, library_id)
+    before = counters()
+    etag = client.get("/api/entities").headers["etag"]
+
+    result = ingest(client, papers, library_id)
+
+    assert result["upserted"] == 5 and result["attached"] == 0
+    assert counters() == before
+    assert client.get("/api/entities", headers={"If-None-Match": etag}).status_code == 304
+
+    papers[0]["title"] = "Paper 0, revised"
+    ingest(client, papers, library_id)
+    after = counters()
+    assert after["papers"] > before["papers"]
+    assert after["paper_authors"] == before["paper_authors"] + 2  # delete and re-insert of one paper's links
+
+
+def test_duplicate_ids_in_a_chunk_are_reported(client):
+    result = ingest(client, [
+        {"id": "paper-1", "title": "First"},
+        {"id": "paper-2", "title": "Other"},
+        {"id": "paper-1", "title": "Second"},
+    ])
+
+    assert (result["received"], result["upserted"], result["failed"]) == (3, 2, 1)
+    assert [(e["index"], e["id"]) for e in result["errors"]] == [(0, "paper-1")]
+    with get_db_session() as db:
+        assert db.execute(text("SELECT title FROM papers WHERE id = 'paper-1'")).scalar() == "Second"
+
+
+def test_attached_counts_only_new_members(client):
+    library_id = client.post("/api/libraries", json={"name": "Library"}).json()["id"]
+    ingest(client, [{"id": "paper-1", "title": "One"}], library_id)
+
+    result = ingest(client, [{"id": "paper-1", "title": "One"}, {"id": "paper-2", "title": "Two"}], library_id)
+
+    assert result["attached"] == 1
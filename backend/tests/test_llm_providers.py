@@ -0,0 +1,135 @@
+"""LLM providers against the stub server, with its rate limit switched on."""
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import llm_providers, llm_stub
+from app.llm_providers import (
+    AnthropicProvider, LLMError, OpenAIProvider, StubProvider, TokenBucket, backoff_delay,
+)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """A TestClient over the stub app, and a fresh client-side rate limiter per test."""
+    monkeypatch.setattr(llm_providers, "_buckets", {})
+    monkeypatch.setenv("LLM_REQUESTS_PER_MINUTE", "600000")  # Let the stub do the limiting
+    client = TestClient(llm_stub.app, base_url="http://stub")
+    paths = []
+    client.event_hooks["request"].append(lambda request: paths.append(request.url.path))
+    client.paths = paths
+    yield client
+    client.close()
+
+
+def stub_rate_limit(monkeypatch, requests_per_second: float) -> None:
+    """What STUB_REQUESTS_PER_SECOND sets up when the stub is started."""
+    monkeypatch.setattr(llm_stub, "STUB_REQUESTS_PER_SECOND", requests_per_second)
+    monkeypatch.setattr(llm_stub, "_limiter", TokenBucket(requests_per_second))
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Record the arguments and result of every backoff the providers take."""
+    calls = []
+
+    def recording_backoff(attempt, retry_after=None, **kwargs):
+        delay = backoff_delay(attempt, retry_after=retry_after, **kwargs)
+        calls.append((attempt, retry_after, delay))
+        return delay
+
+    monkeypatch.setattr(llm_providers, "backoff_delay", recording_backoff)
+    return calls
+
+
+@pytest.mark.parametrize("provider_class, path", [
+    (OpenAIProvider, "/v1/chat/completions"),
+    (AnthropicProvider, "/v1/messages"),
+])
+def test_providers_speak_the_stub_apis(stub, provider_class, path):
+    provider = provider_class(client=stub)
+
+    assert provider.complete("gpt-4", "Hello there") == llm_stub.stub_completion("gpt-4", "Hello there")
+    assert stub.paths == [path]
+
+
+def test_rate_limited_requests_are_retried_after_retry_after(stub, monkeypatch, delays):
+    stub_rate_limit(monkeypatch, 10)
+    drains = []
+    real_drain = TokenBucket.drain
+    monkeypatch.setattr(TokenBucket, "drain", lambda bucket: (drains.append(bucket), real_drain(bucket)))
+    provider = StubProvider(client=stub, max_retries=20)
+
+    completions = [provider.complete("gpt-4", f"Prompt {i}") for i in range(13)]
+
+    assert completions == [llm_stub.stub_completion("gpt-4", f"Prompt {i}") for i in range(13)]
+    # The stub allows a burst of 10; the rest are throttled, retried and succeed
+    assert len(stub.paths) > 13 and delays
+    assert len(drains) == len(delays) and set(drains) == {llm_providers.model_bucket("gpt-4")}
+    for attempt, retry_after, delay in delays:
+        assert retry_after == pytest.approx(0.1)
+        assert delay >= retry_after
+
+
+def test_exhausted_retries_raise(stub, monkeypatch, delays):
+    stub_rate_limit(monkeypatch, 0.01)  # One request, then a 100 s Retry-After
+    monkeypatch.setattr(llm_providers.time, "sleep", lambda seconds: None)
+    provider = StubProvider(client=stub, max_retries=3)
+    provider.complete("gpt-4", "First")
+
+    with pytest.raises(LLMError, match="after 4 attempts: HTTP 429"):
+        provider.complete("gpt-4", "Second")
+
+    assert len(stub.paths) == 1 + 4
+    assert [attempt for attempt, _, _ in delays] == [0, 1, 2]  # No backoff after the last attempt
+    assert all(delay == retry_after == pytest.approx(100) for _, retry_after, delay in delays)
+
+
+def test_non_retryable_errors_fail_at_once(stub, delays):
+    provider = StubProvider(client=stub)
+
+    with pytest.raises(LLMError, match="HTTP 400"):
+        provider._post("gpt-4", "/v1/chat/completions", {
+            "model": "gpt-4", "messages": [{"role": "system", "content": "No user message"}],
+        })
+
+    assert len(stub.paths) == 1 and delays == []
+
+
+def test_backoff_is_jittered_and_capped():
+    rng_state = random.getstate()
+    try:
+        random.seed(0)
+        samples = [backoff_delay(3) for _ in range(200)]
+        assert all(0 <= delay <= 0.5 * 2 ** 3 for delay in samples)
+        assert len(set(samples)) == len(samples)  # Full jitter, no two retries in lockstep
+        assert all(backoff_delay(20) <= 30.0 for _ in range(50))
+        assert all(backoff_delay(0, retry_after=2.0) == 2.0 for _ in range(50))
+    finally:
+        random.setstate(rng_state)
+
+
+def test_stub_batches_prompts(stub, monkeypatch):
+    monkeypatch.setattr(llm_providers, "LLM_BATCH_SIZE", 4)
+    provider = StubProvider(client=stub)
+    prompts = [f"Paper {i}" for i in range(10)]
+
+    completions = provider.complete_batch("gpt-4", prompts)
+
+    assert completions == [llm_stub.stub_completion("gpt-4", prompt) for prompt in prompts]
+    assert stub.paths == ["/v1/batch"] * 3
+
+
+def test_batches_are_charged_per_prompt(stub, monkeypatch, delays):
+    stub_rate_limit(monkeypatch, 5)
+    monkeypatch.setattr(llm_providers, "LLM_BATCH_SIZE", 4)
+    provider = StubProvider(client=stub, max_retries=20)
+    prompts = [f"Paper {i}" for i in range(8)]
+
+    assert provider.complete_batch("gpt-4", prompts) == [llm_stub.stub_completion("gpt-4", p) for p in prompts]
+
+    # Two batches of four against a burst of five: one of them is throttled
+    assert stub.paths.count("/v1/batch") > 2
+    assert all(retry_after == pytest.approx(4 / 5) for _, retry_after, _ in delays)
@@ -0,0 +1,134 @@
+"""Buffered log writes and log retention."""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+
+from app import main
+from app.database import get_db_session
+from app.log_sink import LogSink, roll_up_logs
+from app.main import app
+from app.models import Log, LogRollup
+
+
+@pytest.fixture
+def make_client(db_engines, monkeypatch):
+    """Start the app with a log sink built from the given settings."""
+    clients = []
+
+    def start(**settings):
+        sink = LogSink(**{"flush_size": 1000, "flush_seconds": 60.0, "max_buffer": 10000, **settings})
+        monkeypatch.setattr(main, "log_sink", sink)
+        client = TestClient(app)
+        client.__enter__()
+        clients.append(client)
+        return client, sink
+
+    yield start
+    for client in clients:
+        client.__exit__(None, None, None)
+
+
+def stored() -> int:
+    with get_db_session() as db:
+        return db.query(func.count(Log.id)).scalar()
+
+
+def post_logs(client, count: int, **fields) -> None:
+    response = client.post("/api/logs/bulk", json=[{"message": f"Entry {i}", **fields} for i in range(count)])
+    assert response.json() == {"accepted": count}
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_flush_when_batch_size_is_reached(make_client):
+    client, sink = make_client(flush_size=5)
+
+    post_logs(client, 4)
+    time.sleep(0.1)
+    assert (sink.pending, stored()) == (4, 0)
+
+    client.post("/api/logs", params={"message": "Fifth"})
+
+    wait_until(lambda: stored() == 5)
+    assert (sink.pending, sink.flushes) == (0, 1)
+
+
+def test_flush_after_interval(make_client):
+    client, sink = make_client(flush_seconds=0.3)
+
+    post_logs(client, 3)
+    assert stored() == 0
+
+    wait_until(lambda: stored() == 3)
+    assert sink.flushes == 1
+
+
+def test_full_buffer_flushes_inline(make_client):
+    client, sink = make_client(max_buffer=10)
+
+    post_logs(client, 9)
+    assert stored() == 0
+    post_logs(client, 1)
+
+    # Written before the request returned
+    assert (stored(), sink.pending, sink.flushes) == (10, 0, 1)
+
+
+def test_buffer_is_flushed_on_shutdown(db_engines, monkeypatch):
+    sink = LogSink(flush_seconds=60.0)
+    monkeypatch.setattr(main, "log_sink", sink)
+    with TestClient(app) as client:
+        post_logs(client, 3)
+        assert stored() == 0
+
+    assert stored() == 3 and sink.pending == 0
+
+
+def test_listing_includes_buffered_entries(make_client):
+    client, _ = make_client()
+    post_logs(client, 2)
+
+    assert len(client.get("/api/logs").json()) == 2
+
+
+def test_old_entries_are_rolled_up(client):
+    now = datetime.utcnow()
+    old = (now - timedelta(days=40)).replace(hour=6)
+    with get_db_session() as db:
+        db.add_all(
+            Log(id=f"log-{i}", message="m", level=level, entityId=entity, created_date=created)
+            for i, (level, entity, created) in enumerate([
+                ("info", "report-1", old),
+                ("info", "report-1", old + timedelta(hours=1)),
+                ("error", "report-1", old),
+                ("info", None, old - timedelta(days=1)),
+                ("info", "report-1", now),
+            ])
+        )
+
+    with get_db_session() as db:
+        assert roll_up_logs(db, now - timedelta(days=30)) == 4
+    with get_db_session() as db:
+        db.add(Log(id="log-late", message="m", level="info", entityId="report-1", created_date=old))
+    with get_db_session() as db:
+        assert roll_up_logs(db, now - timedelta(days=30)) == 1
+        assert roll_up_logs(db, now - timedelta(days=30)) == 0
+
+        assert [row.id for row in db.query(Log)] == ["log-4"]
+        rollups = {(r.day, r.level, r.entityId): r.count for r in db.query(LogRollup)}
+    assert rollups == {
+        (old.date().isoformat(), "info", "report-1"): 3,  # Later entries add to the day's count
+        (old.date().isoformat(), "error", "report-1"): 1,
+        ((old - timedelta(days=1)).date().isoformat(), "info", None): 1,
+    }
+    listed = client.get("/api/logs/rollups", params={"entity_id": "report-1"}).json()
+    assert sorted((r["level"], r["count"]) for r in listed) == [("error", 1), ("info", 3)]
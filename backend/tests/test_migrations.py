@@ -0,0 +1,92 @@
+"""Startup migrations of a database created by an old release."""
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.main import app
+
+# The tables migrations read, as the first release created them
+LEGACY_SCHEMA = [
+    """CREATE TABLE papers (
+        id VARCHAR NOT NULL, title VARCHAR NOT NULL, abstract TEXT, authors VARCHAR,
+        publish_date DATETIME, text_markdown TEXT, created_date DATETIME NOT NULL, PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE libraries (
+        id VARCHAR NOT NULL, name VARCHAR NOT NULL, description TEXT,
+        created_date DATETIME NOT NULL, PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE library_papers (
+        library_id VARCHAR NOT NULL REFERENCES libraries (id), paper_id VARCHAR NOT NULL REFERENCES papers (id),
+        PRIMARY KEY (library_id, paper_id)
+    )""",
+    """CREATE TABLE templates (
+        id VARCHAR NOT NULL, name VARCHAR NOT NULL, prompt TEXT NOT NULL, description TEXT,
+        created_date DATETIME NOT NULL, PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE reports (
+        id VARCHAR NOT NULL, name VARCHAR NOT NULL, template_id VARCHAR REFERENCES templates (id),
+        library_ids VARCHAR, user_prompt TEXT, content_markdown TEXT, status VARCHAR NOT NULL,
+        created_date DATETIME NOT NULL, PRIMARY KEY (id)
+    )""",
+]
+
+
+def legacy_database(engine) -> None:
+    now = "2024-01-01 00:00:00"
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO papers (id, title, authors, created_date) VALUES (:id, :title, :authors, :now)"), [
+            {"id": "paper-1", "title": "One", "authors": "Ada Lovelace, Alan Turing", "now": now},
+            {"id": "paper-2", "title": "Two", "authors": "alan  turing,Grace Hopper, Alan Turing", "now": now},
+            {"id": "paper-3", "title": "Three", "authors": None, "now": now},
+        ])
+        conn.execute(text("INSERT INTO libraries (id, name, created_date) VALUES (:id, :id, :now)"), [
+            {"id": "library-a", "now": now}, {"id": "library-b", "now": now},
+        ])
+        conn.execute(text("INSERT INTO library_papers VALUES ('library-a', 'paper-1'), ('library-b', 'paper-2')"))
+        conn.execute(
+            text("INSERT INTO reports (id, name, library_ids, status, created_date) VALUES (:id, :id, :ids, 'ok', :now)"),
+            [
+                {"id": "report-1", "ids": "library-b,library-a", "now": now},
+                {"id": "report-2", "ids": "library-a,,library-a", "now": now},
+                {"id": "report-3", "ids": "", "now": now},
+                {"id": "report-4", "ids": None, "now": now},
+            ]
+        )
+
+
+def rows(engine, sql: str) -> list:
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(text(sql))]
+
+
+def test_startup_normalizes_a_legacy_database(db_engines):
+    legacy_database(db_engines)
+
+    for _ in range(2):  # Migrations are idempotent
+        with TestClient(app):
+            pass
+
+    assert rows(db_engines, "SELECT report_id, library_id, position FROM report_libraries ORDER BY report_id, position") == [
+        ("report-1", "library-b", 0),
+        ("report-1", "library-a", 1),
+        ("report-2", "library-a", 0),
+    ]
+    assert rows(db_engines, "SELECT id FROM reports WHERE library_ids IS NOT NULL") == []
+    assert rows(db_engines, "SELECT paper_id, author_key, position FROM paper_authors ORDER BY paper_id, position") == [
+        ("paper-1", "ada lovelace", 0),
+        ("paper-1", "alan turing", 1),
+        ("paper-2", "alan turing", 0),
+        ("paper-2", "grace hopper", 1),
+    ]
+    assert rows(db_engines, "SELECT key, name FROM authors ORDER BY key") == [
+        ("ada lovelace", "Ada Lovelace"), ("alan turing", "Alan Turing"), ("grace hopper", "Grace Hopper"),
+    ]
+
+    with TestClient(app) as client:
+        assert client.get("/api/reports/report-1").json()["library_ids"] == ["library-b", "library-a"]
+        papers = client.get("/api/papers", params={"author": "Alan Turing"}).json()["items"]
+        assert sorted(p["id"] for p in papers) == ["paper-1", "paper-2"]
+        # Display strings are kept as they were
+        assert {p["id"]: p["authors"] for p in papers}["paper-2"] == "alan  turing,Grace Hopper, Alan Turing"
@@ -0,0 +1,74 @@
+"""Keyset pagination of the listing endpoints."""
+
+from datetime import datetime
+
+import pytest
+
+from app.database import get_db_session
+from app.models import Library, Paper, Template
+from app.pagination import encode_cursor
+
+CREATED = datetime(2024, 1, 1)
+
+
+def seed(papers: int = 10) -> None:
+    """Papers, libraries and templates that all share one created_date."""
+    with get_db_session() as db:
+        rows = [Paper(id=f"paper-{i:02d}", title=f"Paper {i}", created_date=CREATED) for i in range(papers)]
+        for paper in rows:
+            paper.refresh_content_hash()
+        db.add_all(rows)
+        db.add(Library(id="library-even", name="Even", created_date=CREATED, papers=rows[::2]))
+        db.add_all(Template(id=f"template-{i}", name=f"T{i}", prompt="P", created_date=CREATED) for i in range(4))
+
+
+def walk(client, url: str, limit: int, **params) -> list:
+    """Every page of a listing, as one list of page id lists."""
+    pages, cursor = [], None
+    while True:
+        body = client.get(url, params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})}).json()
+        pages.append([item["id"] for item in body["items"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trips_across_equal_created_dates(client):
+    seed()
+
+    pages = walk(client, "/api/papers", 3)
+
+    assert pages == [
+        ["paper-00", "paper-01", "paper-02"],
+        ["paper-03", "paper-04", "paper-05"],
+        ["paper-06", "paper-07", "paper-08"],
+        ["paper-09"],
+    ]
+
+
+def test_filters_apply_before_the_limit(client):
+    seed()
+
+    assert walk(client, "/api/papers", 2, library_id="library-even") == [
+        ["paper-00", "paper-02"], ["paper-04", "paper-06"], ["paper-08"],
+    ]
+    assert walk(client, "/api/entities", 3, type="template") == [
+        ["template-0", "template-1", "template-2"], ["template-3"],
+    ]
+
+
+def test_cursor_resumes_after_its_row(client):
+    seed()
+
+    body = client.get("/api/papers", params={"limit": 2, "cursor": encode_cursor(CREATED, "paper-04")}).json()
+
+    assert [item["id"] for item in body["items"]] == ["paper-05", "paper-06"]
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "bm90IGEgY3Vyc29y", encode_cursor(CREATED, "x")[:-6] + "!!"])
+@pytest.mark.parametrize("url", ["/api/papers", "/api/libraries", "/api/entities", "/api/entity-versions"])
+def test_malformed_cursor_is_a_400(client, url, cursor):
+    response = client.get(url, params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
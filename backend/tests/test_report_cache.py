@@ -0,0 +1,112 @@
+"""Report output cache: key composition, LRU eviction and bypass."""
+
+import time
+
+from app import context_packer
+from app.database import get_db_session
+from app.models import ReportCacheEntry
+from app.report_cache import ReportCache, report_cache_key
+from app.report_jobs import pipeline_signature
+
+
+def wait_for_ok(client, report_id: str, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while client.get(f"/api/reports/{report_id}/status").json()["status"] != "ok":
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_cache_key_covers_every_input(monkeypatch):
+    papers = [("paper-1", "hash-1"), ("paper-2", "hash-2")]
+    key = report_cache_key("pipeline", "Template", "Request", papers)
+
+    # Paper order and duplicates do not matter
+    assert report_cache_key("pipeline", "Template", "Request", papers[::-1] + papers[:1]) == key
+    for changed in (
+        report_cache_key("other pipeline", "Template", "Request", papers),
+        report_cache_key("pipeline", "Other template", "Request", papers),
+        report_cache_key("pipeline", "Template", None, papers),
+        report_cache_key("pipeline", "Template", "Request", papers[:1]),
+        report_cache_key("pipeline", "Template", "Request", [("paper-1", "hash-1"), ("paper-2", "edited")]),
+    ):
+        assert changed != key
+
+    signature = pipeline_signature()
+    budget = context_packer.CONTEXT_TOKEN_BUDGET
+    monkeypatch.setattr(context_packer, "CONTEXT_TOKEN_BUDGET", budget + 1)
+    assert pipeline_signature() != signature
+    monkeypatch.setattr(context_packer, "CONTEXT_TOKEN_BUDGET", budget)
+    monkeypatch.setattr(context_packer, "CONTEXT_STRATEGY", "other")
+    assert pipeline_signature() != signature
+    assert pipeline_signature("map_reduce") != pipeline_signature()
+
+
+def test_same_inputs_are_served_from_cache(client, monkeypatch):
+    library_id = client.post("/api/libraries", json={"name": "Library"}).json()["id"]
+    client.post(f"/api/papers/bulk?library_id={library_id}", json=[{"id": "paper-1", "title": "One"}])
+    template_id = client.post("/api/templates", json={"name": "T", "prompt": "Summarize."}).json()["id"]
+
+    def create(**overrides) -> dict:
+        body = {"name": "Report", "template_id": template_id, "library_ids": [library_id], **overrides}
+        return client.post("/api/reports", json=body).json()
+
+    first = create()
+    assert first["status"] == "pending"
+    wait_for_ok(client, first["id"])
+
+    hit = create()
+    assert hit["status"] == "ok"
+    assert hit["data"]["content_markdown"] == client.get(f"/api/reports/{first['id']}").json()["content_markdown"]
+
+    # Anything the output depends on is a miss
+    assert create(user_prompt="Focus on methods")["status"] == "pending"
+    assert create(bypass_cache=True)["status"] == "pending"
+    budget = context_packer.CONTEXT_TOKEN_BUDGET
+    monkeypatch.setattr(context_packer, "CONTEXT_TOKEN_BUDGET", budget // 2)
+    assert create()["status"] == "pending"
+    monkeypatch.setattr(context_packer, "CONTEXT_TOKEN_BUDGET", budget)
+    client.post("/api/papers/bulk", json=[{"id": "paper-1", "title": "One, revised"}])
+    assert create()["status"] == "pending"
+
+
+def test_bypass_regenerates_and_refreshes_the_entry(client):
+    first = client.post("/api/reports", json={"name": "Report", "user_prompt": "Overview"}).json()
+    wait_for_ok(client, first["id"])
+    with get_db_session() as db:
+        db.query(ReportCacheEntry).update({"content_markdown": "# Old output"})
+
+    assert client.post("/api/reports", json={"name": "Hit", "user_prompt": "Overview"}).json()["data"][
+        "content_markdown"
+    ] == "# Old output"
+    bypassed = client.post("/api/reports", json={"name": "Bypass", "user_prompt": "Overview", "bypass_cache": True})
+    wait_for_ok(client, bypassed.json()["id"])
+
+    fresh = client.get(f"/api/reports/{bypassed.json()['id']}").json()["content_markdown"]
+    assert fresh != "# Old output"
+    with get_db_session() as db:
+        assert [row.content_markdown for row in db.query(ReportCacheEntry)] == [fresh]
+
+
+def test_least_recently_used_entries_are_evicted(client):
+    cache = ReportCache(max_entries=3, max_bytes=1000)
+    with get_db_session() as db:
+        for key in ("a", "b", "c"):
+            cache.put(db, key, f"report {key}")
+        assert cache.get(db, "a") == "report a"
+
+        cache.put(db, "d", "report d")
+
+        assert {row.key for row in db.query(ReportCacheEntry.key)} == {"a", "c", "d"}
+        assert cache.get(db, "b") is None
+        assert (cache.hits, cache.misses, cache.stores, cache.evictions) == (1, 1, 4, 1)
+
+
+def test_size_bound_evicts_and_skips_oversized_entries(client):
+    cache = ReportCache(max_entries=100, max_bytes=20)
+    with get_db_session() as db:
+        for key in ("a", "b", "c"):
+            cache.put(db, key, "x" * 8)
+        cache.put(db, "huge", "x" * 21)
+
+        assert {row.key for row in db.query(ReportCacheEntry.key)} == {"b", "c"}
+        assert cache.stats(db).total_bytes == 16
@@ -0,0 +1,92 @@
+"""Report generation jobs: status transitions, cancellation and leases."""
+
+import time
+from datetime import datetime, timedelta
+
+from app.database import get_db_session
+from app.models import Report, ReportLease
+from app.report_jobs import REPORT_LEASE_SECONDS, WORKER_ID, report_queue
+
+
+def create_report(client, user_prompt: str = "Overview") -> str:
+    response = client.post("/api/reports", json={"name": "Report", "user_prompt": user_prompt})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def status_of(client, report_id: str) -> dict:
+    return client.get(f"/api/reports/{report_id}/status").json()
+
+
+def wait_for_status(client, report_id: str, statuses=("ok", "error", "cancelled"), timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while (status := status_of(client, report_id))["status"] not in statuses:
+        assert time.monotonic() < deadline, status
+        time.sleep(0.02)
+    return status
+
+
+def lease_owner(report_id: str):
+    with get_db_session() as db:
+        return db.query(ReportLease.worker_id).filter(ReportLease.report_id == report_id).scalar()
+
+
+def test_report_runs_under_a_lease_and_finishes_ok(client, gated_generator):
+    report_id = create_report(client)
+    assert gated_generator.reached.wait(10)
+    assert status_of(client, report_id)["status"] == "running"
+    assert lease_owner(report_id) == WORKER_ID
+
+    gated_generator.released.set()
+    assert wait_for_status(client, report_id)["status"] == "ok"
+    assert client.get(f"/api/reports/{report_id}").json()["content_markdown"].startswith("# Report")
+    assert lease_owner(report_id) is None
+
+
+def test_failed_generation_is_recorded(client, gated_generator):
+    gated_generator.error = "model unavailable"
+    report_id = create_report(client)
+    gated_generator.released.set()
+
+    status = wait_for_status(client, report_id)
+    assert (status["status"], status["error_message"]) == ("error", "model unavailable")
+    assert lease_owner(report_id) is None
+
+
+def test_cancelled_report_keeps_its_status(client, gated_generator):
+    report_id = create_report(client)
+    assert gated_generator.reached.wait(10)
+
+    response = client.post(f"/api/reports/{report_id}/cancel")
+    assert response.status_code == 200 and response.json()["status"] == "cancelled"
+    gated_generator.released.set()
+
+    time.sleep(0.2)
+    assert status_of(client, report_id)["status"] == "cancelled"
+    assert client.get(f"/api/reports/{report_id}").json()["content_markdown"] is None
+
+
+def test_cancelling_a_finished_report_conflicts(client):
+    report_id = create_report(client)
+    wait_for_status(client, report_id)
+
+    assert client.post(f"/api/reports/{report_id}/cancel").status_code == 409
+
+
+def test_resume_leaves_reports_with_live_leases_alone(client):
+    now = datetime.utcnow()
+    lapsed = now - timedelta(seconds=REPORT_LEASE_SECONDS + 1)
+    with get_db_session() as db:
+        for report_id in ("live", "lapsed", "unleased"):
+            db.add(Report(id=report_id, name=report_id, status="running", user_prompt=report_id))
+        db.add_all([
+            ReportLease(report_id="live", worker_id="other-host:1:live", heartbeat_at=now),
+            ReportLease(report_id="lapsed", worker_id="other-host:2:dead", heartbeat_at=lapsed),
+        ])
+
+    report_queue.resume()
+
+    assert wait_for_status(client, "lapsed")["status"] == "ok"
+    assert wait_for_status(client, "unleased")["status"] == "ok"
+    assert status_of(client, "live")["status"] == "running"
+    assert lease_owner("live") == "other-host:1:live"
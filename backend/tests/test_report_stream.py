@@ -0,0 +1,160 @@
+"""Server-sent event streams of report generation."""
+
+import asyncio
+import json
+import queue
+import threading
+
+import anyio
+
+from app.report_jobs import ReportProgress
+
+# Seconds to wait for the next event before failing
+EVENT_TIMEOUT = 10
+
+
+def create_report(client, user_prompt: str = "Overview") -> str:
+    library_id = client.post("/api/libraries", json={"name": "Library"}).json()["id"]
+    client.post(f"/api/papers/bulk?library_id={library_id}", json=[
+        {"id": f"paper-{i}", "title": f"Paper {i}"} for i in range(3)
+    ])
+    response = client.post("/api/reports", json={
+        "name": "Report", "library_ids": [library_id], "user_prompt": user_prompt
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def open_stream(client, path: str):
+    """Yield ``(event, data)`` pairs from an SSE endpoint as they are sent.
+
+    TestClient buffers whole responses, so the app is called directly on the
+    client's event loop and each body message is handed over as it arrives.
+    """
+    messages = queue.Queue()
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"testserver")], "server": ("testserver", 80), "client": ("testclient", 50000),
+    }
+    requested = False
+
+    async def receive() -> dict:
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await anyio.sleep_forever()
+
+    async def send(message: dict) -> None:
+        messages.put(message)
+
+    client.portal.start_task_soon(client.app, scope, receive, send)
+    start = messages.get(timeout=EVENT_TIMEOUT)
+    assert start["status"] == 200, start
+    buffer = ""
+    while True:
+        message = messages.get(timeout=EVENT_TIMEOUT)
+        buffer += message.get("body", b"").decode()
+        *blocks, buffer = buffer.split("\n\n")
+        for block in blocks:
+            fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+            if "event" in fields:
+                yield fields["event"], json.loads(fields["data"])
+        if not message.get("more_body", False):
+            return
+
+
+def test_late_subscriber_gets_earlier_chunks_then_the_rest(client, gated_generator):
+    report_id = create_report(client)
+    assert gated_generator.reached.wait(10)
+
+    stream = open_stream(client, f"/api/reports/{report_id}/stream")
+    event, data = next(stream)
+    assert event == "chunk" and data["content"].startswith("# Report")
+    first = data["content"]
+
+    gated_generator.released.set()
+    received = list(stream)
+
+    assert received[-1] == ("done", {"status": "ok", "error_message": None})
+    assert {event for event, _ in received[:-1]} == {"chunk"}
+    chunks = [data["content"] for event, data in received[:-1]]
+    report = client.get(f"/api/reports/{report_id}").json()
+    assert report["content_markdown"] == first + "".join(chunks)
+
+
+def test_failed_generation_ends_with_an_error_event(client, gated_generator):
+    gated_generator.error = "model unavailable"
+    report_id = create_report(client)
+    assert gated_generator.reached.wait(10)
+
+    stream = open_stream(client, f"/api/reports/{report_id}/stream")
+    assert next(stream)[0] == "chunk"
+    gated_generator.released.set()
+    received = list(stream)
+
+    assert received == [("done", {"status": "error", "error_message": "model unavailable"})]
+
+
+def test_cancelling_mid_stream_ends_the_stream(client, gated_generator):
+    report_id = create_report(client)
+    assert gated_generator.reached.wait(10)
+
+    stream = open_stream(client, f"/api/reports/{report_id}/stream")
+    assert next(stream)[0] == "chunk"
+    assert client.post(f"/api/reports/{report_id}/cancel").json()["status"] == "cancelled"
+    gated_generator.released.set()
+    received = list(stream)
+
+    assert received == [("done", {"status": "cancelled", "error_message": None})]
+    assert client.get(f"/api/reports/{report_id}").json()["status"] == "cancelled"
+
+
+def test_followers_hold_no_threadpool_threads(client, gated_generator):
+    async def limit_threads(tokens: int) -> None:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = tokens
+
+    report_id = create_report(client)
+    assert gated_generator.reached.wait(10)
+    client.portal.call(limit_threads, 2)
+
+    streams = [open_stream(client, f"/api/reports/{report_id}/stream") for _ in range(5)]
+    for stream in streams:
+        assert next(stream)[0] == "chunk"
+    # Cancelling runs on the threadpool, which the followers must leave free
+    assert client.post(f"/api/reports/{report_id}/cancel").status_code == 200
+    gated_generator.released.set()
+
+    for stream in streams:
+        assert list(stream)[-1] == ("done", {"status": "cancelled", "error_message": None})
+
+
+def test_finished_report_is_sent_as_one_chunk(client):
+    report_id = create_report(client)
+    received = list(open_stream(client, f"/api/reports/{report_id}/stream"))
+    # The stream may have joined while generation was still running
+    assert received[-1] == ("done", {"status": "ok", "error_message": None})
+    content = "".join(data["content"] for event, data in received[:-1])
+    assert content == client.get(f"/api/reports/{report_id}").json()["content_markdown"]
+
+
+def test_followers_wait_without_a_thread():
+    progress = ReportProgress()
+
+    async def follow(poll_seconds: float) -> list:
+        return [chunk async for chunk in progress.follow(poll_seconds)]
+
+    async def main() -> list:
+        followers = [asyncio.ensure_future(follow(0.05)) for _ in range(100)]
+        await asyncio.sleep(0.12)
+        worker = threading.Thread(target=lambda: (progress.publish("a"), progress.publish("b"), progress.finish("ok")))
+        worker.start()
+        results = await asyncio.gather(*followers)
+        worker.join()
+        return results
+
+    for chunks in asyncio.run(main()):
+        # Keep-alives while idle, then every chunk exactly once
+        assert None in chunks
+        assert [chunk for chunk in chunks if chunk is not None] == ["a", "b"]
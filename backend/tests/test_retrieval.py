@@ -0,0 +1,104 @@
+"""Chunk indexing and retrieval under concurrent report jobs."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sqlalchemy import func
+
+from app import retrieval
+from app.database import get_db_session
+from app.models import FreeChunkRow, Paper, PaperChunk
+from app.retrieval import VectorStore
+
+PAPER_TEXT = "\n\n".join(f"## Section {i}\n\n" + "Chunked body text about retrieval. " * 60 for i in range(6))
+
+
+def seed_library(client, name: str, papers: int) -> str:
+    library_id = client.post("/api/libraries", json={"name": name}).json()["id"]
+    response = client.post(f"/api/papers/bulk?library_id={library_id}", json=[
+        {"id": f"{name}-p{i}", "title": f"{name} paper {i}", "abstract": "An abstract.", "text_markdown": PAPER_TEXT}
+        for i in range(papers)
+    ])
+    assert response.status_code == 200, response.text
+    return library_id
+
+
+def wait_for_reports(client, report_ids, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        reports = {rid: client.get(f"/api/reports/{rid}").json() for rid in report_ids}
+        if all(r["status"] not in ("pending", "running") for r in reports.values()):
+            return reports
+        assert time.monotonic() < deadline, {rid: r["status"] for rid, r in reports.items()}
+        time.sleep(0.05)
+
+
+def test_concurrent_jobs_over_different_libraries_both_index_and_finish(client):
+    libraries = [seed_library(client, name, papers=40) for name in ("alpha", "beta")]
+
+    def create_report(library_id: str) -> str:
+        response = client.post("/api/reports", json={"name": f"report {library_id}", "library_ids": [library_id]})
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        report_ids = list(pool.map(create_report, libraries))
+    reports = wait_for_reports(client, report_ids)
+    elapsed = time.monotonic() - started
+
+    for report in reports.values():
+        assert report["status"] == "ok", report["error_message"]
+    with get_db_session() as db:
+        indexed = db.query(func.count(func.distinct(PaperChunk.paper_id))).scalar()
+        rows = db.query(func.count(PaperChunk.row), func.count(func.distinct(PaperChunk.row))).one()
+    assert indexed == 80
+    # Each chunk owns its own matrix row
+    assert rows[0] == rows[1]
+    # Neither job may sit out SQLite's busy timeout waiting on the other
+    assert elapsed < 4.0
+
+
+def test_rows_are_allocated_after_a_single_chunk_index(client):
+    # The first paper takes only row 0, which must still count as used
+    for name in ("first", "second"):
+        library_id = client.post("/api/libraries", json={"name": name}).json()["id"]
+        client.post(f"/api/papers/bulk?library_id={library_id}", json=[{"id": name, "title": name.title()}])
+        report_id = client.post("/api/reports", json={"name": name, "library_ids": [library_id]}).json()["id"]
+        report = wait_for_reports(client, [report_id])[report_id]
+        assert report["status"] == "ok", report["error_message"]
+
+
+def test_vector_store_mapping_follows_file_growth(tmp_path):
+    store = VectorStore(tmp_path / "vectors.f32", dim=4)
+    store.write(np.array([0, 1]), np.ones((2, 4), dtype=np.float32))
+    assert store.scores(np.array([0, 1]), np.ones(4, dtype=np.float32)).tolist() == [4.0, 4.0]
+
+    # Grown elsewhere (another process, or a writer racing a search) after this mapping was cached
+    with open(store.path, "ab") as f:
+        f.truncate(4096 * 4 * 4)
+    store.write(np.array([3000, 3001]), np.full((2, 4), 2, dtype=np.float32))
+    assert store.scores(np.array([1, 3001]), np.ones(4, dtype=np.float32)).tolist() == [4.0, 8.0]
+
+
+
+def test_reembedded_papers_reuse_freed_rows(client):
+    index = retrieval.get_chunk_index()
+    paper = Paper(id="paper", title="Paper")
+    for revision in range(6):
+        paper.text_markdown = f"{PAPER_TEXT}\n\nRevision {revision}."
+        paper.refresh_content_hash()
+        assert index.index_papers([paper]) == 1
+
+    with get_db_session() as db:
+        chunks, top_row = db.query(func.count(PaperChunk.row), func.max(PaperChunk.row)).one()
+        free_rows = db.query(FreeChunkRow).count()
+    # Rows freed by one run are reused by the next, so at most two generations exist
+    assert chunks > 1
+    assert free_rows == chunks
+    assert top_row < 2 * chunks
+
+    with get_db_session() as db:
+        excerpts = index.search(db, [paper], "Revision 5", k=1)
+    assert excerpts[0].text.endswith("Revision 5.")
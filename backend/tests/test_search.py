@@ -0,0 +1,35 @@
+"""Full-text search over papers."""
+
+from sqlalchemy import text
+
+from app.database import get_db_session
+
+
+def search(client, q: str) -> list:
+    response = client.get("/api/papers/search", params={"q": q})
+    assert response.status_code == 200, response.text
+    return [hit["id"] for hit in response.json()["items"]]
+
+
+def add_papers(client, topics) -> None:
+    response = client.post("/api/papers/bulk", json=[
+        {"id": f"paper-{topic}", "title": f"A study of {topic}"} for topic in topics
+    ])
+    assert response.status_code == 200, response.text
+
+
+def test_search_survives_renumbered_rowids(client):
+    add_papers(client, ["alpha", "beta", "gamma", "delta"])
+    with get_db_session() as db:
+        db.execute(text("DELETE FROM papers WHERE id IN ('paper-alpha', 'paper-beta')"))
+        # What VACUUM may do to a table without an INTEGER PRIMARY KEY
+        db.execute(text("UPDATE papers SET rowid = rowid - 2"))
+
+    assert search(client, "gamma") == ["paper-gamma"]
+    assert search(client, "delta") == ["paper-delta"]
+    assert search(client, "alpha") == []
+
+    # New papers must not reuse an indexed row of another paper
+    add_papers(client, ["epsilon"])
+    assert search(client, "gamma") == ["paper-gamma"]
+    assert search(client, "epsilon") == ["paper-epsilon"]
@@ -0,0 +1,78 @@
+"""Staleness propagation from edits to dependent reports, and refresh."""
+
+import time
+
+import pytest
+
+
+def report_statuses(client, report_ids) -> dict:
+    return {rid: client.get(f"/api/reports/{rid}/status").json()["status"] for rid in report_ids}
+
+
+def wait_until_settled(client, report_ids, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        statuses = report_statuses(client, report_ids)
+        if not {"pending", "running"} & set(statuses.values()):
+            return statuses
+        assert time.monotonic() < deadline, statuses
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def graph(client) -> dict:
+    """Three libraries of one paper each, two templates and four reports over them."""
+    ids = {}
+    for name in ("lib1", "lib2", "lib3"):
+        ids[name] = client.post("/api/libraries", json={"name": name}).json()["id"]
+        client.post(f"/api/papers/bulk?library_id={ids[name]}", json=[{"id": f"{name}-paper", "title": name}])
+    for name in ("tmpl1", "tmpl2"):
+        ids[name] = client.post("/api/templates", json={"name": name, "prompt": f"Summarize for {name}."}).json()["id"]
+    for name, library, template in (
+        ("rep1", "lib1", "tmpl1"), ("rep2", "lib2", "tmpl2"), ("rep3", "lib3", None), ("rep4", "lib2", "tmpl1"),
+    ):
+        ids[name] = client.post("/api/reports", json={
+            "name": name, "library_ids": [ids[library]], "template_id": ids.get(template)
+        }).json()["id"]
+    assert set(wait_until_settled(client, reports(ids)).values()) == {"ok"}
+    return ids
+
+
+def reports(ids: dict) -> list:
+    return [ids[f"rep{i}"] for i in range(1, 5)]
+
+
+def stale_reports(client, ids: dict) -> set:
+    names = {rid: name for name, rid in ids.items()}
+    return {names[rid] for rid, status in report_statuses(client, reports(ids)).items() if status == "stale"}
+
+
+def test_edits_mark_only_dependent_reports_stale(client, graph):
+    client.put(f"/api/templates/{graph['tmpl2']}", json={"name": "tmpl2", "prompt": "Compare."})
+    assert stale_reports(client, graph) == {"rep2"}
+
+    client.post("/api/papers", json={"id": "extra", "title": "Extra"})
+    client.post(f"/api/libraries/{graph['lib3']}/papers/extra")
+    assert stale_reports(client, graph) == {"rep2", "rep3"}
+
+    client.post("/api/papers/bulk", json=[{"id": "lib1-paper", "title": "lib1, revised"}])
+    assert stale_reports(client, graph) == {"rep1", "rep2", "rep3"}
+
+    result = client.post("/api/reports/refresh-stale").json()
+    assert (result["queued"], result["failed"]) == (3, [])
+    assert set(wait_until_settled(client, reports(graph)).values()) == {"ok"}
+
+
+def test_reports_of_a_deleted_library_fail_on_refresh(client, graph):
+    assert client.delete(f"/api/entities/{graph['lib2']}").status_code == 200
+    assert stale_reports(client, graph) == {"rep2", "rep4"}
+
+    result = client.post("/api/reports/refresh-stale").json()
+
+    assert result["queued"] == 0
+    assert result["failed"] == sorted([graph["rep2"], graph["rep4"]])
+    for name in ("rep2", "rep4"):
+        status = client.get(f"/api/reports/{graph[name]}/status").json()
+        assert status["status"] == "error"
+        assert graph["lib2"] in status["error_message"]
+    assert report_statuses(client, [graph["rep1"], graph["rep3"]]) == {graph["rep1"]: "ok", graph["rep3"]: "ok"}
@@ -0,0 +1,131 @@
+"""Ancestry queries over deep and branched version histories."""
+
+import json
+import math
+
+from app.database import get_db_session
+from app.models import EntityVersion
+from app.version_graph import Ancestry, checkout, diff_versions
+from app.version_store import create_version
+
+ENTITIES = ["library-1", "template-1", "report-1"]
+
+
+class History:
+    """Versions recorded through the store, with a plain parent map to check against."""
+
+    def __init__(self, db):
+        self.db = db
+        self.parents = {}
+        self.entities = {}
+
+    def commit(self, version_id, parent_id, entity_id, revision):
+        parent = self.db.get(EntityVersion, parent_id) if parent_id else None
+        create_version(self.db, version_id, entity_id, json.dumps({"id": entity_id, "revision": revision}), parent)
+        self.parents[version_id] = parent_id
+        self.entities[version_id] = entity_id
+        return version_id
+
+    def chain(self, prefix, parent_id, length, start=0):
+        for i in range(start, start + length):
+            parent_id = self.commit(f"{prefix}{i}", parent_id, ENTITIES[i % len(ENTITIES)], f"{prefix}{i}")
+        return parent_id
+
+    def lineage(self, version_id):
+        """The version and its ancestors, newest first."""
+        lineage = []
+        while version_id:
+            lineage.append(version_id)
+            version_id = self.parents[version_id]
+        return lineage
+
+    def checkout(self, version_id):
+        latest = {}
+        for ancestor in self.lineage(version_id):
+            latest.setdefault(self.entities[ancestor], ancestor)
+        return latest
+
+
+def build(db) -> History:
+    """A 300-deep main line, a branch off v100 (b101 is at depth 101) and a second root."""
+    history = History(db)
+    history.chain("v", None, 300)
+    history.chain("b", "v100", 40, start=101)
+    history.chain("r", None, 5)
+    return history
+
+
+def test_ancestor_at_follows_skip_pointers(client):
+    with get_db_session() as db:
+        history = build(db)
+        lineage = list(reversed(history.lineage("v299")))
+
+        for depth in (0, 1, 2, 63, 64, 100, 150, 255, 298, 299):
+            ancestry = Ancestry(db)
+            assert ancestry.ancestor_at("v299", depth) == lineage[depth]
+            assert len(ancestry._nodes) <= 4 * math.log2(300)  # Logarithmic, not a parent walk
+        assert Ancestry(db).ancestor_at("b140", 101) == "b101"
+        assert Ancestry(db).ancestor_at("b140", 100) == "v100"
+        assert Ancestry(db).ancestor_at("v10", 11) is None
+
+
+def test_merge_base(client):
+    with get_db_session() as db:
+        build(db)
+        ancestry = Ancestry(db)
+
+        assert ancestry.merge_base("v299", "b140") == "v100"
+        assert ancestry.merge_base("b120", "v101") == "v100"
+        assert ancestry.merge_base("v299", "v42") == "v42"
+        assert ancestry.merge_base("b140", "b140") == "b140"
+        assert ancestry.merge_base("v299", "r4") is None
+
+
+def test_checkout_and_diff_match_a_parent_walk(client):
+    with get_db_session() as db:
+        history = build(db)
+
+        for head in ("v299", "b140", "v100", "r4"):
+            assert {v.entityId: v.id for v in checkout(db, head)} == history.checkout(head)
+
+        diff = diff_versions(db, "v299", "b140")
+        before, after = history.checkout("v299"), history.checkout("b140")
+        assert diff.merge_base_id == "v100"
+        assert [(c.entityId, c.status, c.from_version_id, c.to_version_id) for c in diff.changes] == [
+            (entity_id, "modified", before[entity_id], after[entity_id]) for entity_id in sorted(before)
+        ]
+
+
+def test_diff_reports_added_and_unchanged_entities(client):
+    with get_db_session() as db:
+        history = History(db)
+        history.commit("a0", None, "library-1", 0)
+        history.commit("a1", "a0", "template-1", 0)
+        history.commit("a2", "a1", "library-1", 0)  # Same state as a0
+
+        diff = diff_versions(db, "a0", "a2")
+
+        assert diff.merge_base_id == "a0"
+        assert [(c.entityId, c.status) for c in diff.changes] == [("template-1", "added")]
+
+
+def test_commit_on_a_moved_branch_head_conflicts(client):
+    library_id = client.post("/api/libraries", json={"name": "Library"}).json()["id"]
+    branch_id = client.post("/api/branches", json={"name": "main"}).json()["id"]
+
+    def commit(parent_id=None):
+        return client.post("/api/entity-versions", json={
+            "entityId": library_id, "branchId": branch_id, "parentId": parent_id,
+        })
+
+    first = commit().json()["id"]
+    second = commit(first)
+    assert second.status_code == 200 and second.json()["parentId"] == first
+
+    stale = commit(first)
+
+    assert stale.status_code == 409
+    heads = {b["id"]: b["headVersionId"] for b in client.get("/api/branches").json()}
+    assert heads[branch_id] == second.json()["id"]
+    checked_out = client.get(f"/api/branches/{branch_id}/checkout").json()
+    assert [v["id"] for v in checked_out] == [second.json()["id"]]
@@ -0,0 +1,94 @@
+"""Delta-compressed, content-addressed version states."""
+
+import json
+
+from sqlalchemy import func
+
+from app import version_store
+from app.database import get_db_session
+from app.migrations import migrate_entity_version_blobs
+from app.models import EntityVersion, VersionBlob
+from app.version_store import canonical_state, create_version, version_states
+
+
+def report_state(revision: int, lines: int = 200) -> str:
+    """A report whose markdown changes one line per revision."""
+    markdown = "\n".join(
+        f"Line {i}: revision {revision}" if i == revision % lines else f"Line {i}: unchanged text of the report"
+        for i in range(lines)
+    )
+    return json.dumps({"id": "report-1", "name": "Report", "content_markdown": markdown})
+
+
+def record_history(db, states, entity_id="report-1"):
+    versions, parent = [], None
+    for i, state in enumerate(states):
+        parent = create_version(db, f"v{i}", entity_id, state, parent)
+        versions.append(parent)
+    return versions
+
+
+def blob(db, digest: str) -> VersionBlob:
+    return db.query(VersionBlob).filter(VersionBlob.hash == digest).one()
+
+
+def test_delta_round_trip(client):
+    states = [report_state(i) for i in range(5)]
+    with get_db_session() as db:
+        versions = record_history(db, states)
+
+        assert version_states(db, versions) == {v.id: canonical_state(s) for v, s in zip(versions, states)}
+        first, *rest = [blob(db, v.content_hash) for v in versions]
+        assert first.base_hash is None
+        for parent, row in zip([first, *rest], rest):
+            assert row.base_hash == parent.hash
+            assert row.stored_size < first.stored_size / 4  # Only the edited line is stored
+
+
+def test_snapshot_interval_bounds_delta_chains(client, monkeypatch):
+    monkeypatch.setattr(version_store, "VERSION_SNAPSHOT_INTERVAL", 4)
+    states = [report_state(i) for i in range(10)]
+    with get_db_session() as db:
+        versions = record_history(db, states)
+
+        rows = [blob(db, v.content_hash) for v in versions]
+        assert [row.depth for row in rows] == [0, 1, 2, 3, 0, 1, 2, 3, 0, 1]
+        assert [row.base_hash is None for row in rows] == [i % 4 == 0 for i in range(10)]
+        assert version_states(db, versions[-1:]) == {"v9": canonical_state(states[-1])}
+
+
+def test_identical_states_share_a_blob(client):
+    with get_db_session() as db:
+        # Key order and whitespace do not matter
+        reverted = json.dumps(json.loads(report_state(0)), indent=2, sort_keys=False)
+        versions = record_history(db, [report_state(0), report_state(1), reverted])
+
+        assert versions[2].content_hash == versions[0].content_hash
+        assert db.query(func.count(VersionBlob.hash)).scalar() == 2
+        assert version_states(db, versions)["v2"] == canonical_state(report_state(0))
+
+
+def test_migrate_inline_version_data(client):
+    states = [report_state(i) for i in range(3)]
+    with get_db_session() as db:
+        parent = None
+        for i, state in enumerate(states):
+            db.add(EntityVersion(id=f"legacy-{i}", entityId="report-1", data=state, parentId=parent))
+            parent = f"legacy-{i}"
+        db.add(EntityVersion(id="legacy-other", entityId="template-1", data='{"prompt": "Summarize."}'))
+        db.flush()
+
+        assert migrate_entity_version_blobs(db) == 4
+        assert migrate_entity_version_blobs(db) == 0
+
+        versions = db.query(EntityVersion).order_by(EntityVersion.id).all()
+        assert all(v.data == "" and v.content_hash for v in versions)
+        assert version_states(db, versions) == {
+            "legacy-0": canonical_state(states[0]),
+            "legacy-1": canonical_state(states[1]),
+            "legacy-2": canonical_state(states[2]),
+            "legacy-other": canonical_state('{"prompt": "Summarize."}'),
+        }
+        # Migrated children are deltas against their parents
+        hashes = {v.id: v.content_hash for v in versions}
+        assert blob(db, hashes["legacy-2"]).base_hash == hashes["legacy-1"]